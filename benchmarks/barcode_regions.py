@@ -0,0 +1,70 @@
+"""
+Compare full-page and region-of-interest barcode decoding on a folder of scans.
+
+Usage: python -m benchmarks.barcode_regions <scans_dir> [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import cv2
+from numpy.typing import NDArray
+
+from src.autoscription.core.config import config
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.scan_preparation import (
+    barcode_regions,
+    retrieve_prescription_barcodes,
+)
+
+
+def full_page(img: NDArray) -> list[NDArray]:
+    return [cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)]
+
+
+def regions(img: NDArray) -> list[NDArray]:
+    return barcode_regions(img, config["scan_preparation"])
+
+
+def run(images: list[NDArray], paths: list[Path], candidates: Callable[[NDArray], list[NDArray]]) -> tuple[float, int]:
+    """Return the decoding time in seconds and the number of scans with a prescription barcode."""
+    monitoring = TestMonitoring()
+    hits = 0
+    start = time.perf_counter()
+    for path, img in zip(paths, images):
+        if any(retrieve_prescription_barcodes(path, candidate, monitoring) for candidate in candidates(img)):
+            hits += 1
+    return time.perf_counter() - start, hits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scans_dir", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(args.scans_dir.glob("*.jpg"))
+    if not paths:
+        parser.error(f"no .jpg scans found in {args.scans_dir}")
+    # Images are loaded up front so that only the decoding is timed
+    images = [cv2.imread(path.as_posix()) for path in paths]
+
+    for name, candidates in [("full page", full_page), ("regions", regions)]:
+        timings = []
+        for _ in range(args.repeat):
+            elapsed, hits = run(images, paths, candidates)
+            timings.append(elapsed)
+        best = min(timings)
+        print(  # noqa: T201
+            f"{name:>10}: {hits}/{len(paths)} decoded, best {best:.3f}s, "
+            f"median {statistics.median(timings):.3f}s, {1000 * best / len(paths):.1f} ms/scan"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare assembling the dosages of a day one table at a time and with create_dosages_df on synthetic prescriptions.
+
+Every synthetic prescription has one to four dosage rows with the columns extract_table returns, a share of them
+is a past partial execution of a prescription of the day. The assembly time is reported for a growing number of
+prescriptions, growing the dataframe one table at a time is quadratic in their number.
+
+Usage: python -m benchmarks.dosages_assembly [--prescriptions N] [--seed S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from src.autoscription.core.extract_metadata import (
+    create_dosages_df,
+    generate_dosage_checks,
+)
+
+DESCRIPTIONS = [
+    "B-MAG EFF.GRAN 243MG/SACHET BTX 10 SACHETS",
+    "LIPITOR F.C.TAB 20MG/TAB BTX30",
+    "GLUCOPHAGE F.C.TAB 850MG/TAB BT X 50",
+    "NORVASC TAB 5MG/TAB BTX30",
+    "ZANTAC F.C.TAB 150MG/TAB BTX30",
+    "PANADOL TAB 500MG/TAB BTX20",
+]
+
+
+def synthetic_dosages(rng: np.random.Generator) -> DataFrame:
+    rows = int(rng.integers(1, 5))
+    boxes_provided = rng.integers(1, 4, size=rows).astype(float)
+    description_quantity = rng.choice([10.0, 20.0, 30.0], size=rows)
+    pills_required = rng.choice([1.0, 2.0], size=rows) * 30
+    unit_price = rng.uniform(2, 40, size=rows).round(2)
+    return DataFrame(
+        {
+            "boxes_required": np.ceil(pills_required / description_quantity).astype(np.int64),
+            "boxes_provided": boxes_provided,
+            "dosage_category": "ΔΙΣΚΙΑ",
+            "dosage_description": " 1 ΔΙΣΚΙΑ x 1 φορά την ημέρα x 30 ημέρες",
+            "description": rng.choice(DESCRIPTIONS, size=rows, replace=False),
+            "pills_required": pills_required,
+            "description_quantity": description_quantity,
+            "dosage": pd.array(["1.0"] * rows, dtype=pd.StringDtype()),
+            "dosage_qnt": 1.0,
+            "dosage_repeat": np.full(rows, 30, dtype=np.int64),
+            "patient_part": "25%",
+            "unit_price": unit_price,
+            "patient_return": unit_price,
+            "total": unit_price * boxes_provided,
+            "diff": 0.0,
+            "patient_contrib": (unit_price * boxes_provided * 0.25).round(2),
+            "gov_contrib": (unit_price * boxes_provided * 0.75).round(2),
+            "description_org": "",
+            "dosage_check": "True",
+        }
+    )
+
+
+def synthetic_checks(prescriptions: int, seed: int) -> tuple[dict[str, Any], dict[str, Any]]:
+    """The past partial execution checks and the current day checks of a number of prescriptions."""
+    rng = np.random.default_rng(seed)
+    past_partial_exec_checks: dict[str, Any] = {}
+    current_day_checks: dict[str, Any] = {}
+    for index in range(prescriptions):
+        prescription_id = f"2312{index:09d}"
+        current_day_checks[prescription_id] = {"102": {"dosages": synthetic_dosages(rng)}}
+        if rng.random() < 0.2:
+            past_partial_exec_checks[prescription_id] = {"101": {"dosages": synthetic_dosages(rng)}}
+    return past_partial_exec_checks, current_day_checks
+
+
+def one_table_at_a_time(past_partial_exec_checks: dict[str, Any], current_day_checks: dict[str, Any]) -> DataFrame:
+    """How Core assembled the dosages before create_dosages_df."""
+    dosages_df = pd.DataFrame([])
+    for i, checks in enumerate([past_partial_exec_checks, current_day_checks]):
+        for prescription_id, check in checks.items():
+            for three_digits, data in check.items():
+                dosages = data["dosages"].copy()
+                dosages["is_past_partial_exec"] = i == 0
+                dosages["prescription"] = prescription_id
+                dosages["scan_last_three_digits"] = three_digits
+                dosages_df = pd.concat([dosages_df, dosages], axis=0)
+    grouped_df = dosages_df.groupby(["prescription", "description"], as_index=False).agg({"boxes_provided": "sum"})
+    grouped_df = grouped_df.rename(columns={"boxes_provided": "boxes_provided_multiple_executions"})
+    dosages_df = dosages_df.merge(grouped_df, on=["prescription", "description"], how="inner")
+    dosages_df["dosage_check"] = generate_dosage_checks(
+        dosages_df["boxes_provided_multiple_executions"],
+        dosages_df["boxes_required"],
+        dosages_df["dosage"],
+        dosages_df["dosage_qnt"],
+    )
+    dosages_df["dosage"] = dosages_df["dosage"].astype(str)
+    return dosages_df
+
+
+def timed(assemble: Callable[[dict[str, Any], dict[str, Any]], DataFrame], checks: tuple[dict[str, Any], ...]) -> Any:
+    start = time.perf_counter()
+    dosages_df = assemble(*checks)
+    return time.perf_counter() - start, dosages_df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prescriptions", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'prescriptions':>13} {'rows':>6} {'one at a time s':>16} {'create_dosages_df s':>20} {'speedup':>8}"
+    )  # noqa: T201
+    for prescriptions in sorted({max(1, args.prescriptions // 8 * scale) for scale in [1, 2, 4, 8]}):
+        checks = synthetic_checks(prescriptions, args.seed)
+        one_at_a_time_elapsed, expected = timed(one_table_at_a_time, checks)
+        elapsed, dosages_df = timed(create_dosages_df, checks)
+        assert_frame_equal(dosages_df, expected)
+        print(  # noqa: T201
+            f"{prescriptions:>13} {len(dosages_df):>6} {one_at_a_time_elapsed:>16.3f} {elapsed:>20.3f} "
+            f"{one_at_a_time_elapsed / elapsed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Compare the row by row and the column wise post-processing of the prescription dosage tables.
+
+The first page tables of the extract_metadata test data go through extract_table and through the row by row
+version it replaced, which applies the row functions of extract_metadata to every row of the dataframe.
+Both must return the same frames, the latency per table of each is reported.
+
+Usage: python -m benchmarks.extract_table [--tables FILE] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from src.autoscription.core.extract_metadata import (
+    clean_boxes_provided,
+    extract_dosage_repeat,
+    extract_dosages,
+    extract_table,
+    generate_dosage_check,
+    get_boxes_required,
+)
+from src.autoscription.dosage_extractor.product_number_extractor import (
+    clean_description,
+    number_of_products_per_container,
+)
+
+FIRST_PAGE_TABLES = Path(__file__).parents[1] / "test/autoscription/core/extract_metadata/data/first_page_tables.json"
+
+
+def row_wise_extract_table(first_page_table: list[list[Optional[str]]]) -> DataFrame:
+    """extract_table as it was before its post-processing was done on whole columns."""
+    table_columns = [
+        "description",
+        "patient_part",
+        "boxes_provided",
+        "unit_price",
+        "patient_return",
+        "total",
+        "diff",
+        "patient_contrib",
+        "gov_contrib",
+    ]
+    dataframe_columns = [
+        "boxes_required",
+        "boxes_provided",
+        "dosage_category",
+        "dosage_description",
+        "description",
+        "pills_required",
+        "description_quantity",
+        "dosage",
+        "dosage_qnt",
+        "dosage_repeat",
+        "patient_part",
+        "unit_price",
+        "patient_return",
+        "total",
+        "diff",
+        "patient_contrib",
+        "gov_contrib",
+        "description_org",
+        "dosage_check",
+    ]
+    columns_to_replace_comma = ["unit_price", "patient_return", "total", "diff", "patient_contrib", "gov_contrib"]
+
+    df = pd.DataFrame(first_page_table[3:], columns=table_columns)
+    df[columns_to_replace_comma] = df[columns_to_replace_comma].apply(lambda x: x.str.replace(",", "."))
+    for col in columns_to_replace_comma:
+        df[col] = pd.to_numeric(df[col].str.replace(",", "."), errors="coerce")
+    df["boxes_provided"] = df["boxes_provided"].apply(clean_boxes_provided)
+
+    df[["description", "dosage"]] = df["description"].str.replace("\n", " ").str.split("ΔΟΣΟΛΟΓΙΑ :", n=1, expand=True)
+    df["dosage_description"] = df["dosage"]
+    df[["dosage", "dosage_qnt", "dosage_repeat"]] = df["dosage"].str.split("x", n=2, expand=True)
+    df["dosage_category"] = df["dosage"].str.strip().str.split(" ", n=2).str[1]
+    df["description_org"] = df["description"]
+    df["description"] = df["description"].apply(lambda x: clean_description(x))
+    number_of_products_per_container_results = df.apply(
+        lambda x: number_of_products_per_container(x["dosage_category"], x["description"]), axis=1, result_type="expand"
+    )
+    df["description_quantity"] = number_of_products_per_container_results[0]
+
+    df["dosage"] = df["dosage"].apply(lambda row: extract_dosages(row)).astype(pd.StringDtype())
+    df["dosage_qnt"] = df["dosage_qnt"].apply(lambda x: float(extract_dosage_repeat(x)))
+    df["dosage_repeat"] = df["dosage_repeat"].apply(lambda x: int(x.strip().split(" ", 1)[0]) if x else 0)
+    df["pills_required"] = df.apply(
+        lambda row: float(row["dosage"]) * row["dosage_qnt"] * float(row["dosage_repeat"]), axis=1
+    )
+    df["boxes_required"] = df.apply(lambda row: get_boxes_required(row), axis=1)
+    df["dosage_check"] = df.apply(
+        lambda row: generate_dosage_check(
+            row["boxes_provided"], row["boxes_required"], row["dosage"], row["dosage_qnt"]
+        ),
+        axis=1,
+    )
+    df["boxes_provided"] = df["boxes_provided"].astype(float)
+    return df.reset_index(drop=True)[dataframe_columns]
+
+
+def run(
+    tables: list[list[list[Optional[str]]]], extract: Callable[[list[list[Optional[str]]]], DataFrame]
+) -> tuple[float, list[DataFrame]]:
+    """Return the time in seconds to extract all the tables and the extracted frames."""
+    start = time.perf_counter()
+    frames = [extract(table) for table in tables]
+    return time.perf_counter() - start, frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=Path, default=FIRST_PAGE_TABLES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.tables, encoding="utf-8") as file:
+        tables = json.load(file)["tables"]
+    rows = sum(len(table) - 3 for table in tables)
+
+    best: dict[str, float] = {}
+    frames: dict[str, list[DataFrame]] = {}
+    for name, extract in [("row by row", row_wise_extract_table), ("columns", extract_table)]:
+        timings = []
+        for _ in range(args.repeat):
+            elapsed, frames[name] = run(tables, extract)
+            timings.append(elapsed)
+        best[name] = min(timings)
+        print(  # noqa: T201
+            f"{name:>10}: {len(tables)} tables of {rows} rows, best {best[name]:.3f}s, "
+            f"median {statistics.median(timings):.3f}s, {1000 * best[name] / len(tables):.2f} ms/table"
+        )
+
+    for row_wise, columns in zip(frames["row by row"], frames["columns"]):
+        assert_frame_equal(row_wise, columns)
+    print(f"identical frames, {best['row by row'] / best['columns']:.1f}x faster per table")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmark the scan preparation on synthetic prescription pages.
+
+A4 pages are generated with a 16 digit Code128 barcode in the barcode region, printed text,
+noise, a slight skew and the vertical strikes of a dirty scanner glass. A share of the pages is
+left blank. The pages go through Core.prepare_scan_files and the throughput, the latency
+percentiles of every stage and the peak resident memory are reported.
+
+The preparation runs sequentially so that every stage can be timed in this process.
+
+Usage: python -m benchmarks.scan_preparation [--pages N] [--blank-ratio R] [--seed S] [--keep DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Optional
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+from src.autoscription.core import scan_preparation
+from src.autoscription.core.config import config
+from src.autoscription.core.logging import TestMonitoring
+
+# A4 at 300 dpi, the resolution of the scanner
+PAGE_HEIGHT = 3508
+PAGE_WIDTH = 2480
+MODULE_WIDTH = 4
+BARCODE_HEIGHT = 160
+BARCODE_ORIGIN = (780, 180)
+
+# Bar and space widths of the Code128 symbols, indexed by symbol value
+CODE128_PATTERNS = [
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232",
+]  # fmt: skip
+CODE128_START_C = 105
+CODE128_STOP = "2331112"
+
+
+def code128c_widths(digits: str) -> list[int]:
+    """Return the alternating bar and space widths, in modules, of digits encoded in the Code128 C code set."""
+    if len(digits) % 2 or not digits.isdigit():
+        raise ValueError(f"{digits} is not an even number of digits")
+    values = [CODE128_START_C] + [int(digits[i : i + 2]) for i in range(0, len(digits), 2)]
+    checksum = (values[0] + sum(position * value for position, value in enumerate(values[1:], start=1))) % 103
+    patterns = [CODE128_PATTERNS[value] for value in values + [checksum]] + [CODE128_STOP]
+    return [int(width) for pattern in patterns for width in pattern]
+
+
+def draw_barcode(page: NDArray, digits: str, origin: tuple[int, int]) -> None:
+    x, y = origin
+    for index, width in enumerate(code128c_widths(digits)):
+        if index % 2 == 0:
+            page[y : y + BARCODE_HEIGHT, x : x + width * MODULE_WIDTH] = 0
+        x += width * MODULE_WIDTH
+    cv2.putText(page, digits, (origin[0] + 60, y + BARCODE_HEIGHT + 45), cv2.FONT_HERSHEY_SIMPLEX, 1.4, 0, 3)
+
+
+def synthetic_page(rng: np.random.Generator, barcode: Optional[str]) -> NDArray:
+    """A scanned prescription page with the given barcode, or a blank page if barcode is None."""
+    page = np.full((PAGE_HEIGHT, PAGE_WIDTH), 255, dtype=np.uint8)
+    if barcode is not None:
+        draw_barcode(page, barcode, BARCODE_ORIGIN)
+        for line in range(40):
+            y = 800 + line * 65
+            words = " ".join("x" * int(rng.integers(3, 12)) for _ in range(int(rng.integers(4, 12))))
+            cv2.putText(page, words, (200, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 40, 2)
+        # Vertical strikes left by dust on the scanner glass
+        for x in rng.integers(0, PAGE_WIDTH, size=int(rng.integers(0, 3))):
+            page[:, x : x + int(rng.integers(1, 4))] = int(rng.integers(60, 160))
+        angle = float(rng.uniform(-1.5, 1.5))
+        rotation = cv2.getRotationMatrix2D((PAGE_WIDTH / 2, PAGE_HEIGHT / 2), angle, 1.0)
+        page = cv2.warpAffine(page, rotation, (PAGE_WIDTH, PAGE_HEIGHT), borderValue=255)
+    noise = rng.normal(0, 6, size=page.shape)
+    page = np.clip(page + noise, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(page, cv2.COLOR_GRAY2BGR)
+
+
+def random_barcode(rng: np.random.Generator) -> str:
+    return "2312" + "".join(str(digit) for digit in rng.integers(0, 10, size=12))
+
+
+def write_pages(scans_dir: Path, pages: int, blank_ratio: float, seed: int) -> int:
+    """Write the synthetic scans in scanning order and return the number of blank pages."""
+    rng = np.random.default_rng(seed)
+    blank_pages = 0
+    for index in range(pages):
+        barcode = None if rng.random() < blank_ratio else random_barcode(rng)
+        blank_pages += barcode is None
+        cv2.imwrite((scans_dir / f"scan_{index:05d}.jpg").as_posix(), synthetic_page(rng, barcode))
+    return blank_pages
+
+
+class StageTimer:
+    """Collects the latency of every call of the timed functions, in milliseconds."""
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+
+    def timed(self, name: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.latencies[name].append(1000 * (time.perf_counter() - start))
+
+        return wrapper
+
+    @contextmanager
+    def instrument(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            for name in ["decode_scan", "thumbnail_pixel_density", "retrieve_prescription_barcodes"]:
+                stack.enter_context(
+                    patch.object(scan_preparation, name, self.timed(name, getattr(scan_preparation, name)))
+                )
+            stack.enter_context(
+                patch.object(
+                    scan_preparation,
+                    "get_barcodes_ocr_batched",
+                    self.timed("ocr (batch)", scan_preparation.get_barcodes_ocr_batched),
+                )
+            )
+            stack.enter_context(
+                patch.dict(
+                    scan_preparation.barcode_decoding_stages,
+                    {
+                        stage: self.timed(f"stage {stage}", function)
+                        for stage, function in scan_preparation.barcode_decoding_stages.items()
+                    },
+                )
+            )
+            yield
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def percentile(latencies: list[float], q: int) -> float:
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--blank-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", type=Path, help="prepare the scans in this directory and keep them")
+    args = parser.parse_args()
+
+    # Core is imported here, it loads the detection models that the page generation does not need
+    from src.autoscription.core.core import Core
+
+    work_dir = args.keep or Path(tempfile.mkdtemp(prefix="autoscription_benchmark_"))
+    scans_dir, prepared_dir = work_dir / "scans", work_dir / "prepared"
+    shutil.rmtree(prepared_dir, ignore_errors=True)
+    scans_dir.mkdir(parents=True, exist_ok=True)
+    prepared_dir.mkdir(parents=True)
+    try:
+        blank_pages = write_pages(scans_dir, args.pages, args.blank_ratio, args.seed)
+        rss_before = peak_rss_mb()
+
+        scan_preparation_config = {**config["scan_preparation"], "parallel": {"is_enabled": False, "max_processes": 1}}
+        timer = StageTimer()
+        with timer.instrument():
+            start = time.perf_counter()
+            Core(monitoring=TestMonitoring()).prepare_scan_files(
+                scans_dir, prepared_dir, progress_bar=None, scan_preparation_config=scan_preparation_config
+            )
+            elapsed = time.perf_counter() - start
+        rss_after = peak_rss_mb()
+
+        print(  # noqa: T201
+            f"{args.pages} pages ({blank_pages} blank) in {elapsed:.2f}s: {args.pages / elapsed:.2f} pages/s"
+        )
+        print(f"{'stage':>38} {'calls':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")  # noqa: T201
+        for name, latencies in timer.latencies.items():
+            print(  # noqa: T201
+                f"{name:>38} {len(latencies):>6} {percentile(latencies, 50):>9.1f} {percentile(latencies, 90):>9.1f} "
+                f"{percentile(latencies, 99):>9.1f} {max(latencies):>9.1f}"
+            )
+        if rss_after is None:
+            print("peak RSS: not available on this platform")  # noqa: T201
+        else:
+            print(f"peak RSS: {rss_after:.0f} MB, {rss_before:.0f} MB before the preparation")  # noqa: T201
+    finally:
+        if args.keep is None:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,14 @@ def get_past_partial_exec_dir(scan_date: date) -> Path:
     return get_project_root() / "executions" / scan_date.strftime("%Y%m%d") / "past_partial_exec"
 
 
+def get_extraction_cache_dir() -> Path:
+    return get_project_root() / "executions" / ".cache" / "extraction"
+
+
+def get_clinical_document_cache_dir() -> Path:
+    return get_project_root() / "executions" / ".cache" / "clinical_documents"
+
+
 def get_report_dir() -> Path:
     return get_project_root() / "executions" / "reports"
 
@@ -81,6 +89,10 @@ def get_weights_dir() -> Path:
     return get_project_root() / "resources" / "weights"
 
 
+def get_product_list_path() -> Path:
+    return get_project_root() / "resources" / "product_list.json"
+
+
 def get_log_file_path(scan_date: datetime) -> Path:
     return get_results_dir(scan_date) / f'application_{scan_date.strftime("%Y-%m-%d_%H%M%S")}.log'
 
@@ -201,10 +213,42 @@ config: Dict[str, Any] = {
     },
     "reporting": {"execution_time_ordering": False, "show_overview": True, "category_breakdown": False},
     "turbo_mode": True,
+    "extract_metadata": {
+        # extract the prescription pdfs in worker processes, shared by the past partial and the current day pdfs
+        "parallel": {"is_enabled": False, "max_processes": 4},
+        # reuse what was extracted from an identical pdf, the least recently used entries go over the size limit
+        "cache": {"is_enabled": True, "size_limit_mb": 512},
+    },
+    "scan_preparation": {
+        # decode the barcodes of the scanned stack in worker processes, the OCR fallback runs batched afterwards
+        "parallel": {"is_enabled": False, "max_processes": 4},
+        # tried in order, each one only when the previous ones found no barcode, OCR is the last resort
+        "barcode_stages": ["barcode_regions", "top_band_gray", "threshold_210", "threshold_220", "threshold_180"],
+        # (left, top, right, bottom) boxes searched by the barcode_regions stage, the same ones used by the OCR fallback
+        "barcode_regions": [[750, 100, 1400, 550], [1400, 150, 2480, 650]],
+        # scans prepared between two writes of the scan manifest, used to resume an interrupted preparation
+        "manifest_save_every": 25,
+        # opt-in: load the OCR model in the background while the application is idle, instead of on the first OCR
+        # miss. Off by default, so that the runs that need no OCR fallback never load the model
+        "prewarm_ocr_reader": False,
+        # scans whose barcode regions go through the OCR reader together, after all the scans are decoded
+        "ocr_batch_size": 16,
+        # prepare the scans in the background while the scanner is still feeding, polling the scanner output directory
+        "watch_scanner_output": {"is_enabled": False, "poll_interval": 2.0},
+    },
     "dosages_only": False,
     "idika_integration": {
         "is_enabled": True,
         "guessing_pharmacy_id": {"is_enabled": False, "success_rate_threshold": 0.8},
+        # retrieve the clinical documents of the day in threads, at most max_in_flight requests at a time,
+        # requests to the IDIKA host are spaced to at most requests_per_second, 0 for no limit
+        "retrieval": {"max_in_flight": 8, "requests_per_second": 10.0},
+        # download the pages of the daily executions and the prescription pdfs in threads sharing one keep-alive
+        # session, at most max_in_flight at a time
+        "download": {"max_in_flight": 8},
+        # reuse the clinical documents that no longer change, of the prescriptions fully executed and of the past
+        # executions, they expire after ttl_hours, the least recently used entries go over the size limit
+        "cache": {"is_enabled": True, "ttl_hours": 12, "size_limit_mb": 256},
     },
     "is_debug_enabled": False,
     "is_summary_enabled": True,
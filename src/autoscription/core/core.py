@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import csv
 import datetime
-import gc
 import glob
 import os
 import pathlib
@@ -10,20 +9,20 @@ import shutil
 import time
 import warnings
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, nullcontext
 from dataclasses import asdict, dataclass
 from multiprocessing import Manager, Pool, Queue
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Optional  # noqa: PEA001
 
-import cv2
-import easyocr
 import pandas as pd
 from numpy.typing import NDArray
 from opentelemetry.metrics import get_meter
 from opentelemetry.metrics._internal.instrument import Counter
 from opentelemetry.trace import Tracer, get_current_span, get_tracer
 from pandas import DataFrame
-from pyzbar.pyzbar import Decoded, decode
+from pyzbar.pyzbar import Decoded
 
 import src.autoscription.core.logging
 from src.autoscription import clinical_document_mappers
@@ -38,29 +37,41 @@ from src.autoscription.core.config import (
     get_results_dir,
     get_scan_dir,
     get_temp_scan_dir,
-    get_weights_dir,
 )
 from src.autoscription.core.data_types import index_dtype
 from src.autoscription.core.errors import (
     ApiFullPrescriptionsSummariesParsingException,
     ApiPartialPrescriptionsSummariesParsingException,
     FewScansException,
-    RetriedException,
     ScanDirNotFoundException,
-    SkippedException,
     WrongDayException,
 )
 from src.autoscription.core.extract_metadata import (
+    create_dosages_df,
     create_pages_df,
     extract_metadata,
-    generate_dosage_check,
+    extract_metadata_pool,
 )
+from src.autoscription.core.extraction_cache import ExtractionCache
 from src.autoscription.core.logging import Monitoring, setup_logging
 from src.autoscription.core.retriever import ClinicalDocumentRetriever
+from src.autoscription.core.scan_preparation import (
+    SCAN_MANIFEST_FILE,
+    BarcodeStageStats,
+    ScanDecodeResult,
+    ScanIndexBuilder,
+    ScanManifest,
+    ScanManifestEntry,
+    decode_into_manifest,
+    decode_scans,
+    file_content_hash,
+    read_pending_barcodes_ocr,
+    record_decoded_scan,
+    retrieve_prescription_barcodes,
+)
+from src.autoscription.core.scan_watcher import ScanFolderWatcher
 from src.autoscription.core.utils import (
-    blank_page_removal,
     generate_past_partial_executions,
-    get_barcode_ocr,
 )
 from src.autoscription.idika_client.api_client import IdikaAPIClient
 from src.autoscription.idika_client.model.mt.clinical_document.clinical_document import (
@@ -74,6 +85,7 @@ if TYPE_CHECKING:
     # TODO: remove circular dependency with Application
 
 from src.autoscription.selenium_components.utils import (
+    DOWNLOAD_MAX_IN_FLIGHT,
     _get_daily_pres_list,
     _get_daily_pres_list_df,
     download_prescriptions,
@@ -135,6 +147,21 @@ def remove_temp_scan_dir() -> None:
         shutil.rmtree(temp_scan_dir)
 
 
+def open_temp_scan_dir(scan_dir: Path) -> Path:
+    """
+    Return the temp scan dir, emptied unless it holds the manifest of an interrupted preparation.
+    The scans of an interrupted preparation do not need to be decoded again. A new temp scan dir
+    starts with the manifest of the scans already prepared in the scan dir of the day.
+    """
+    temp_scan_dir = get_temp_scan_dir()
+    if not (temp_scan_dir / SCAN_MANIFEST_FILE).exists():
+        remove_temp_scan_dir()
+        temp_scan_dir.mkdir(parents=True, exist_ok=True)
+        if (scan_dir / SCAN_MANIFEST_FILE).exists():
+            shutil.copyfile(scan_dir / SCAN_MANIFEST_FILE, temp_scan_dir / SCAN_MANIFEST_FILE)
+    return temp_scan_dir
+
+
 def remove_last_scan_dir(last_scan_dir: Path) -> None:
     if last_scan_dir.exists() and last_scan_dir.is_dir():
         for item in os.listdir(last_scan_dir):
@@ -208,7 +235,7 @@ def guess_pharmacy_id(
         successful_requests = sum(
             1
             for pres_id in scanned_prescription_ids_sample
-            if idika_api_client.idika_http_client.get_clinical_document(pharmacy_id, pres_id).status_code == 200
+            if idika_api_client.has_clinical_document(pharmacy_id, pres_id)
         )
         total_requests = len(scanned_prescription_ids_sample)
         success_rates[pharmacy_id] = successful_requests / total_requests if total_requests > 0 else 0
@@ -305,6 +332,9 @@ class Core:
 
     def __init__(self, monitoring: Monitoring) -> None:
         self.monitoring = monitoring
+        self.scan_watcher: Optional[ScanFolderWatcher] = None
+        # The date the watched scans are prepared for, the one selected in the application or of the last run
+        self.scan_watcher_date = datetime.date.today()
         self.runs_counter = get_meter("Autoscription").create_counter(
             name="runs", unit="1", description="Counts runs per user"
         )
@@ -320,6 +350,9 @@ class Core:
         self.probable_barcode_match_counter = get_meter("Autoscription").create_counter(
             name="probable_barcode_match", unit="1", description="Counts Probable Barcode Matched"
         )
+        self.barcode_decoding_stage_counter = get_meter("Autoscription").create_counter(
+            name="barcode_decoding_stage", unit="1", description="Counts scans decoded per barcode decoding stage"
+        )
         self.idika_over_scan_ratio = get_meter("Autoscription").create_histogram(
             name="idika_over_scan_ratio", description="Idika Over Scan totals ratio"
         )
@@ -348,16 +381,47 @@ class Core:
             self.monitoring.run_context = get_current_span().get_span_context()
             self.monitoring.logger_adapter.warning(f"Software Started by {username} for {scan_date}.")
             self.runs_counter.add(1, {"username": username})
-            self.__run(
-                username=username,
-                scanner_output_directory=scanner_output_directory,
-                scan_date=scan_date,
-                progress_bar=progress_bar,
-                config=config,
-                specific_prescriptions=specific_prescriptions,
-                application=application,
-                idika_api_client=idika_api_client,
-            )
+            # The run prepares the scans itself, the watcher catches up with anything scanned afterwards
+            with self.scan_watcher.paused() if self.scan_watcher else nullcontext():
+                self.scan_watcher_date = scan_date
+                self.__run(
+                    username=username,
+                    scanner_output_directory=scanner_output_directory,
+                    scan_date=scan_date,
+                    progress_bar=progress_bar,
+                    config=config,
+                    specific_prescriptions=specific_prescriptions,
+                    application=application,
+                    idika_api_client=idika_api_client,
+                )
+
+    def watch_scanner_output(
+        self, scanner_output_directory: str, scan_date: datetime.date, scan_preparation_config: dict[str, Any]
+    ) -> None:
+        """
+        Prepare the scans in the background while they land in the scanner output directory.
+        The scans are prepared in the scan dir of scan_date, later changed through scan_watcher_date.
+        """
+        scanner_output_dir = Path(scanner_output_directory)
+        self.scan_watcher_date = scan_date
+        self.scan_watcher = ScanFolderWatcher(
+            scanner_output_dir,
+            on_scans_landed=lambda scans: decode_into_manifest(
+                scans,
+                open_temp_scan_dir(get_scan_dir(self.scan_watcher_date)),
+                scan_preparation_config=scan_preparation_config,
+                monitoring=self.monitoring,
+            ),
+            on_folder_settled=lambda: self.prepare_scan_files(
+                scanner_output_dir,
+                open_temp_scan_dir(get_scan_dir(self.scan_watcher_date)),
+                progress_bar=None,
+                scan_preparation_config=scan_preparation_config,
+            ),
+            poll_interval=scan_preparation_config["watch_scanner_output"]["poll_interval"],
+            monitoring=self.monitoring,
+        )
+        self.scan_watcher.start()
 
     # TODO: pass api token through method attributed instead of config
     def __run( 
@@ -374,7 +438,9 @@ class Core:
         # Run Preparation starts here
 
         clinical_document_retriever = ClinicalDocumentRetriever(
-            idika_api_client=idika_api_client, monitoring=self.monitoring
+            idika_api_client=idika_api_client,
+            monitoring=self.monitoring,
+            max_in_flight=config["idika_integration"]["retrieval"]["max_in_flight"],
         )
         is_test_user: bool = bool(config["backend"]["file_uploader"]["test_user"] == True)
         scanner_output_dir = Path(scanner_output_directory)
@@ -403,10 +469,13 @@ class Core:
             if progress_bar:
                 progress_bar["text"] = "Προετοιμασία εγγράφων: "
 
-            blank_page_removal(scanner_output_dir, monitoring=self.monitoring)
-            remove_temp_scan_dir()
-            temp_scan_dir.mkdir(parents=True, exist_ok=True)
-            self.prepare_scan_files(scanner_output_dir, temp_scan_dir, progress_bar=progress_bar)
+            open_temp_scan_dir(scan_dir)
+            self.prepare_scan_files(
+                scanner_output_dir,
+                temp_scan_dir,
+                progress_bar=progress_bar,
+                scan_preparation_config=config["scan_preparation"],
+            )
 
             scan_prep_end = time.time()
             scan_prep_end_time = time.localtime(scan_prep_end)
@@ -442,6 +511,7 @@ class Core:
 
         prescription_values: Optional[list[str]] = None
         ps_ids: list[dict[str, str]] = []
+        past_partial_executions: list[dict[str, Any]] = []
         if config["idika_integration"]["is_enabled"]:
             self.update_pharmacy_id(
                 config=config,
@@ -457,7 +527,12 @@ class Core:
             selenium_start_time = time.localtime(selenium_start)
             if progress_bar:
                 progress_bar["text"] = "Συγχρονισμός συνταγών με την ΗΔΙΚΑ: "
-            ps_ids = _get_daily_pres_list(download_dir, date=scan_date.strftime("%Y-%m-%d"), config=config["api"])
+            ps_ids = _get_daily_pres_list(
+                download_dir,
+                date=scan_date.strftime("%Y-%m-%d"),
+                config=config["api"],
+                max_in_flight=config["idika_integration"]["download"]["max_in_flight"],
+            )
             prescription_values = [item["prescription"] for item in ps_ids]
 
             if temp_scan_dir.exists():
@@ -484,31 +559,13 @@ class Core:
                         ps_ids=remaining_scans,
                         download_dir=download_dir,
                         config=config["api"],
-                        multiprocessing_controls=self.multiprocessing_controls,
                         progress_bar=progress_bar,
                         monitoring=self.monitoring,
+                        max_in_flight=config["idika_integration"]["download"]["max_in_flight"],
                     )
 
+            # Downloaded next to the extraction of the current day pdfs
             past_partial_executions = generate_past_partial_executions(pd.DataFrame(ps_ids))
-            for _ in range(TIMES_TO_RETRY):
-                pdfs = [
-                    file.split("/")[-1].split("\\")[-1].split(".")[0]
-                    for file in glob.glob(str(past_partial_exec_dir / "*" / "*.pdf"))
-                ]
-                remaining_scans = [
-                    d for d in past_partial_executions if f"{d['prescription']}_{d['execution']}" not in pdfs
-                ]
-                if remaining_scans:
-                    download_prescriptions(
-                        ps_ids=remaining_scans,
-                        download_dir=past_partial_exec_dir,
-                        download_counter=0,
-                        lock=None,
-                        shared_counter=None,
-                        log_queue=None,
-                        config=config["api"],
-                        monitoring=self.monitoring,
-                    )
             selenium_end = time.time()
             selenium_end_time = time.localtime(selenium_end)
             selenium_runtime = selenium_end - selenium_start
@@ -539,25 +596,56 @@ class Core:
 
         # Extract metadata starts here
         extract_metadata_start = time.time()
-        # Get injections starts here
-        if config["idika_integration"]["is_enabled"]:
-            injection_pages, injection_dosages = get_injections(
-                date=scan_date, config=config["api"], monitoring=self.monitoring
+        extraction_cache = ExtractionCache.from_config(config["extract_metadata"]["cache"])
+        # The past partial executions are downloaded and extracted in the background while the injections are
+        # retrieved and the current day pdfs are extracted, sharing only the extraction pool and cache with them
+        past_partial_exec_pipeline = ThreadPoolExecutor(max_workers=1, thread_name_prefix="past-partial-exec")
+        with extract_metadata_pool(
+            config["extract_metadata"]["parallel"],
+            multiprocessing_controls=self.multiprocessing_controls,
+            monitoring=self.monitoring,
+        ) as extract_metadata_workers:
+            # Get past partial executions starts here
+            past_partial_exec_checks_future = past_partial_exec_pipeline.submit(
+                self.download_and_extract_past_partial_executions,
+                past_partial_executions=past_partial_executions,
+                past_partial_exec_dir=past_partial_exec_dir,
+                specific_prescriptions=specific_prescriptions,
+                api_config=config["api"],
+                pool=extract_metadata_workers,
+                cache=extraction_cache,
+                max_in_flight=config["idika_integration"]["download"]["max_in_flight"],
             )
-        else:
-            injection_pages = pd.DataFrame(columns=["execution", "id", "prescription_scanned_pages", "prescription"])
-            injection_dosages = pd.DataFrame(columns=[])
-        # Get injections ends here
-
-        # Get past partial executions starts here
-        past_partial_exec_pdfs = glob.glob(str(past_partial_exec_dir / "*" / "*.pdf"))
-        past_partial_exec_checks = extract_metadata(
-            dir_list=past_partial_exec_pdfs, specific_prescriptions=specific_prescriptions, monitoring=self.monitoring
-        )
-        # Get past partial executions ends here
-        current_day_checks = extract_metadata(
-            dir_list=pdfs, specific_prescriptions=specific_prescriptions, monitoring=self.monitoring
-        )
+            try:
+                # Get injections starts here
+                if config["idika_integration"]["is_enabled"]:
+                    injection_pages, injection_dosages = get_injections(
+                        date=scan_date, config=config["api"], monitoring=self.monitoring
+                    )
+                else:
+                    injection_pages = pd.DataFrame(
+                        columns=["execution", "id", "prescription_scanned_pages", "prescription"]
+                    )
+                    injection_dosages = pd.DataFrame(columns=[])
+                # Get injections ends here
+
+                current_day_checks = extract_metadata(
+                    dir_list=pdfs,
+                    specific_prescriptions=specific_prescriptions,
+                    monitoring=self.monitoring,
+                    pool=extract_metadata_workers,
+                    cache=extraction_cache,
+                )
+                past_partial_exec_checks = past_partial_exec_checks_future.result()
+                # Get past partial executions ends here
+            finally:
+                # The extraction pool is terminated with its context, so a failed run cancels the past partial
+                # executions if they have not started and otherwise waits for them to stop using the pool
+                past_partial_exec_checks_future.cancel()
+                past_partial_exec_pipeline.shutdown(wait=True)
+
+        if extraction_cache is not None:
+            extraction_cache.close()
 
         extract_metadata_end = time.time()
         extract_metadata_runtime = extract_metadata_end - extract_metadata_start
@@ -661,39 +749,9 @@ class Core:
         self.monitoring.logger_adapter.warning(f"API_Partial_Prescriptions_Summaries_df_csv was saved in {results_dir}")
         # dosages start
         dosages_start = time.time()
-        dosages_df = pd.DataFrame([])
-        
         # Concatenate both past_partial_exec_checks and current_day_checks
         # in the dosages file with a is_past_partial_exec column
-        for i, checks in enumerate([past_partial_exec_checks, current_day_checks]):
-            for prescription_id, check in checks.items():
-                for three_digits, data in check.items():
-                    if i == 0:
-                        data["dosages"]["is_past_partial_exec"] = True
-                    else:
-                        data["dosages"]["is_past_partial_exec"] = False
-                    data["dosages"]["prescription"] = prescription_id
-                    data["dosages"]["scan_last_three_digits"] = three_digits
-                    dosages_df = pd.concat([dosages_df, data["dosages"]], axis=0)
-
-        # Group by 'prescription' and 'description' and sum
-        # the 'boxes_provided' column
-        grouped_df = dosages_df.groupby(["prescription", "description"], as_index=False).agg({"boxes_provided": "sum"})
-        # Rename the aggregated column
-        grouped_df = grouped_df.rename(columns={"boxes_provided": "boxes_provided_multiple_executions"})
-        # Merge the grouped data with the original data
-        dosages_df = dosages_df.merge(grouped_df, on=["prescription", "description"], how="inner")
-        # Apply the 'generate_dosage_check' function to each row
-        dosages_df["dosage_check"] = dosages_df.apply(
-            lambda row: generate_dosage_check(
-                row["boxes_provided_multiple_executions"],
-                row["boxes_required"],
-                row["dosage"],
-                row["dosage_qnt"],
-            ),
-            axis=1,
-        )
-        dosages_df["dosage"] = dosages_df["dosage"].astype(str)
+        dosages_df = create_dosages_df(past_partial_exec_checks, current_day_checks)
 
         dosages_end = time.time()
         dosages_runtime = dosages_end - dosages_start
@@ -867,6 +925,49 @@ class Core:
                     f"Api_Full_Prescriptions_Summaries_df_csv file created: {api_full_prescriptions_summaries_path}"
                 )
 
+    def download_and_extract_past_partial_executions(
+        self,
+        past_partial_executions: list[dict[str, Any]],
+        past_partial_exec_dir: Path,
+        specific_prescriptions: Optional[list[str]],
+        api_config: dict[str, Any],
+        pool: Optional[Pool],  # type: ignore[valid-type]
+        cache: Optional[ExtractionCache],
+        max_in_flight: int = DOWNLOAD_MAX_IN_FLIGHT,
+    ) -> dict[str, Any]:
+        """
+        Download the past partial executions that are not in past_partial_exec_dir.
+        Then extract the checks of all the pdfs in it, see extract_metadata.
+        """
+        download_start = time.time()
+        for _ in range(TIMES_TO_RETRY):
+            pdfs = [
+                file.split("/")[-1].split("\\")[-1].split(".")[0]
+                for file in glob.glob(str(past_partial_exec_dir / "*" / "*.pdf"))
+            ]
+            remaining_scans = [
+                d for d in past_partial_executions if f"{d['prescription']}_{d['execution']}" not in pdfs
+            ]
+            if remaining_scans:
+                download_prescriptions(
+                    ps_ids=remaining_scans,
+                    download_dir=past_partial_exec_dir,
+                    config=api_config,
+                    monitoring=self.monitoring,
+                    max_in_flight=max_in_flight,
+                )
+        download_formatted_elapsed_time = str(datetime.timedelta(seconds=int(time.time() - download_start)))
+        self.monitoring.logger_adapter.warning(
+            f"Past partial executions download Runtime: {download_formatted_elapsed_time}"
+        )
+        return extract_metadata(
+            dir_list=glob.glob(str(past_partial_exec_dir / "*" / "*.pdf")),
+            specific_prescriptions=specific_prescriptions,
+            monitoring=self.monitoring,
+            pool=pool,
+            cache=cache,
+        )
+
     def update_pharmacy_id(
         self,
         config: dict[str, Any],
@@ -961,7 +1062,13 @@ class Core:
         else:
             self.monitoring.logger_adapter.warning(f"Debbuging mode: {scanner_output_directory} has not been removed")
 
-    def prepare_scan_files(self, source_dir: Path, target_dir: Path, progress_bar: dict[str, ModifiedDict]) -> None:
+    def prepare_scan_files(
+        self,
+        source_dir: Path,
+        target_dir: Path,
+        progress_bar: Optional[dict[str, ModifiedDict]],
+        scan_preparation_config: dict[str, Any],
+    ) -> None:
         """
         Prepare scan files.
         Read image files from the source directory, decode barcodes,
@@ -1011,7 +1118,17 @@ class Core:
             else:
                 self.monitoring.logger_adapter.warning("The last_scan folder is empty.")
 
-        check_and_delete(source_dir, target_dir)
+        # Scans decoded by an earlier, interrupted or repeated, preparation are not decoded again
+        manifest = ScanManifest.load(
+            target_dir / SCAN_MANIFEST_FILE,
+            save_every=scan_preparation_config["manifest_save_every"],
+            monitoring=self.monitoring,
+        )
+        if len(manifest) == 0:
+            check_and_delete(source_dir, target_dir)
+        elif os.path.exists(csv_path):
+            # The index is rebuilt from the manifest so that pages added to the stack are included
+            os.remove(csv_path)
 
         # If index.csv doesn't exist, start processing images
         if not Path(csv_path).exists():
@@ -1025,58 +1142,63 @@ class Core:
             # images.sort(key=os.path.getmtime)
             images.sort()
             self.monitoring.logger_adapter.info("Scanned images sorted by name (datetime & counter)")
-
-            # Initialize an empty dataframe with columns for the index.csv file
-            dataframe = pd.DataFrame(
-                columns=["id", "stack_number", "prescription_scanned_pages", "probable_barcodes", "old_filname"]
+            content_hashes = [file_content_hash(filepath) for filepath in images]
+            known_entries = [manifest.get(content_hash) for content_hash in content_hashes]
+            pending_images = [filepath for filepath, known_entry in zip(images, known_entries) if known_entry is None]
+            self.monitoring.logger_adapter.info(
+                f"Scans found in the manifest: {len(images) - len(pending_images)}, to decode: {len(pending_images)}"
             )
 
-            # Get the current date and time
-            now = datetime.datetime.now()
-
-            # Initialize OCR Reader
-            try:
-                reader = easyocr.Reader(["en"], str(get_weights_dir()))
-            except Exception as e:
-                self.monitoring.logger_adapter.error("Failed to Initialize OCR Reader, Retrying...")
-                self.monitoring.logger_adapter.exception(RetriedException(e))
-                gc.collect()
-                reader = easyocr.Reader(["en"], str(get_weights_dir()))
-
             self.monitoring.logger_adapter.info("Processing each image in the sorted list")
 
             if progress_bar:
                 progress_bar["counter"] = ModifiedDict({"value": 0})  # type: ignore[index]
-            # Process each image in the sorted list
-            for index, filepath in enumerate(images):
-                if progress_bar:
-                    progress_bar["counter"].value += 1  # type: ignore[index,attr-defined]
-                # Read the image and adjust its contrast and brightness
-                img = cv2.imread(filepath.as_posix())
-                img_adj = cv2.threshold(img, 210, 255, cv2.THRESH_BINARY)[1]
-                img_adj_1 = cv2.threshold(img, 220, 255, cv2.THRESH_BINARY)[1]
-                img_adj_2 = cv2.threshold(img, 180, 255, cv2.THRESH_BINARY)[1]
-                # Decode any barcodes present in the image
-                prescription_barcodes = self.retrieve_prescription_barcodes(filepath, img_adj)
-                probable_barcodes: str = ""
-                # Extract the barcode data, if available
-                if len(prescription_barcodes) > 0:
-                    barcode = prescription_barcodes.pop().data.decode("utf-8")
-                else:
-                    # Probability that a vertical strike exists. We need to get back to the original
-                    # image (not binary) in order to find the barcode.
-                    prescription_barcodes = self.retrieve_prescription_barcodes(filepath, img_adj_1)
-                    # If we have not found during the previous two phases
-                    if not prescription_barcodes:
-                        prescription_barcodes = self.retrieve_prescription_barcodes(filepath, img_adj_2)
-
-                    # If we have not found during the previous two phases
-                    if not prescription_barcodes:
-                        barcode, probable_barcodes = get_barcode_ocr(reader, filepath, monitoring=self.monitoring)
+            decoded_images: list[tuple[Path, str, Optional[ScanManifestEntry]]] = []
+            decoded_scans: list[ScanDecodeResult] = []
+            # Decoding may run in worker processes, but the results arrive in stack order
+            with closing(
+                decode_scans(
+                    images=pending_images,
+                    scan_preparation_config=scan_preparation_config,
+                    multiprocessing_controls=self.multiprocessing_controls,
+                    monitoring=self.monitoring,
+                )
+            ) as pending_decoded_scans:
+                for filepath, content_hash, known_entry in zip(images, content_hashes, known_entries):
+                    if progress_bar:
+                        progress_bar["counter"].value += 1  # type: ignore[index,attr-defined]
+                    if known_entry is None:
+                        decoded_scan = next(pending_decoded_scans)
+                        if not record_decoded_scan(manifest, filepath, content_hash, decoded_scan, self.monitoring):
+                            continue
                     else:
-                        barcode = prescription_barcodes.pop().data.decode("utf-8")
-                # Count existing barcodes in the dataframe
-                existing_barcodes = dataframe[dataframe.id == barcode].shape[0]
+                        decoded_scan = known_entry.to_decode_result()
+                    decoded_images.append((filepath, content_hash, known_entry))
+                    decoded_scans.append(decoded_scan)
+
+            # The scans that no decoding stage could read go through OCR together
+            decoded_scans = read_pending_barcodes_ocr(
+                [filepath for filepath, _, _ in decoded_images],
+                decoded_scans,
+                scan_preparation_config=scan_preparation_config,
+                monitoring=self.monitoring,
+            )
+
+            index_builder = ScanIndexBuilder()
+            stage_stats = BarcodeStageStats()
+
+            # Get the current date and time
+            now = datetime.datetime.now()
+
+            # The index rows and the file name counters are assigned in stack order by this loop only
+            for (filepath, content_hash, known_entry), decoded_scan in zip(decoded_images, decoded_scans):
+                if known_entry is None:
+                    stage_stats.add(decoded_scan.stage)
+                    self.barcode_decoding_stage_counter.add(1, {"stage": decoded_scan.stage})
+                barcode = decoded_scan.barcode
+                probable_barcodes = decoded_scan.probable_barcodes
+                # Count existing barcodes in the index
+                existing_barcodes = index_builder.count(barcode)
 
                 # Construct the target file name using date, barcode, and
                 # existing barcode count
@@ -1085,50 +1207,52 @@ class Core:
                     date_str + "_" + barcode + "_" + str(existing_barcodes + 1).zfill(3) + filepath.suffix
                 )
 
-                # Add a new row to the dataframe with the barcode, index,
-                # and target file name
-                dataframe.loc[len(dataframe.index)] = [
-                    barcode,
-                    index,
-                    target_file_name,
-                    probable_barcodes,
-                    filepath.name,
-                ]
-
                 # Copy the image file to the target directory
-                # with the new file name
+                # with the new file name, unless an earlier run already did
                 target_file = target_dir / target_file_name
-                shutil.copyfile(filepath, target_file)
+                if (
+                    known_entry is None
+                    or known_entry.prescription_scanned_pages != target_file_name
+                    or not target_file.exists()
+                ):
+                    shutil.copyfile(filepath, target_file)
+                manifest.add(
+                    content_hash,
+                    ScanManifestEntry(
+                        barcode=barcode,
+                        probable_barcodes=probable_barcodes,
+                        stage=decoded_scan.stage,
+                        prescription_scanned_pages=target_file_name,
+                    ),
+                )
+
+                # Add a new row to the index with the barcode, index,
+                # and target file name
+                # Blank pages are not part of the stack, so the stack number is the row number
+                index_builder.add(barcode, len(index_builder), target_file_name, probable_barcodes, filepath.name)
 
                 self.monitoring.logger_adapter.info(
                     f"Processing image {filepath.name}, " f"barcode detected={barcode}, saved as {target_file_name}"
                 )
 
+            # Remove the scans that an earlier run saved under names that are no longer in the index
+            prepared_filenames = index_builder.prescription_scanned_pages()
+            for target_file in list(target_dir.glob("*.jpg")) + list(target_dir.glob("*.png")):
+                if target_file.name not in prepared_filenames:
+                    target_file.unlink()
+            manifest.keep_only(set(content_hashes))
+            manifest.save()
+
             # Save the index.csv file to the target directory
-            index_df = pd.DataFrame(
-                dataframe,
-                columns=["id", "stack_number", "prescription_scanned_pages", "probable_barcodes", "old_filname"],
-            )
-            index_df.to_csv(csv_path, index=False)
+            index_builder.to_dataframe().to_csv(csv_path, index=False)
             self.monitoring.logger_adapter.info(f"Scans Index file created: {csv_path}")
+            self.monitoring.logger_adapter.info(f"Barcode decoding stage hit rates: {stage_stats.hit_rates()}")
 
         else:
             self.monitoring.logger_adapter.warning("The index csv path exists and the preparation was skipped.")
 
     def retrieve_prescription_barcodes(self, filepath: Path, img: NDArray) -> list[Decoded]:
-        try:
-            detected_barcodes = decode(img)
-        except Exception as e:
-            self.monitoring.logger_adapter.error(f"Failed to Decode Barcode, Skipping barcode detection for {filepath}")
-            self.monitoring.logger_adapter.exception(SkippedException(e))
-            detected_barcodes = []
-        prescription_barcodes = [
-            barcode
-            for barcode in detected_barcodes
-            if len(barcode.data.decode("utf-8")) == 16
-            or (barcode.type == "CODE128" and len(barcode.data.decode("utf-8")) == 13)
-        ]
-        return prescription_barcodes
+        return retrieve_prescription_barcodes(filepath, img, monitoring=self.monitoring)
 
     def validate_and_rename_scanned_filenames(self, target_dir: Path, idika_barcodes: list[str], username: str) -> None:
         csv_path = target_dir / "index.csv"
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Any, Optional
+
+import diskcache
+
+
+class DiskCache:
+    """
+    The base of the caches kept on disk between the runs of the application, on a diskcache.Cache.
+    The least recently used entries are evicted past the size limit.
+    """
+
+    cache: diskcache.Cache
+
+    def __init__(self, directory: Path, size_limit_mb: Optional[int] = None) -> None:
+        # The settings are stored in the cache directory, without a size limit the stored one is kept
+        settings: dict[str, Any] = {"eviction_policy": "least-recently-used"}
+        if size_limit_mb is not None:
+            settings["size_limit"] = size_limit_mb * 2**20
+        self.cache = diskcache.Cache(directory.as_posix(), **settings)
+
+    def versions(self) -> dict[str, int]:
+        """The versions of what the entries hold, printed by the info command."""
+        return {}
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def volume(self) -> int:
+        return int(self.cache.volume())
+
+    def clear(self) -> int:
+        return int(self.cache.clear())
+
+    def close(self) -> None:
+        self.cache.close()
+
+
+def run_cache_command(description: Optional[str], cache_class: type[DiskCache], default_directory: Path) -> None:
+    """The info and clear commands of a cache, see the usage of the cache modules."""
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["info", "clear"])
+    parser.add_argument("--directory", type=Path, default=default_directory)
+    args = parser.parse_args()
+
+    cache = cache_class(args.directory)
+    try:
+        if args.command == "info":
+            size_limit = cache.cache.size_limit
+            print(f"directory: {args.directory}")  # noqa: T201
+            for name, version in cache.versions().items():
+                print(f"{name}: {version}")  # noqa: T201
+            print(f"entries: {len(cache)}")  # noqa: T201
+            print(f"volume: {cache.volume() / 2**20:.1f} MB of {size_limit / 2**20:.0f} MB")  # noqa: T201
+        else:
+            print(f"removed {cache.clear()} entries from {args.directory}")  # noqa: T201
+    finally:
+        cache.close()
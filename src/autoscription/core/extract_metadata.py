@@ -8,7 +8,8 @@ import math
 import multiprocessing
 import re
 from collections import defaultdict
-from collections.abc import Generator
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
 from itertools import islice
 from logging.handlers import QueueHandler
 from math import ceil
@@ -19,20 +20,22 @@ from queue import Queue
 from typing import Any, Optional
 
 import cv2
+import numpy as np
 import pandas as pd
-import pdfplumber
 from opentelemetry.trace import Tracer, get_tracer
-from pandas import DataFrame
+from pandas import DataFrame, Series
+from pandas.api.types import is_float_dtype
 from PIL.Image import Image
-from PyPDF2 import PdfReader
 
 from src.autoscription.core.data_types import pages_dtype
 from src.autoscription.core.errors import (
     ExtractMetadataFailedException,
     RetriedException,
-    SkippedException,
 )
+from src.autoscription.core.extraction_cache import ExtractionCache
 from src.autoscription.core.logging import Monitoring, log_queue
+from src.autoscription.core.prescription_header import parse_prescription_header
+from src.autoscription.core.prescription_pdf import PrescriptionPdf
 from src.autoscription.core.utils import (
     draw_barcodes,
     draw_bottom_right_templates,
@@ -51,11 +54,19 @@ from src.autoscription.coupons_detection.utils import (
 from src.autoscription.dosage_extractor.product_number_extractor import (
     NO_NEED_TO_IDENTIFY,
     UNABLE_TO_IDENTIFY,
+    clean_descriptions,
     number_of_products_per_container,
+    reload_product_catalogue,
 )
 from src.autoscription.signature_detection.signature_detection import SignatureDetector
 from src.autoscription.stamp_detection import Detector
 
+# Below this number of pdfs the extraction is not worth handing over to the workers
+MIN_PDFS_FOR_PARALLEL_EXTRACTION = 8
+
+# Set in every worker process of the extraction pool by _init_extract_metadata_worker
+_worker_monitoring: Optional[Monitoring] = None
+
 
 def divide_chunks(data: dict[str, Any], size: int = 5) -> Generator[dict[str, Any], Any, None]:
     it = iter(data)
@@ -63,24 +74,6 @@ def divide_chunks(data: dict[str, Any], size: int = 5) -> Generator[dict[str, An
         yield {k: data[k] for k in islice(it, size)}
 
 
-def extract_3_digits(text: str) -> str:
-    end = text.find("ΘΕΡΑΠΕΙΑ :")
-    result = text[:end][-3:]
-    if result.isdigit():
-        return result
-    else:
-        end = text.find("ΕΠΑΝΑΛΗΨΗ :")
-        return text[:end][-3:]
-
-
-def extract_text(file_name: str) -> tuple[int, str]:
-    reader = PdfReader(file_name)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return len(reader.pages), text
-
-
 def extract_pills(x: str) -> int:
     try:
         expr = re.findall(r"\w\s*X\s*\d+|\d+X\d+", x)[0].replace(" ", "")
@@ -110,33 +103,6 @@ def extract_dosage_repeat(text: str) -> int | float | str:
         return 1
 
 
-def clean_description(description: str) -> str:
-    return (
-        re.sub(r"\([^)]*\)", "", description)
-        .upper()
-        .replace("Χ", "X")
-        .replace("Α", "A")
-        .replace("Ε", "E")
-        .replace("Ι", "I")
-        .replace("Υ", "Y")
-        .replace("Ο", "O")
-        .replace("Η", "H")
-        .replace("Ό", "O")
-        .replace("Ί", "I")
-        .replace("Ά", "A")
-        .replace("Έ", "E")
-        .replace("Ή", "H")
-        .replace("Ύ", "Y")
-        .replace("Τ", "T")
-        .replace("Β", "B")
-        .replace("Μ", "M")
-        .replace("Ρ", "P")
-        .replace("Ν", "N")
-        .replace("Κ", "K")
-        .strip()
-    )
-
-
 # TODO: change the signature to return string, no need for true and
 # false if we have 3 cases
 def generate_dosage_check(boxes_provided: float, boxes_required: int, dosage: int, dosage_qnt: int) -> str:
@@ -231,7 +197,59 @@ def clean_boxes_provided(boxes: str) -> Optional[int]:
         return 555
 
 
-def extract_table(file_name: str) -> DataFrame:
+def _equals_exactly(column: Series, number: int) -> Series:
+    # Compared as python numbers, like get_boxes_required does: no float is equal to a sentinel past 2**53
+    if is_float_dtype(column) and float(number) != number:
+        return Series(False, index=column.index)
+    return column == number
+
+
+def get_boxes_required_column(df: DataFrame) -> Series:
+    """get_boxes_required of every row of the dataframe."""
+    once = (df["dosage_qnt"] == 999).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_container = np.ceil(df["pills_required"].to_numpy() / df["description_quantity"].to_numpy(dtype=float))
+    boxes_required = Series(
+        np.select(
+            [
+                once,
+                _equals_exactly(df["description_quantity"], UNABLE_TO_IDENTIFY).to_numpy(),
+                _equals_exactly(df["description_quantity"], NO_NEED_TO_IDENTIFY).to_numpy(),
+            ],
+            [df["boxes_provided"].to_numpy(dtype=float), 1, 999],
+            default=per_container,
+        ),
+        index=df.index,
+    )
+    # The boxes provided of the one-off dosages are taken as they are
+    if once.any() and is_float_dtype(df["boxes_provided"]):
+        return boxes_required
+    return boxes_required.astype(np.int64)
+
+
+def generate_dosage_checks(
+    boxes_provided: Series, boxes_required: Series, dosage: Series, dosage_qnt: Series
+) -> Series:
+    """generate_dosage_check of every row of the columns."""
+    provided = pd.to_numeric(boxes_provided, errors="coerce").to_numpy(dtype=float)
+    required = boxes_required.to_numpy(dtype=float)
+    dosage_values = dosage.to_numpy(dtype=float)
+    checks = np.select(
+        [
+            np.isnan(provided) & boxes_provided.notna().to_numpy(),
+            provided == 1,
+            dosage_qnt.to_numpy(dtype=float) == 999,
+            (dosage_values == 999) | (dosage_values == 0),
+            provided > required,
+            provided == required,
+        ],
+        ["False", "True", "True", "False", "False", "True"],
+        default="CHECK",
+    )
+    return Series(checks, index=boxes_provided.index, dtype=object)
+
+
+def extract_table(first_page_table: list[list[Optional[str]]]) -> DataFrame:
     table_columns: list[str] = [
         "description",
         "patient_part",
@@ -267,13 +285,13 @@ def extract_table(file_name: str) -> DataFrame:
     ]
     columns_to_replace_comma = ["unit_price", "patient_return", "total", "diff", "patient_contrib", "gov_contrib"]
 
-    pdf = pdfplumber.open(file_name)
     # from the first page, get all the tables and ignore the first 3 tables
-    table = pdf.pages[0].extract_table()[3:]
+    table = first_page_table[3:]
     df = pd.DataFrame(table, columns=table_columns)
-    df[columns_to_replace_comma] = df[columns_to_replace_comma].apply(lambda x: x.str.replace(",", "."))
+    # A table has a handful of rows, the text cells are parsed one by one and the rest is computed on whole columns
     for col in columns_to_replace_comma:
-        df[col] = pd.to_numeric(df[col].str.replace(",", "."), errors="coerce")
+        amounts = [amount.replace(",", ".") if isinstance(amount, str) else amount for amount in df[col]]
+        df[col] = pd.to_numeric(amounts, errors="coerce")
     # TODO:
     # ValueError: invalid literal for int() with base 10
     # Mostly about galiniko skeuasma. When the system breaks here it does not flag the broken prescription.
@@ -286,7 +304,7 @@ def extract_table(file_name: str) -> DataFrame:
     #     .replace("(σταγονα)","").replace("(","").replace(")","")
     # )
 
-    df["boxes_provided"] = df["boxes_provided"].apply(clean_boxes_provided)
+    df["boxes_provided"] = df["boxes_provided"].map(clean_boxes_provided)
 
     df[["description", "dosage"]] = df["description"].str.replace("\n", " ").str.split("ΔΟΣΟΛΟΓΙΑ :", 1, expand=True)
     df["dosage_description"] = df["dosage"]
@@ -294,29 +312,23 @@ def extract_table(file_name: str) -> DataFrame:
     df["dosage_category"] = df["dosage"].str.strip().str.split(" ", n=2).str[1]
     # THIS IS WHERE THE DOSAGES ARE CHECKED
     df["description_org"] = df["description"]
-    df["description"] = df["description"].apply(lambda x: clean_description(x))
-    number_of_products_per_container_results = df.apply(
-        lambda x: number_of_products_per_container(x["dosage_category"], x["description"]), axis=1, result_type="expand"
-    )
-    df["description_quantity"] = number_of_products_per_container_results[0]
-    df["description_quantity_rule"] = number_of_products_per_container_results[1]
-
-    df["dosage"] = df["dosage"].apply(lambda row: extract_dosages(row)).astype(pd.StringDtype())
-    df["dosage_qnt"] = df["dosage_qnt"].apply(lambda x: float(extract_dosage_repeat(x)))
-    df["dosage_repeat"] = df["dosage_repeat"].apply(lambda x: int(x.strip().split(" ", 1)[0]) if x else 0)
-    df["pills_required"] = df.apply(
-        lambda row: float(row["dosage"]) * row["dosage_qnt"] * float(row["dosage_repeat"]),
-        axis=1,
+    df["description"] = clean_descriptions(df["description"])
+    products_per_container = [
+        number_of_products_per_container(category, description)
+        for category, description in zip(df["dosage_category"], df["description"])
+    ]
+    # A quantity that no rule matched has always been stored as a float
+    df["description_quantity"] = Series(
+        [float(quantity) if rule is None else quantity for quantity, rule in products_per_container], index=df.index
     )
-    df["boxes_required"] = df.apply(lambda row: get_boxes_required(row), axis=1)
-    df["dosage_check"] = df.apply(
-        lambda row: generate_dosage_check(
-            row["boxes_provided"],
-            row["boxes_required"],
-            row["dosage"],
-            row["dosage_qnt"],
-        ),
-        axis=1,
+
+    df["dosage"] = df["dosage"].map(extract_dosages).astype(pd.StringDtype())
+    df["dosage_qnt"] = [float(extract_dosage_repeat(x)) for x in df["dosage_qnt"]]
+    df["dosage_repeat"] = [int(x.strip().split(" ", 1)[0]) if x else 0 for x in df["dosage_repeat"]]
+    df["pills_required"] = df["dosage"].to_numpy(dtype=float) * df["dosage_qnt"] * df["dosage_repeat"]
+    df["boxes_required"] = get_boxes_required_column(df)
+    df["dosage_check"] = generate_dosage_checks(
+        df["boxes_provided"], df["boxes_required"], df["dosage"], df["dosage_qnt"]
     )
     # TODO: here for example in galinika which are not deducted correctly
     # it will break as it will not be able to change to int a string
@@ -329,244 +341,257 @@ def extract_table(file_name: str) -> DataFrame:
     return df[dataframe_columns]
 
 
-def is_immatereal(text: str) -> bool:
-    if "Άυλη συνταγογράφηση" in text:
-        return True
-    else:
-        return False
+def extract_metadata(
+    dir_list: list[str],
+    specific_prescriptions: Optional[list[str]],
+    monitoring: Monitoring,
+    pool: Optional[Pool] = None,  # type: ignore[valid-type]
+    cache: Optional[ExtractionCache] = None,
+) -> dict[str, Any]:
+    """
+    Extract the checks of the prescription pdfs, keyed by prescription id and the last three IDIKA digits.
+    Given a pool, see extract_metadata_pool, the pdfs are extracted by its worker processes.
+    Given a cache, only the pdfs that are not in it are extracted, and they are added to it.
+    Either way the checks are merged in the order of dir_list.
+    """
+    # Initialize the checks dictionary
+    monitoring.logger_adapter.info("The metadata extraction from pdfs has started")
+    _reload_product_catalogue(monitoring)
 
+    if len(dir_list) == 0:
+        monitoring.logger_adapter.error("The pdf prescription folder is empty. Imminent crash.")
 
-# TODO: update to bool instead of int
-def is_prototype(text: str) -> int:
-    if "επιθυμώ να λάβω ακριβότερο φάρμακο" in text:
-        return 1
+    checks: defaultdict[str, Any] = defaultdict(lambda: {})
+    # (counter, file, cache key, cached extraction), the counter of a pdf is its position in dir_list
+    files: list[tuple[int, str, str, Optional[tuple[str, str, dict[str, Any]]]]] = []
+    for counter, file in enumerate(dir_list, start=1):
+        # If specific_prescriptions is not empty and prescription_id is
+        # not in specific_prescriptions, skip the current file
+        if specific_prescriptions and get_prescription_id(file) not in specific_prescriptions:
+            continue
+        key, cached = cache.lookup(file) if cache is not None else ("", None)
+        files.append((counter, file, key, cached))
+    pending_files = [(counter, file) for counter, file, _, cached in files if cached is None]
+    if cache is not None:
+        monitoring.logger_adapter.info(f"{len(files) - len(pending_files)} of {len(files)} pdfs found in the cache")
+
+    pending_extracted: Iterator[tuple[str, str, dict[str, Any]]]
+    extracted_in_process = pool is None or len(pending_files) < MIN_PDFS_FOR_PARALLEL_EXTRACTION
+    if extracted_in_process:
+        pending_extracted = (
+            extract_prescription_metadata(file, counter, monitoring) for counter, file in pending_files
+        )
     else:
-        return 0
-
-
-def get_category(text: str) -> int | None:
-    try:
-        for line in text.split("\n"):
-            if "ΕΩΣ :" in line:
-                return int(line.split("/")[-1].strip()[2])
-    except IndexError:
-        return 8
-    return None
-
+        monitoring.logger_adapter.info(f"Extracting the metadata of {len(pending_files)} pdfs in parallel")
+        # imap keeps the order of dir_list, an exception of a worker is raised here when its result is reached
+        # The pool is not None here, extracted_in_process does not narrow it
+        pending_extracted = pool.imap(  # type: ignore[union-attr]
+            _extract_prescription_metadata_in_worker, pending_files
+        )
 
-# def get_category_name(text):
-#     if "Ε.Δ.Ο.Ε.Α.Π." in text:
-#         return "Ε.Δ.Ο.Ε.Α.Π."
-#     mk1 = text.find("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ") + 23
-#     mk2 = text.find("Σ Υ Ν Τ Α Γ Η", mk1)
-#     return text[mk1:mk2]
+    for counter, file, key, extracted in files:
+        if extracted is None:
+            extracted = next(pending_extracted)
+            if cache is not None and not cache.set(key, extracted):
+                monitoring.logger_adapter.warning(f"The metadata of {file} could not be cached")
+        else:
+            monitoring.logger_adapter.info(f"{counter} : {extracted[0]}{extracted[1]} (cached)")
+        prescription_id, idika_3_digits, check = extracted
+        checks[prescription_id][idika_3_digits] = check
+        ipython_clear_output()
+    if extracted_in_process and pending_files:
+        # The worker processes of a pool have caches of their own
+        monitoring.logger_adapter.info(f"Products per container cache: {number_of_products_per_container.cache_info()}")
+    return checks
 
 
-# Do not delete
-# def get_category_name(text):
-#     mk1 = text.find('ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ')
-#     if mk1 != -1:
-#         mk1 += 23
-#     else:
-#         mk1 = 4
-#     mk2 = text.find('Σ Υ Ν Τ Α Γ Η', mk1)
-#     return text[mk1: mk2]
+def get_prescription_id(file: str) -> str:
+    file_name = file.split("/")[-1].split("\\")[-1]
+    return file_name.replace(".pdf", "").split("_")[0]
 
 
-def get_category_name(text: str) -> str:
-    mk1 = text.find("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ")
-    if mk1 != -1:
-        mk1 += len("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ")
-    else:
-        mk1 = text.find("ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ")
-        if mk1 != -1:
-            mk1 += len("ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ")
-        else:
-            mk1 = 4
-    mk2 = text.find("Σ Υ Ν Τ Α Γ Η", mk1)
-    return text[mk1:mk2].strip().replace("\n", " ")
-
-
-def get_names(text: str) -> tuple[str, str]:
-    doc_surname_start = text.find("ΕΠΩΝΥΜΟ :") + 10
-    doc_surname_end = text.find(" ΕΠΩΝΥΜΟ :", doc_surname_start)
-    patient_surname_end = text.find("\nΟΝΟΜΑ :", doc_surname_end)
-    patient_surname = text[doc_surname_end + 11 : patient_surname_end]
-    doc_surname = text[doc_surname_start:doc_surname_end]
-    doc_name_start = text.find("ΟΝΟΜΑ :") + 8
-    doc_name_end = text.find(" ΟΝΟΜΑ :", doc_name_start)
-    doc_name = text[doc_name_start:doc_name_end]
-    patient_name_end = text.find("\nΑ.Μ.Κ.Α.", doc_name_end)
-    patient_name = text[doc_name_end + 9 : patient_name_end]
-    return f"{doc_surname} {doc_name}", f"{patient_surname} {patient_name}"
-
-
-def find_unit(page: str) -> str:
-    mk1 = page.find("ΜΟΝΑΔΑ : ") + 9
-    mk2 = page.find(" ΔΙΕΥΘΥΝΣΗ", mk1)
-    return page[mk1:mk2]
-
-
-def find_insurance_amount(text: str, file: str, monitoring: Monitoring) -> Optional[float]:
-    phrase = "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΤΑΜΕΙΟ €"
-    start_pos = text.find(phrase)
-    if start_pos == -1:
-        monitoring.logger_adapter.exception(
-            f"Phrase '{phrase}' not found in text", SkippedException(ValueError(f"Phrase '{phrase}' not found in text"))
-        )
-        return None
-    value_start_pos = start_pos + len(phrase)
-    value_str = text[value_start_pos:].split("\n")[0].strip().replace(".", "").replace(",", ".")
+def extract_prescription_metadata(file: str, counter: int, monitoring: Monitoring) -> tuple[str, str, dict[str, Any]]:
+    """Return the prescription id, the last three IDIKA digits and the checks of a prescription pdf."""
+    prescription_id = ""
     try:
-        return float(value_str)
-    except ValueError as ve:
-        monitoring.logger_adapter.exception(
-            f"Failed to convert '{value_str}' to float in file: {file}", SkippedException(ve)
-        )
-        return None
-
-
-def find_patient_amount(text: str, file: str, monitoring: Monitoring) -> Optional[float]:
-    phrase = "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΑΣΦ/ΝΟ €"
-    start_pos = text.find(phrase)
-    if start_pos == -1:
-        monitoring.logger_adapter.exception(
-            f"Phrase '{phrase}' not found in text", SkippedException(ValueError(f"Phrase '{phrase}' not found in text"))
+        # Extract the prescription ID from the filename
+        file_name = file.split("/")[-1].split("\\")[-1]
+        prescription_id, execution = file_name.replace(".pdf", "").split("_")
+
+        # Extract the number of pages, the text content and the dosages table from the file
+        with PrescriptionPdf(file) as pdf:
+            pages, text, first_page_table = pdf.page_count, pdf.text, pdf.first_page_table
+
+        # Parse the last 3 digits and the other header fields from the text
+        header = parse_prescription_header(text, file, monitoring)
+        idika_3_digits = header.idika_3_digits
+        # monitoring.logger_adapter.info(f"idika three digits: {idika_3_digits}")
+        monitoring.logger_adapter.info(f"{counter} : {prescription_id}{idika_3_digits}")
+        # Populate the check with extracted data
+        check: dict[str, Any] = {
+            "pharmacist_idika_prescription_full": f"{prescription_id}{idika_3_digits}",
+            "document_type": "prescription",
+            "first_execution": True if int(idika_3_digits[-1]) in [0, 1] else False,
+            "is_digital": header.is_digital,
+            "unit": header.unit,
+            "category": header.category,
+            "category_name": header.category_name,
+            "is_prototype": header.is_prototype,
+            "dosages": pd.DataFrame(),
+            "doc_sign_found": 0,
+            "pharm_sign_found": 0,
+            "doc_stamps_found": 0,
+            "pharm_stamps_found": 0,
+            "pharm_sign_required": 0,
+            "doc_sign_required": 0,
+            "pharm_stamps_required": 0,
+            "doc_stamps_required": 0,
+            "pdf_file_name": file_name,
+            "execution": execution,
+            "pages": pages,
+            "insurance_amount": header.insurance_amount,
+            "patient_amount": header.patient_amount,
+            "missing_tapes": "",
+            "surplus_tapes": "",
+        }
+
+        # Doctor and patient names from the text
+        check["doc_name"], check["patient_name"] = header.doc_name, header.patient_name
+
+        # check['3_digits'].append(extract_3_digits(text))
+        check["dosages"] = extract_table(first_page_table)
+
+        # Extract patient contribution
+        patient_contrib = check["dosages"]["patient_part"].unique()
+
+        # Determine if the patient has 100% participation
+        check["participation_bool"] = bool(len(patient_contrib) == 1 and patient_contrib[0] == "100%")
+
+        # Store the patient's participation value
+        check["participation"] = patient_contrib[0] if len(patient_contrib) == 1 else ""
+
+        # Calculate the total paid by the patient
+        check["patient_paid"] = (
+            check["dosages"]["patient_contrib"]
+            # .str.replace(".", "")
+            # .str.replace(",", ".")
+            .apply(float).sum()
         )
-        return None
-    value_start_pos = start_pos + len(phrase)
-    value_str = text[value_start_pos:].split("\n")[0].strip().replace(".", "").replace(",", ".")
-    try:
-        return float(value_str)
-    except ValueError as ve:
-        monitoring.logger_adapter.exception(
-            f"Failed to convert '{value_str}' to float in file: {file}", SkippedException(ve)
+        # Calculate the total paid by the government
+        check["gov_paid"] = (
+            check["dosages"]["gov_contrib"]
+            # .str.replace(".", "")
+            # .str.replace(",", ".")
+            .apply(float).sum()
         )
-        return None
-
-
-def extract_metadata(
-    dir_list: list[str], specific_prescriptions: Optional[list[str]], monitoring: Monitoring
-) -> dict[str, Any]:
-    # Initialize the checks dictionary and aggregated_stats dictionary
-    monitoring.logger_adapter.info("The metadata extraction from pdfs has started")
-
-    if len(dir_list) == 0:
-        monitoring.logger_adapter.error("The pdf prescription folder is empty. Imminent crash.")
-
-    checks: defaultdict[str, Any] = defaultdict(lambda: {})
-    aggregated_stats: dict[str, Any] = {
-        "total_presciptions": 0,
-        "participation_bool": 0,
-        "categories": {1: 0, 2: 0, 3: 0, 4: 0, 8: 0},
-    }
-    counter = 0
 
-    for file in dir_list:
+        # Calculate the total number of coupons
         try:
-            counter = counter + 1
+            check["coupons"] = int(check["dosages"]["boxes_provided"].apply(int).sum())
+        except ValueError:
+            check["coupons"] = 0
 
-            # Extract the prescription ID from the filename
-            file_name = file.split("/")[-1].split("\\")[-1]
-            prescription_id, execution = file_name.replace(".pdf", "").split("_")
+    except Exception as e:
+        monitoring.logger_adapter.warning(f"Exception_extract_metadata :{e} for {prescription_id}")
+        monitoring.logger_adapter.exception(e)
+        raise ExtractMetadataFailedException(e)
+    return prescription_id, idika_3_digits, check
 
-            # If specific_prescriptions is not empty and prescription_id is
-            # not in specific_prescriptions, skip the current iteration
-            if specific_prescriptions and prescription_id not in specific_prescriptions:
-                continue
 
-            # Extract the number of pages and text content from the file
-            pages, text = extract_text(file)
-
-            # Extract the last 3 digits from the text
-            idika_3_digits = str(extract_3_digits(text))
-            # monitoring.logger_adapter.info(f"idika three digits: {idika_3_digits}")
-            monitoring.logger_adapter.info(f"{counter} : {prescription_id}{idika_3_digits}")
-            # Populate the checks dictionary with extracted data
-            checks[prescription_id][idika_3_digits] = {
-                "pharmacist_idika_prescription_full": f"{prescription_id}{idika_3_digits}",
-                "document_type": "prescription",
-                "first_execution": True if int(idika_3_digits[-1]) in [0, 1] else False,
-                "is_digital": is_immatereal(text),
-                "unit": find_unit(text),
-                "category": get_category(text),
-                "category_name": get_category_name(text),
-                "is_prototype": is_prototype(text),
-                "dosages": pd.DataFrame(),
-                "doc_sign_found": 0,
-                "pharm_sign_found": 0,
-                "doc_stamps_found": 0,
-                "pharm_stamps_found": 0,
-                "pharm_sign_required": 0,
-                "doc_sign_required": 0,
-                "pharm_stamps_required": 0,
-                "doc_stamps_required": 0,
-                "pdf_file_name": file_name,
-                "execution": execution,
-                "pages": pages,
-                "insurance_amount": find_insurance_amount(text, file, monitoring),
-                "patient_amount": find_patient_amount(text, file, monitoring),
-                "missing_tapes": "",
-                "surplus_tapes": "",
-            }
-
-            # Extract doctor and patient names from the text
-            (
-                checks[prescription_id][idika_3_digits]["doc_name"],
-                checks[prescription_id][idika_3_digits]["patient_name"],
-            ) = get_names(text)
-
-            # checks[prescription_id][idika_3_digits]['3_digits'].append(extract_3_digits(text))
-            checks[prescription_id][idika_3_digits]["dosages"] = extract_table(file)
-
-            # Extract patient contribution
-            patient_contrib = checks[prescription_id][idika_3_digits]["dosages"]["patient_part"].unique()
-
-            # Determine if the patient has 100% participation
-            checks[prescription_id][idika_3_digits]["participation_bool"] = bool(
-                len(patient_contrib) == 1 and patient_contrib[0] == "100%"
-            )
+@contextmanager
+def extract_metadata_pool(
+    parallel_config: dict[str, Any],
+    multiprocessing_controls: list[tuple[Manager, Pool, Queue]],  # type: ignore[valid-type, type-arg]
+    monitoring: Monitoring,
+) -> Iterator[Optional[Pool]]:  # type: ignore[valid-type]
+    """
+    Yield the pool of worker processes to pass to extract_metadata, None when the parallel mode is disabled.
+    The pool is shared by all the extract_metadata calls of the block and is closed when the block exits.
+    """
+    if not parallel_config["is_enabled"]:
+        yield None
+        return
+
+    num_processes = max(1, min(multiprocessing.cpu_count(), int(parallel_config["max_processes"])))
+    monitoring.logger_adapter.warning(f"Metadata extraction processes count : {num_processes}")
+    manager = multiprocessing.Manager()
+    logger_queue = manager.Queue()
+    pool = multiprocessing.Pool(
+        num_processes, initializer=_init_extract_metadata_worker, initargs=(monitoring, logger_queue)
+    )
+    multiprocessing_controls.append((manager, pool, logger_queue))
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.join()
+        log_queue(logger_queue)
 
-            # Store the patient's participation value
-            checks[prescription_id][idika_3_digits]["participation"] = (
-                patient_contrib[0] if len(patient_contrib) == 1 else ""
-            )
 
-            # Update aggregated_stats dictionary
-            aggregated_stats["total_presciptions"] += 1
-            aggregated_stats["categories"][checks[prescription_id][idika_3_digits]["category"]] += 1
-            if checks[prescription_id][idika_3_digits]["participation_bool"]:
-                aggregated_stats["participation_bool"] += 1
-
-            # Calculate the total paid by the patient
-            checks[prescription_id][idika_3_digits]["patient_paid"] = (
-                checks[prescription_id][idika_3_digits]["dosages"]["patient_contrib"]
-                # .str.replace(".", "")
-                # .str.replace(",", ".")
-                .apply(float).sum()
-            )
-            # Calculate the total paid by the government
-            checks[prescription_id][idika_3_digits]["gov_paid"] = (
-                checks[prescription_id][idika_3_digits]["dosages"]["gov_contrib"]
-                # .str.replace(".", "")
-                # .str.replace(",", ".")
-                .apply(float).sum()
-            )
+def _init_extract_metadata_worker(monitoring: Monitoring, logger_queue: Queue[Any]) -> None:
+    global _worker_monitoring
+    # add a handler that uses the shared queue
+    logger = logging.getLogger("")
+    monitoring.config_azure_monitor(logger=logger)
+    logger.addHandler(QueueHandler(logger_queue))
+    _worker_monitoring = monitoring
+    _reload_product_catalogue(monitoring)
 
-            # Calculate the total number of coupons
-            try:
-                checks[prescription_id][idika_3_digits]["coupons"] = int(
-                    checks[prescription_id][idika_3_digits]["dosages"]["boxes_provided"].apply(int).sum()
-                )
-            except ValueError:
-                checks[prescription_id][idika_3_digits]["coupons"] = 0
 
-        except Exception as e:
-            monitoring.logger_adapter.warning(f"Exception_extract_metadata :{e} for {prescription_id}")
-            monitoring.logger_adapter.exception(e)
-            raise ExtractMetadataFailedException(e)
-        ipython_clear_output()
-    return checks
+def _reload_product_catalogue(monitoring: Monitoring) -> None:
+    # The product list file can change between the runs of the application
+    try:
+        if reload_product_catalogue():
+            monitoring.logger_adapter.info("The product catalogue has been reloaded")
+    except (OSError, ValueError) as e:
+        monitoring.logger_adapter.warning(f"The product list file could not be read, the catalogue is kept: {e}")
+
+
+def _extract_prescription_metadata_in_worker(counter_and_file: tuple[int, str]) -> tuple[str, str, dict[str, Any]]:
+    assert _worker_monitoring is not None, "extract metadata worker was not initialised"
+    counter, file = counter_and_file
+    return extract_prescription_metadata(file, counter, _worker_monitoring)
+
+
+def create_dosages_df(past_partial_exec_checks: dict[str, Any], current_day_checks: dict[str, Any]) -> DataFrame:
+    """
+    The dosages tables of the past partial executions and of the current day in one dataframe.
+    The dosage check of every row is over the boxes provided by all the executions of its prescription.
+    """
+    tables = [
+        (is_past_partial_exec, prescription_id, three_digits, data["dosages"])
+        for is_past_partial_exec, checks in [(True, past_partial_exec_checks), (False, current_day_checks)]
+        for prescription_id, check in checks.items()
+        for three_digits, data in check.items()
+    ]
+    if not tables:
+        dosages_df = pd.DataFrame([])
+    else:
+        # Concatenated once, growing the dataframe one table at a time copies every row it already has,
+        # and the columns identifying the table of each row are repeated over the rows instead of set on every table
+        is_past_partial_exec, prescriptions, three_digits, dosages = zip(*tables)
+        lengths = [len(table) for table in dosages]
+        dosages_df = pd.concat(dosages, axis=0)
+        dosages_df["is_past_partial_exec"] = np.repeat(is_past_partial_exec, lengths)
+        dosages_df["prescription"] = np.repeat(np.array(prescriptions, dtype=object), lengths)
+        dosages_df["scan_last_three_digits"] = np.repeat(np.array(three_digits, dtype=object), lengths)
+
+    # Group by 'prescription' and 'description' and sum
+    # the 'boxes_provided' column
+    grouped_df = dosages_df.groupby(["prescription", "description"], as_index=False).agg({"boxes_provided": "sum"})
+    # Rename the aggregated column
+    grouped_df = grouped_df.rename(columns={"boxes_provided": "boxes_provided_multiple_executions"})
+    # Merge the grouped data with the original data
+    dosages_df = dosages_df.merge(grouped_df, on=["prescription", "description"], how="inner")
+    # Generate the dosage check of each row
+    dosages_df["dosage_check"] = generate_dosage_checks(
+        dosages_df["boxes_provided_multiple_executions"],
+        dosages_df["boxes_required"],
+        dosages_df["dosage"],
+        dosages_df["dosage_qnt"],
+    )
+    dosages_df["dosage"] = dosages_df["dosage"].astype(str)
+    return dosages_df
 
 
 def create_pages_df(
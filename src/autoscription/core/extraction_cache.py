@@ -0,0 +1,84 @@
+"""
+Cache of the metadata extracted from the prescription pdfs.
+
+Usage: python -m src.autoscription.core.extraction_cache {info,clear} [--directory DIR]
+"""
+
+from __future__ import annotations
+
+import hashlib
+from io import BytesIO
+from typing import Any, Optional
+
+import pandas as pd
+
+from src.autoscription.core.config import get_extraction_cache_dir
+from src.autoscription.core.disk_cache import DiskCache, run_cache_command
+from src.autoscription.dosage_extractor.product_number_extractor import (
+    product_catalogue_version,
+)
+
+# Bump whenever extract_prescription_metadata changes what it extracts, the entries of older versions are not read
+EXTRACTION_PARSER_VERSION = 1
+
+
+class ExtractionCache(DiskCache):
+    """
+    What extract_prescription_metadata returned for a pdf, keyed by the file name, content hash and parser version.
+    The key also holds the version of the product catalogue, whose products give the boxes of the dosages.
+    A pdf downloaded from IDIKA never changes, so reruns of a day and the lookups of
+    past partial executions only parse the pdfs they have not seen before. The dosages table is stored as parquet,
+    the rest of the metadata is pickled.
+    """
+
+    @classmethod
+    def from_config(cls, cache_config: dict[str, Any]) -> Optional[ExtractionCache]:
+        if not cache_config["is_enabled"]:
+            return None
+        return cls(get_extraction_cache_dir(), size_limit_mb=cache_config["size_limit_mb"])
+
+    @staticmethod
+    def key(file: str) -> str:
+        with open(file, "rb") as pdf:
+            content_hash = hashlib.sha256(pdf.read()).hexdigest()
+        # The prescription id and the execution are read from the file name
+        file_name = file.split("/")[-1].split("\\")[-1]
+        return f"{EXTRACTION_PARSER_VERSION}:{product_catalogue_version()}:{file_name}:{content_hash}"
+
+    def lookup(self, file: str) -> tuple[str, Optional[tuple[str, str, dict[str, Any]]]]:
+        """Return the key and the cached extraction of a pdf, a pdf that can not be read is left to the extraction."""
+        try:
+            key = self.key(file)
+        except OSError:
+            return "", None
+        return key, self.get(key)
+
+    def get(self, key: str) -> Optional[tuple[str, str, dict[str, Any]]]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        prescription_id, idika_3_digits, check, dosages = entry
+        return prescription_id, idika_3_digits, {**check, "dosages": pd.read_parquet(BytesIO(dosages))}
+
+    def set(self, key: str, extracted: tuple[str, str, dict[str, Any]]) -> bool:
+        """Add the extraction of a pdf, return False if its dosages table can not be stored as parquet."""
+        prescription_id, idika_3_digits, check = extracted
+        try:
+            dosages = check["dosages"].to_parquet()
+        except (TypeError, ValueError):
+            # a column mixing types that parquet can not store
+            return False
+        metadata = {name: value for name, value in check.items() if name != "dosages"}
+        self.cache.set(key, (prescription_id, idika_3_digits, metadata, dosages))
+        return True
+
+    def versions(self) -> dict[str, int]:
+        return {"parser version": EXTRACTION_PARSER_VERSION}
+
+
+def main() -> None:
+    run_cache_command(__doc__, ExtractionCache, get_extraction_cache_dir())
+
+
+if __name__ == "__main__":
+    main()
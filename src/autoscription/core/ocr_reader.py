@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import gc
+import os
+import threading
+from typing import Optional
+
+import easyocr
+
+from src.autoscription.core.config import get_weights_dir
+from src.autoscription.core.errors import RetriedException, SkippedException
+from src.autoscription.core.logging import Monitoring
+
+
+def create_ocr_reader(monitoring: Monitoring) -> easyocr.Reader:
+    try:
+        return easyocr.Reader(["en"], str(get_weights_dir()))
+    except Exception as e:
+        monitoring.logger_adapter.error("Failed to Initialize OCR Reader, Retrying...")
+        monitoring.logger_adapter.exception(RetriedException(e))
+        gc.collect()
+        return easyocr.Reader(["en"], str(get_weights_dir()))
+
+
+class OcrReaderService:
+    """
+    Holds the OCR reader of the process, shared by all the runs of the session.
+    The model is loaded on the first OCR request, or earlier by a background pre-warm,
+    so runs where every barcode is decoded without OCR never pay for loading it.
+    """
+
+    _reader: Optional[easyocr.Reader]
+    _lock: threading.Lock
+    _prewarm_thread: Optional[threading.Thread]
+
+    def __init__(self) -> None:
+        self._reader = None
+        self._lock = threading.Lock()
+        self._prewarm_thread = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._reader is not None
+
+    def get(self, monitoring: Monitoring) -> easyocr.Reader:
+        with self._lock:
+            if self._reader is None:
+                monitoring.logger_adapter.info("Loading the OCR reader")
+                self._reader = create_ocr_reader(monitoring)
+            return self._reader
+
+    def prewarm(self, monitoring: Monitoring) -> None:
+        """Load the model in a background thread, unless it is already loaded or loading."""
+        if self.is_loaded or (self._prewarm_thread is not None and self._prewarm_thread.is_alive()):
+            return
+        self._prewarm_thread = threading.Thread(
+            target=self._prewarm, args=(monitoring,), name="ocr-reader-prewarm", daemon=True
+        )
+        self._prewarm_thread.start()
+
+    def _prewarm(self, monitoring: Monitoring) -> None:
+        try:
+            self.get(monitoring)
+        except Exception as e:
+            # The reader will be loaded again on the first OCR request
+            monitoring.logger_adapter.warning("Failed to pre-warm the OCR reader")
+            monitoring.logger_adapter.exception(SkippedException(e))
+
+    def _after_fork_in_child(self) -> None:
+        # A forked process does not inherit the pre-warm thread, which may have held the lock at fork time
+        self._lock = threading.Lock()
+        self._prewarm_thread = None
+
+
+ocr_reader_service = OcrReaderService()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ocr_reader_service._after_fork_in_child)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+from src.autoscription.core.errors import SkippedException
+from src.autoscription.core.logging import Monitoring
+
+INSURANCE_AMOUNT_PHRASE = "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΤΑΜΕΙΟ €"
+PATIENT_AMOUNT_PHRASE = "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΑΣΦ/ΝΟ €"
+IMMATERIAL_PHRASE = "Άυλη συνταγογράφηση"
+PROTOTYPE_PHRASE = "επιθυμώ να λάβω ακριβότερο φάρμακο"
+
+
+class PrescriptionHeader(NamedTuple):
+    """The fields of the text of a prescription pdf that are not in its dosages table."""
+
+    idika_3_digits: str
+    is_digital: bool
+    unit: str
+    category: Optional[int]
+    category_name: str
+    # TODO: update to bool instead of int
+    is_prototype: int
+    doc_name: str
+    patient_name: str
+    insurance_amount: Optional[float]
+    patient_amount: Optional[float]
+
+
+def parse_prescription_header(text: str, file: str, monitoring: Monitoring) -> PrescriptionHeader:
+    """
+    Parse the header fields of the text of a prescription pdf.
+    Every field is located by the first occurrence of its label, so the search stops in the header for most of them,
+    and only the line of a field is read, the text is never split into lines.
+    """
+    doc_name, patient_name = _names(text)
+    return PrescriptionHeader(
+        idika_3_digits=_3_digits(text),
+        is_digital=IMMATERIAL_PHRASE in text,
+        unit=_unit(text),
+        category=_category(text),
+        category_name=_category_name(text),
+        is_prototype=1 if PROTOTYPE_PHRASE in text else 0,
+        doc_name=doc_name,
+        patient_name=patient_name,
+        insurance_amount=_amount(text, INSURANCE_AMOUNT_PHRASE, file, monitoring),
+        patient_amount=_amount(text, PATIENT_AMOUNT_PHRASE, file, monitoring),
+    )
+
+
+def _line_end(text: str, start: int) -> int:
+    end = text.find("\n", start)
+    return len(text) if end == -1 else end
+
+
+def _3_digits(text: str) -> str:
+    result = text[: text.find("ΘΕΡΑΠΕΙΑ :")][-3:]
+    if result.isdigit():
+        return result
+    return text[: text.find("ΕΠΑΝΑΛΗΨΗ :")][-3:]
+
+
+def _category(text: str) -> Optional[int]:
+    position = text.find("ΕΩΣ :")
+    if position == -1:
+        return None
+    line = text[text.rfind("\n", 0, position) + 1 : _line_end(text, position)]
+    try:
+        return int(line.split("/")[-1].strip()[2])
+    except IndexError:
+        return 8
+
+
+def _category_name(text: str) -> str:
+    mk1 = text.find("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ")
+    if mk1 != -1:
+        mk1 += len("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ")
+    else:
+        mk1 = text.find("ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ")
+        if mk1 != -1:
+            mk1 += len("ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ")
+        else:
+            mk1 = 4
+    mk2 = text.find("Σ Υ Ν Τ Α Γ Η", mk1)
+    return text[mk1:mk2].strip().replace("\n", " ")
+
+
+def _names(text: str) -> tuple[str, str]:
+    # The labels of the doctor and of the patient share a line, the doctor's come first
+    doc_surname_start = text.find("ΕΠΩΝΥΜΟ :") + 10
+    doc_surname_end = text.find(" ΕΠΩΝΥΜΟ :", doc_surname_start)
+    patient_surname_end = text.find("\nΟΝΟΜΑ :", doc_surname_end)
+    patient_surname = text[doc_surname_end + 11 : patient_surname_end]
+    doc_surname = text[doc_surname_start:doc_surname_end]
+    doc_name_start = text.find("ΟΝΟΜΑ :") + 8
+    doc_name_end = text.find(" ΟΝΟΜΑ :", doc_name_start)
+    doc_name = text[doc_name_start:doc_name_end]
+    patient_name_end = text.find("\nΑ.Μ.Κ.Α.", doc_name_end)
+    patient_name = text[doc_name_end + 9 : patient_name_end]
+    return f"{doc_surname} {doc_name}", f"{patient_surname} {patient_name}"
+
+
+def _unit(text: str) -> str:
+    mk1 = text.find("ΜΟΝΑΔΑ : ") + 9
+    mk2 = text.find(" ΔΙΕΥΘΥΝΣΗ", mk1)
+    return text[mk1:mk2]
+
+
+def _amount(text: str, phrase: str, file: str, monitoring: Monitoring) -> Optional[float]:
+    start_pos = text.find(phrase)
+    if start_pos == -1:
+        monitoring.logger_adapter.exception(
+            f"Phrase '{phrase}' not found in text", SkippedException(ValueError(f"Phrase '{phrase}' not found in text"))
+        )
+        return None
+    value_start_pos = start_pos + len(phrase)
+    value_str = text[value_start_pos : _line_end(text, value_start_pos)].strip().replace(".", "").replace(",", ".")
+    try:
+        return float(value_str)
+    except ValueError as ve:
+        monitoring.logger_adapter.exception(
+            f"Failed to convert '{value_str}' to float in file: {file}", SkippedException(ve)
+        )
+        return None
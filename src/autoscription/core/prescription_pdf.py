@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from io import BytesIO
+from types import TracebackType
+from typing import Optional
+
+import pdfplumber
+from PyPDF2 import PdfReader
+
+
+class PrescriptionPdf:
+    """
+    A prescription pdf downloaded from IDIKA, read from disk once.
+    The text comes from PyPDF2, whose layout the text parsers of extract_metadata rely on,
+    and the first page table from pdfplumber. Both parse the same in-memory copy of the file
+    only when first asked for, and everything is released when the context exits.
+
+    Usage:
+        with PrescriptionPdf(file_name) as pdf:
+            pages, text, table = pdf.page_count, pdf.text, pdf.first_page_table
+    """
+
+    file_name: str
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self._content: Optional[bytes] = None
+        self._reader: Optional[PdfReader] = None
+        self._text: Optional[str] = None
+        self._first_page_table: Optional[list[list[Optional[str]]]] = None
+
+    def __enter__(self) -> PrescriptionPdf:
+        with open(self.file_name, "rb") as file:
+            self._content = file.read()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],  # noqa: U100
+        exc_val: Optional[BaseException],  # noqa: U100
+        exc_tb: Optional[TracebackType],  # noqa: U100
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._content = None
+        self._reader = None
+
+    def __read_content(self) -> BytesIO:
+        if self._content is None:
+            raise ValueError(f"{self.file_name} is not open, use PrescriptionPdf as a context manager")
+        return BytesIO(self._content)
+
+    def __pdf_reader(self) -> PdfReader:
+        if self._reader is None:
+            self._reader = PdfReader(self.__read_content())
+        return self._reader
+
+    @property
+    def page_count(self) -> int:
+        return len(self.__pdf_reader().pages)
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(page.extract_text() + "\n" for page in self.__pdf_reader().pages)
+        return self._text
+
+    @property
+    def first_page_table(self) -> list[list[Optional[str]]]:
+        """The rows of the first table of the first page."""
+        if self._first_page_table is None:
+            with pdfplumber.open(self.__read_content()) as pdf:
+                self._first_page_table = pdf.pages[0].extract_table()
+        return self._first_page_table
@@ -1,4 +1,5 @@
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
 from src.autoscription.core.errors import (
     IdikaWrongStatusCodeException,
@@ -14,6 +15,9 @@ from src.autoscription.idika_client.model.mt.partial_clinical_document import (
     PartialClinicalDocument,
 )
 
+T = TypeVar("T")
+D = TypeVar("D")
+
 
 class ClinicalDocumentRetriever:
     """
@@ -23,14 +27,20 @@ class ClinicalDocumentRetriever:
     associated with given prescription IDs. It handles various exceptions that may
     occur during the retrieval and parsing of the clinical documents, and logs
     these exceptions using a monitoring system.
+
+    Multiple clinical documents are retrieved by up to max_in_flight threads at a time,
+    sharing the session and the rate limit of the http client of the Idika API client.
+    Only the requests run concurrently, the responses are parsed one at a time.
     """
 
     idika_api_client: IdikaAPIClient
     monitoring: Monitoring
+    max_in_flight: int
 
-    def __init__(self, idika_api_client: IdikaAPIClient, monitoring: Monitoring):
+    def __init__(self, idika_api_client: IdikaAPIClient, monitoring: Monitoring, max_in_flight: int = 1):
         self.idika_api_client = idika_api_client
         self.monitoring = monitoring
+        self.max_in_flight = max_in_flight
 
     def retrieve_clinical_document(self, prescription_id: str) -> ClinicalDocument:
         try:
@@ -48,33 +58,7 @@ class ClinicalDocumentRetriever:
             raise e
 
     def retrieve_clinical_documents(self, prescription_ids: List[str]) -> List[ClinicalDocument]:
-        retrieved_documents = []
-        failed_to_retrieve_documents = []
-        for p in prescription_ids:
-            try:
-                retrieved_documents.append(self.retrieve_clinical_document(p))
-            except Exception as e:
-                self.monitoring.logger_adapter.exception(RetriedException(e))
-                self.monitoring.logger_adapter.error(f"Failed to retrieve prescription {p}")
-                failed_to_retrieve_documents.append(p)
-
-        for f in failed_to_retrieve_documents:
-            try:
-                retrieved_documents.append(self.retrieve_clinical_document(f))
-                failed_to_retrieve_documents.remove(f)
-            except Exception as e:
-                self.monitoring.logger_adapter.exception(e)
-                self.monitoring.logger_adapter.error(f"Failed to retrieve prescription {f}")
-
-        if failed_to_retrieve_documents:
-            self.monitoring.logger_adapter.exception(
-                "Failed to retrieve the following prescriptions: " f"{failed_to_retrieve_documents}"
-            )
-            self.monitoring.logger_adapter.error(
-                "Failed to retrieve the following prescriptions: " f"{failed_to_retrieve_documents}"
-            )
-
-        return retrieved_documents
+        return self._retrieve_retrying_once(self.retrieve_clinical_document, prescription_ids, "prescription")
 
     def retrieve_partial_clinical_document(self, prescription_id: str, execution: int) -> PartialClinicalDocument:
         try:
@@ -98,34 +82,59 @@ class ClinicalDocumentRetriever:
     def retrieve_partial_clinical_documents(
         self, prescription_details: List[Dict[str, Any]]
     ) -> List[PartialClinicalDocument]:
-        retrieved_partial_documents = []
-        failed_to_retrieve_partial_documents = []
-        for d in prescription_details:
-            try:
-                retrieved_partial_documents.append(
-                    self.retrieve_partial_clinical_document(d["prescription"], int(d["execution"]))
-                )
-            except Exception as e:
-                self.monitoring.logger_adapter.exception(RetriedException(e))
-                self.monitoring.logger_adapter.error(f"Failed to retrieve partial prescription {d}")
-                failed_to_retrieve_partial_documents.append(d)
-
-        for fd in failed_to_retrieve_partial_documents:
-            try:
-                retrieved_partial_documents.append(
-                    self.retrieve_partial_clinical_document(fd["prescription"], int(fd["execution"]))
-                )
-                failed_to_retrieve_partial_documents.remove(fd)
-            except Exception as e:
-                self.monitoring.logger_adapter.exception(e)
-                self.monitoring.logger_adapter.error(f"Failed to retrieve partial prescription {fd}")
-
-        if failed_to_retrieve_partial_documents:
+        return self._retrieve_retrying_once(
+            lambda d: self.retrieve_partial_clinical_document(d["prescription"], int(d["execution"])),
+            prescription_details,
+            "partial prescription",
+        )
+
+    def _retrieve_retrying_once(self, retrieve: Callable[[T], D], items: List[T], name: str) -> List[D]:
+        """
+        Retrieve the document of every item, then retry once the items that failed.
+        The documents retrieved at the first attempt come first and the retried ones after them, in the order of the
+        items either way.
+        """
+        retrieved_documents = []
+        failed_items = []
+        for item, (document, error) in zip(items, self._attempt_all(retrieve, items)):
+            if error is None:
+                retrieved_documents.append(document)
+            else:
+                self.monitoring.logger_adapter.exception(RetriedException(error))
+                self.monitoring.logger_adapter.error(f"Failed to retrieve {name} {item}")
+                failed_items.append(item)
+
+        failed_to_retrieve_items = []
+        for item, (document, error) in zip(failed_items, self._attempt_all(retrieve, failed_items)):
+            if error is None:
+                retrieved_documents.append(document)
+            else:
+                self.monitoring.logger_adapter.exception(error)
+                self.monitoring.logger_adapter.error(f"Failed to retrieve {name} {item}")
+                failed_to_retrieve_items.append(item)
+
+        if failed_to_retrieve_items:
             self.monitoring.logger_adapter.exception(
-                "Failed to retrieve the following partial prescriptions: " f"{failed_to_retrieve_partial_documents}"
+                f"Failed to retrieve the following {name}s: {failed_to_retrieve_items}"
             )
             self.monitoring.logger_adapter.error(
-                "Failed to retrieve the following partial prescriptions: " f"{failed_to_retrieve_partial_documents}"
+                f"Failed to retrieve the following {name}s: {failed_to_retrieve_items}"
             )
 
-        return retrieved_partial_documents
+        return retrieved_documents  # type: ignore[return-value]  # no error means a document
+
+    def _attempt_all(self, retrieve: Callable[[T], D], items: List[T]) -> List[Tuple[Optional[D], Optional[Exception]]]:
+        """The document or the error of every item, at most max_in_flight of them retrieved at a time."""
+
+        def attempt(item: T) -> Tuple[Optional[D], Optional[Exception]]:
+            try:
+                return retrieve(item), None
+            except Exception as e:
+                return None, e
+
+        if self.max_in_flight <= 1 or len(items) <= 1:
+            return [attempt(item) for item in items]
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_in_flight, len(items)), thread_name_prefix="clinical-documents"
+        ) as executor:
+            return list(executor.map(attempt, items))
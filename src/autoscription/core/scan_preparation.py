@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+from collections import Counter
+from collections.abc import Callable, Generator
+from dataclasses import asdict, dataclass
+from logging.handlers import QueueHandler
+from multiprocessing import Manager, Pool, Queue
+from pathlib import Path
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from pyzbar.pyzbar import Decoded, decode
+
+from src.autoscription.core.errors import SkippedException
+from src.autoscription.core.logging import Monitoring, log_queue
+from src.autoscription.core.ocr_reader import ocr_reader_service
+from src.autoscription.core.utils import get_barcodes_ocr_batched
+
+# Share of the page height, starting from the top, that contains the prescription barcode
+TOP_BAND_HEIGHT_RATIO = 0.25
+OCR_STAGE = "ocr"
+# The scans that no stage could decode wait for the batched OCR at the end of the preparation
+PENDING_OCR_STAGE = "pending_ocr"
+BLANK_PAGE_STAGE = "blank_page"
+# The scans that could not be read as an image are kept without a barcode and are not sent to OCR either
+UNREADABLE_STAGE = "unreadable"
+
+# A page whose binarised average pixel density is above this value is considered blank
+BLANK_PAGE_DENSITY_THRESHOLD = 254
+# Only every n-th pixel, in both axes, of the page is used to decide if it is blank
+BLANK_PAGE_THUMBNAIL_STEP = 4
+
+SCAN_INDEX_COLUMNS = ["id", "stack_number", "prescription_scanned_pages", "probable_barcodes", "old_filname"]
+SCAN_MANIFEST_FILE = "scan_manifest.json"
+
+# Below this number of scans the process start-up cost outweighs the parallel gain
+MIN_SCANS_FOR_PARALLEL_DECODING = 8
+
+# Per worker process state, populated by _init_decode_worker
+_worker_monitoring: Optional[Monitoring] = None
+_worker_scan_preparation_config: dict[str, Any] = {}
+
+
+@dataclass
+class ScanDecodeResult:
+    barcode: str
+    probable_barcodes: str
+    stage: str
+
+
+def retrieve_prescription_barcodes(filepath: Path, img: NDArray, monitoring: Monitoring) -> list[Decoded]:
+    try:
+        detected_barcodes = decode(img)
+    except Exception as e:
+        monitoring.logger_adapter.error(f"Failed to Decode Barcode, Skipping barcode detection for {filepath}")
+        monitoring.logger_adapter.exception(SkippedException(e))
+        detected_barcodes = []
+    prescription_barcodes = [
+        barcode
+        for barcode in detected_barcodes
+        if len(barcode.data.decode("utf-8")) == 16
+        or (barcode.type == "CODE128" and len(barcode.data.decode("utf-8")) == 13)
+    ]
+    return prescription_barcodes
+
+
+def thumbnail_pixel_density(img: NDArray) -> float:
+    """
+    Average pixel density of the binarised page, estimated on a nearest neighbour thumbnail.
+    Nearest neighbour keeps the dark pixels dark, unlike area averaging which would fade small marks.
+    """
+    thumbnail = cv2.resize(
+        img,
+        None,
+        fx=1 / BLANK_PAGE_THUMBNAIL_STEP,
+        fy=1 / BLANK_PAGE_THUMBNAIL_STEP,
+        interpolation=cv2.INTER_NEAREST,
+    )
+    _, thumbnail_adj = cv2.threshold(cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY), 180, 255, cv2.THRESH_BINARY)
+    return float(np.average(thumbnail_adj))
+
+
+def barcode_regions(img: NDArray, scan_preparation_config: dict[str, Any]) -> list[NDArray]:
+    """Grayscale crops of the page regions where the prescription barcode is printed."""
+    # The regions are clipped to the page, the ones outside a small or low resolution page are skipped
+    crops = [img[top:bottom, left:right] for left, top, right, bottom in scan_preparation_config["barcode_regions"]]
+    return [cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) for crop in crops if crop.size > 0]
+
+
+def top_band_gray(img: NDArray, scan_preparation_config: dict[str, Any]) -> list[NDArray]:  # noqa: U100
+    """The prescription barcode is always printed on the top band of the page, a grayscale crop is enough."""
+    return [cv2.cvtColor(img[: int(img.shape[0] * TOP_BAND_HEIGHT_RATIO)], cv2.COLOR_BGR2GRAY)]
+
+
+def threshold_210(img: NDArray, scan_preparation_config: dict[str, Any]) -> list[NDArray]:  # noqa: U100
+    return [cv2.threshold(img, 210, 255, cv2.THRESH_BINARY)[1]]
+
+
+def threshold_220(img: NDArray, scan_preparation_config: dict[str, Any]) -> list[NDArray]:  # noqa: U100
+    # Probability that a vertical strike exists
+    return [cv2.threshold(img, 220, 255, cv2.THRESH_BINARY)[1]]
+
+
+def threshold_180(img: NDArray, scan_preparation_config: dict[str, Any]) -> list[NDArray]:  # noqa: U100
+    return [cv2.threshold(img, 180, 255, cv2.THRESH_BINARY)[1]]
+
+
+# Each stage turns the scanned page into the candidate images that pyzbar will search
+barcode_decoding_stages: dict[str, Callable[[NDArray, dict[str, Any]], list[NDArray]]] = {
+    "barcode_regions": barcode_regions,
+    "top_band_gray": top_band_gray,
+    "threshold_210": threshold_210,
+    "threshold_220": threshold_220,
+    "threshold_180": threshold_180,
+}
+
+
+def decode_scan(filepath: Path, scan_preparation_config: dict[str, Any], monitoring: Monitoring) -> ScanDecodeResult:
+    """
+    Decode the prescription barcode of a single scan.
+    The scan is read once: blank pages are recognised on a thumbnail of the decoded image
+    and are not searched for barcodes. The configured stages are tried in order and
+    each stage image is computed only when all the previous stages failed.
+    If no stage yields a prescription barcode, the scan is left for the batched OCR
+    fallback, see read_pending_barcodes_ocr.
+    """
+    img = cv2.imread(filepath.as_posix())
+    if img is None:
+        monitoring.logger_adapter.warning(f"Could not read image: {filepath}")
+        return ScanDecodeResult(barcode="", probable_barcodes="", stage=UNREADABLE_STAGE)
+    pixel_density = thumbnail_pixel_density(img)
+    if pixel_density > BLANK_PAGE_DENSITY_THRESHOLD:
+        monitoring.logger_adapter.warning(
+            f"{filepath} is a blank page with an Average Pixel Density of {pixel_density}"
+        )
+        return ScanDecodeResult(barcode="", probable_barcodes="", stage=BLANK_PAGE_STAGE)
+    for stage in scan_preparation_config["barcode_stages"]:
+        for candidate in barcode_decoding_stages[stage](img, scan_preparation_config):
+            prescription_barcodes = retrieve_prescription_barcodes(filepath, candidate, monitoring)
+            if prescription_barcodes:
+                return ScanDecodeResult(
+                    barcode=prescription_barcodes.pop().data.decode("utf-8"), probable_barcodes="", stage=stage
+                )
+    return ScanDecodeResult(barcode="", probable_barcodes="", stage=PENDING_OCR_STAGE)
+
+
+def read_pending_barcodes_ocr(
+    filepaths: list[Path],
+    decoded_scans: list[ScanDecodeResult],
+    scan_preparation_config: dict[str, Any],
+    monitoring: Monitoring,
+) -> list[ScanDecodeResult]:
+    """
+    Read with OCR, in batches, the barcodes of the scans that are pending OCR.
+    The other decoded scans are returned as they are, the OCR model is loaded only if a scan needs it.
+    """
+    pending = [index for index, decoded_scan in enumerate(decoded_scans) if decoded_scan.stage == PENDING_OCR_STAGE]
+    if not pending:
+        return decoded_scans
+    monitoring.logger_adapter.info(f"Reading {len(pending)} barcodes with OCR")
+    ocr_results = get_barcodes_ocr_batched(
+        ocr_reader_service.get(monitoring),
+        [filepaths[index] for index in pending],
+        batch_size=scan_preparation_config["ocr_batch_size"],
+        monitoring=monitoring,
+    )
+    resolved_scans = list(decoded_scans)
+    for index, (barcode, probable_barcodes) in zip(pending, ocr_results):
+        resolved_scans[index] = ScanDecodeResult(barcode=barcode, probable_barcodes=probable_barcodes, stage=OCR_STAGE)
+    return resolved_scans
+
+
+class BarcodeStageStats:
+    """Counts which decoding stage found the barcode of each scan."""
+
+    hits: Counter[str]
+    total: int
+
+    def __init__(self) -> None:
+        self.hits = Counter()
+        self.total = 0
+
+    def add(self, stage: str) -> None:
+        self.hits[stage] += 1
+        self.total += 1
+
+    def hit_rates(self) -> dict[str, float]:
+        return {stage: round(hits / self.total, 3) for stage, hits in self.hits.most_common()}
+
+
+class ScanIndexBuilder:
+    """Collects the rows of the scans index in plain lists and materialises the index DataFrame once."""
+
+    columns: dict[str, list[Any]]
+    barcode_counts: Counter[str]
+
+    def __init__(self) -> None:
+        self.columns = {column: [] for column in SCAN_INDEX_COLUMNS}
+        self.barcode_counts = Counter()
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def count(self, barcode: str) -> int:
+        return self.barcode_counts[barcode]
+
+    def add(
+        self,
+        barcode: str,
+        stack_number: int,
+        prescription_scanned_pages: str,
+        probable_barcodes: str,
+        old_filename: str,
+    ) -> None:
+        for column, value in zip(
+            SCAN_INDEX_COLUMNS, [barcode, stack_number, prescription_scanned_pages, probable_barcodes, old_filename]
+        ):
+            self.columns[column].append(value)
+        self.barcode_counts[barcode] += 1
+
+    def prescription_scanned_pages(self) -> set[str]:
+        return set(self.columns["prescription_scanned_pages"])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns, columns=SCAN_INDEX_COLUMNS)
+
+
+def file_content_hash(filepath: Path) -> str:
+    return hashlib.sha256(filepath.read_bytes()).hexdigest()
+
+
+@dataclass
+class ScanManifestEntry:
+    barcode: str
+    probable_barcodes: str
+    stage: str
+    prescription_scanned_pages: str
+
+    def to_decode_result(self) -> ScanDecodeResult:
+        return ScanDecodeResult(barcode=self.barcode, probable_barcodes=self.probable_barcodes, stage=self.stage)
+
+
+class ScanManifest:
+    """
+    The decoded barcode and the target file of every prepared scan, keyed by the content hash of the scan.
+    It is saved next to the scans index every few scans, so that a preparation that is interrupted
+    or repeated with a few more pages decodes only the scans that it has not seen before.
+    """
+
+    path: Path
+    save_every: int
+    entries: dict[str, ScanManifestEntry]
+    unsaved_entries: int
+
+    def __init__(self, path: Path, save_every: int) -> None:
+        self.path = path
+        self.save_every = save_every
+        self.entries = {}
+        self.unsaved_entries = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path: Path, save_every: int, monitoring: Monitoring) -> ScanManifest:
+        manifest = cls(path, save_every)
+        if path.exists():
+            try:
+                with open(path, encoding="utf-8") as manifest_file:
+                    manifest.entries = {
+                        content_hash: ScanManifestEntry(**entry)
+                        for content_hash, entry in json.load(manifest_file).items()
+                    }
+            except (ValueError, TypeError) as e:
+                monitoring.logger_adapter.warning(f"Ignoring unreadable scan manifest {path}")
+                monitoring.logger_adapter.exception(SkippedException(e))
+                manifest.entries = {}
+        return manifest
+
+    def get(self, content_hash: str) -> Optional[ScanManifestEntry]:
+        return self.entries.get(content_hash)
+
+    def add(self, content_hash: str, entry: ScanManifestEntry) -> None:
+        self.entries[content_hash] = entry
+        self.unsaved_entries += 1
+        if self.unsaved_entries >= self.save_every:
+            self.save()
+
+    def keep_only(self, content_hashes: set[str]) -> None:
+        self.entries = {
+            content_hash: entry for content_hash, entry in self.entries.items() if content_hash in content_hashes
+        }
+
+    def save(self) -> None:
+        # Write aside and rename, so that a crash while writing never leaves a truncated manifest
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump({content_hash: asdict(entry) for content_hash, entry in self.entries.items()}, manifest_file)
+        os.replace(temp_path, self.path)
+        self.unsaved_entries = 0
+
+
+def record_decoded_scan(
+    manifest: ScanManifest,
+    filepath: Path,
+    content_hash: str,
+    decoded_scan: ScanDecodeResult,
+    monitoring: Monitoring,
+) -> bool:
+    """Record a freshly decoded scan in the manifest, or delete it if it is a blank page. Return if it is kept."""
+    if decoded_scan.stage == BLANK_PAGE_STAGE:
+        os.remove(filepath)
+        monitoring.logger_adapter.warning(f"{filepath} was deleted as a blank page")
+        return False
+    # Recorded before the scan is saved, so that an interrupted preparation does not decode it again
+    manifest.add(
+        content_hash,
+        ScanManifestEntry(
+            barcode=decoded_scan.barcode,
+            probable_barcodes=decoded_scan.probable_barcodes,
+            stage=decoded_scan.stage,
+            prescription_scanned_pages="",
+        ),
+    )
+    return True
+
+
+def decode_into_manifest(
+    images: list[Path], target_dir: Path, scan_preparation_config: dict[str, Any], monitoring: Monitoring
+) -> None:
+    """Decode, ahead of the preparation, the scans that are not in the manifest of the target dir yet."""
+    manifest = ScanManifest.load(
+        target_dir / SCAN_MANIFEST_FILE,
+        save_every=scan_preparation_config["manifest_save_every"],
+        monitoring=monitoring,
+    )
+    for filepath in images:
+        content_hash = file_content_hash(filepath)
+        if manifest.get(content_hash) is None:
+            decoded_scan = decode_scan(filepath, scan_preparation_config, monitoring)
+            record_decoded_scan(manifest, filepath, content_hash, decoded_scan, monitoring)
+    manifest.save()
+
+
+def decode_scans(
+    images: list[Path],
+    scan_preparation_config: dict[str, Any],
+    multiprocessing_controls: list[tuple[Manager, Pool, Queue]],  # type: ignore[valid-type, type-arg]
+    monitoring: Monitoring,
+) -> Generator[ScanDecodeResult, None, None]:
+    """
+    Yield the decoded barcode of every image, in the order of the images.
+    When the parallel mode is enabled the images are decoded by a pool of worker processes.
+    Results are still yielded in stack order so that the caller can act as the single writer of the scans index.
+    """
+    parallel_config = scan_preparation_config["parallel"]
+    if not parallel_config["is_enabled"] or len(images) < MIN_SCANS_FOR_PARALLEL_DECODING:
+        for filepath in images:
+            yield decode_scan(filepath, scan_preparation_config, monitoring)
+        return
+
+    avail_num_processes = multiprocessing.cpu_count()
+    num_processes = max(1, min(avail_num_processes, int(parallel_config["max_processes"])))
+    # Small chunks keep the writer busy while the workers decode the rest of the stack
+    chunk_size = max(1, math.ceil(len(images) / (num_processes * 4)))
+    monitoring.logger_adapter.warning(f"Scan decoding processes count : {num_processes}")
+
+    manager = multiprocessing.Manager()
+    logger_queue = manager.Queue()
+    pool = multiprocessing.Pool(
+        num_processes, initializer=_init_decode_worker, initargs=(monitoring, logger_queue, scan_preparation_config)
+    )
+    multiprocessing_controls.append((manager, pool, logger_queue))
+    try:
+        yield from pool.imap(_decode_scan_in_worker, images, chunksize=chunk_size)
+    except BaseException:
+        # The caller failed or stopped early, the scans left are not decoded
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+        log_queue(logger_queue)
+
+
+def _init_decode_worker(
+    monitoring: Monitoring, logger_queue: Queue[Any], scan_preparation_config: dict[str, Any]
+) -> None:
+    global _worker_monitoring, _worker_scan_preparation_config
+    # add a handler that uses the shared queue
+    logger = logging.getLogger("")
+    monitoring.config_azure_monitor(logger=logger)
+    logger.addHandler(QueueHandler(logger_queue))
+    _worker_monitoring = monitoring
+    _worker_scan_preparation_config = scan_preparation_config
+
+
+def _decode_scan_in_worker(filepath: Path) -> ScanDecodeResult:
+    assert _worker_monitoring is not None, "decode worker was not initialised"
+    return decode_scan(filepath, _worker_scan_preparation_config, _worker_monitoring)
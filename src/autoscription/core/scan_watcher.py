@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from src.autoscription.core.errors import SkippedException
+from src.autoscription.core.logging import Monitoring
+
+SCAN_SUFFIXES = (".jpg", ".png")
+
+
+class ScanFolderWatcher:
+    """
+    Polls the scanner output directory while the scanner is still feeding.
+    A scan is handed over once its size and modification time stay the same for a whole poll interval,
+    so that files still being written by the scanner are never read. When a poll finds nothing new
+    and nothing changing, the folder is considered settled.
+    """
+
+    scanner_output_dir: Path
+    poll_interval: float
+    on_scans_landed: Callable[[list[Path]], None]
+    on_folder_settled: Callable[[], None]
+    monitoring: Monitoring
+
+    def __init__(
+        self,
+        scanner_output_dir: Path,
+        on_scans_landed: Callable[[list[Path]], None],
+        on_folder_settled: Callable[[], None],
+        poll_interval: float,
+        monitoring: Monitoring,
+    ) -> None:
+        self.scanner_output_dir = scanner_output_dir
+        self.on_scans_landed = on_scans_landed
+        self.on_folder_settled = on_folder_settled
+        self.poll_interval = poll_interval
+        self.monitoring = monitoring
+        self._pass_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._previous_stats: dict[Path, tuple[int, int]] = {}
+        self._handed_over: dict[Path, tuple[int, int]] = {}
+        self._settled_stats: dict[Path, tuple[int, int]] = {}
+
+    def _scan_stats(self) -> dict[Path, tuple[int, int]]:
+        stats: dict[Path, tuple[int, int]] = {}
+        if not self.scanner_output_dir.is_dir():
+            return stats
+        for path in self.scanner_output_dir.iterdir():
+            if path.suffix in SCAN_SUFFIXES:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    # deleted between the listing and the stat
+                    continue
+                stats[path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def poll_once(self) -> None:
+        stats = self._scan_stats()
+        stable = [path for path, stat in stats.items() if self._previous_stats.get(path) == stat]
+        landed = sorted(path for path in stable if self._handed_over.get(path) != stats[path])
+        self._previous_stats = stats
+        if landed:
+            self.monitoring.logger_adapter.info(f"{len(landed)} scans landed in {self.scanner_output_dir}")
+            self.on_scans_landed(landed)
+            for path in landed:
+                self._handed_over[path] = stats[path]
+        elif stats and len(stable) == len(stats) and stats != self._settled_stats:
+            self.monitoring.logger_adapter.info(f"{self.scanner_output_dir} settled with {len(stats)} scans")
+            self.on_folder_settled()
+            self._settled_stats = stats
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name="scan-folder-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Wait for the current pass to finish and keep the watcher idle until the block exits."""
+        with self._pass_lock:
+            try:
+                yield
+            finally:
+                # The folder may have been emptied or prepared meanwhile, every scan found later is new
+                self._reset()
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            with self._pass_lock:
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    self.monitoring.logger_adapter.warning(f"Failed to prepare the scans of {self.scanner_output_dir}")
+                    self.monitoring.logger_adapter.exception(SkippedException(e))
@@ -1,5 +1,4 @@
 import gc
-import os
 import sys
 from datetime import datetime
 from pathlib import Path
@@ -68,23 +67,6 @@ def crop_and_convert_rotate_image(
     return rotate_image(img_arr, rotation)
 
 
-def blank_page_removal(dataset_path: Path, monitoring: Monitoring) -> None:
-    files = list(dataset_path.glob("*.jpg"))
-    threshold = 254
-    for _, file in enumerate(files):
-        img = cv2.imread(str(file), cv2.IMREAD_GRAYSCALE)  # read the image as grayscale directly
-        if img is not None:
-            _, img_adj = cv2.threshold(img, 180, 255, cv2.THRESH_BINARY)
-            avg = np.average(img_adj)
-            if avg > threshold:
-                os.remove(str(file))  # delete the file
-                monitoring.logger_adapter.warning(
-                    f"{file} was deleted as a blank page with an Average Pixel Density of {avg}"
-                )
-        else:
-            monitoring.logger_adapter.warning(f"Could not read image: {file}")
-
-
 def show_image(img: Image) -> None:
     _, image = plt.subplots(figsize=(40, 20))
     image.imshow(img)
@@ -357,17 +339,55 @@ def draw_bottom_right_templates(
         )
 
 
+# The crop coordinates (left, top, right, bottom) of the two barcode regions read by OCR
+OCR_CROP_COORDS = (750, 100, 1400, 550)
+OCR_CROP_COORDS_2 = (1400, 150, 2480, 650)
+
+
 def get_barcode_ocr(reader: Reader, file: Path, monitoring: Monitoring) -> Tuple[str, str]:
     # Open the image file
     image = Image.open(file)
-    # Set the crop coordinates (left, top, right, bottom)
-    crop_coords = (750, 100, 1400, 550)
-    crop_coords_2 = (1400, 150, 2480, 650)
     # Crop the image
-    cropped_image = image.crop(crop_coords)
-    cropped_image_2 = image.crop(crop_coords_2)
+    cropped_image = image.crop(OCR_CROP_COORDS)
+    cropped_image_2 = image.crop(OCR_CROP_COORDS_2)
     digit_chunks = reader.readtext(image=np.array(cropped_image), allowlist="0123456789", detail=0)
     digit_chunks_2 = reader.readtext(image=np.array(cropped_image_2), allowlist="0123456789", detail=0)
+    return __match_ocr_barcodes(file, digit_chunks, digit_chunks_2, monitoring)
+
+
+def get_barcodes_ocr_batched(
+    reader: Reader, files: List[Path], batch_size: int, monitoring: Monitoring
+) -> List[Tuple[str, str]]:
+    """
+    Same as get_barcode_ocr for many files, batch_size files at a time.
+    The crops of up to batch_size files go through the reader together. The crops of a region all have the same size,
+    as readtext_batched requires, since PIL pads the crops that go beyond the page.
+    """
+    results: List[Tuple[str, str]] = []
+    for batch_start in range(0, len(files), batch_size):
+        batch_files = files[batch_start : batch_start + batch_size]
+        cropped_images = []
+        cropped_images_2 = []
+        for file in batch_files:
+            with Image.open(file) as image:
+                cropped_images.append(np.array(image.crop(OCR_CROP_COORDS)))
+                cropped_images_2.append(np.array(image.crop(OCR_CROP_COORDS_2)))
+        digit_chunks_batch = reader.readtext_batched(
+            cropped_images, allowlist="0123456789", detail=0, batch_size=batch_size
+        )
+        digit_chunks_batch_2 = reader.readtext_batched(
+            cropped_images_2, allowlist="0123456789", detail=0, batch_size=batch_size
+        )
+        results.extend(
+            __match_ocr_barcodes(file, digit_chunks, digit_chunks_2, monitoring)
+            for file, digit_chunks, digit_chunks_2 in zip(batch_files, digit_chunks_batch, digit_chunks_batch_2)
+        )
+    return results
+
+
+def __match_ocr_barcodes(
+    file: Path, digit_chunks: List[str], digit_chunks_2: List[str], monitoring: Monitoring
+) -> Tuple[str, str]:
     monitoring.logger_adapter.info(f"OCR (crop1): {digit_chunks}")
     monitoring.logger_adapter.info(f"OCR (crop2):{digit_chunks_2}")
 
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+
+def _fold(character: str) -> str:
+    # Case insensitive like re.IGNORECASE, one character for one so that the positions in the description are kept
+    folded = character.casefold()
+    if len(folded) == 1:
+        return folded
+    lowered = character.lower()
+    return lowered if len(lowered) == 1 else character
+
+
+def _is_word(character: str) -> bool:
+    # \w of re
+    return character.isalnum() or character == "_"
+
+
+class ProductCatalogue:
+    """
+    The products of a catalogue found in the descriptions of the dosages.
+    An Aho-Corasick automaton over the case folded names reads a description once whatever the number of products.
+    A product is found as a whole word, between regex word boundaries. Of two products found at overlapping positions
+    the longer one is kept, whatever their order in the catalogue, so a more specific name added to the catalogue
+    wins over the name it extends. Of the products left, the first in the catalogue is the one found.
+    """
+
+    names: list[str]
+    amounts: list[float]
+
+    def __init__(self, products: dict[str, float]) -> None:
+        self.names = []
+        self.amounts = []
+        # The transitions of every state of the automaton, its failure state and the products that end in it
+        self._transitions: list[dict[str, int]] = [{}]
+        self._failures: list[int] = [0]
+        self._outputs: list[list[int]] = [[]]
+        for name, amount in products.items():
+            if not name.strip():
+                continue
+            self._add(name.strip(), amount)
+        self._link()
+
+    @classmethod
+    def from_file(cls, path: Path, products: Optional[dict[str, float]] = None) -> ProductCatalogue:
+        """The products of a json object of names and amounts, extending and overriding the given products."""
+        with open(path, encoding="utf-8") as file:
+            file_products = json.load(file)
+        if not isinstance(file_products, dict):
+            raise ValueError(f"{path} is not a json object of product names and amounts")
+        return cls({**(products or {}), **file_products})
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _add(self, name: str, amount: float) -> None:
+        state = 0
+        for character in name:
+            next_state = self._transitions[state].get(_fold(character))
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions[state][_fold(character)] = next_state
+                self._transitions.append({})
+                self._failures.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(len(self.names))
+        self.names.append(name)
+        self.amounts.append(amount)
+
+    def _link(self) -> None:
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._transitions[state].items():
+                failure = self._failures[state]
+                while failure and character not in self._transitions[failure]:
+                    failure = self._failures[failure]
+                self._failures[next_state] = self._transitions[failure].get(character, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._failures[next_state]]
+                queue.append(next_state)
+
+    def find(self, description: str) -> Optional[float]:
+        """The amount of the product found in the description, None if there is none."""
+        # (start, end, index) of the products found as whole words
+        matches: list[tuple[int, int, int]] = []
+        state = 0
+        for end, character in enumerate(description, start=1):
+            character = _fold(character)
+            while state and character not in self._transitions[state]:
+                state = self._failures[state]
+            state = self._transitions[state].get(character, 0)
+            for index in self._outputs[state]:
+                start = end - len(self.names[index])
+                if self._is_whole_word(description, start, end):
+                    matches.append((start, end, index))
+        found: Optional[int] = None
+        for start, end, index in matches:
+            if (found is None or index < found) and not any(
+                other_start < end and start < other_end and other_end - other_start > end - start
+                for other_start, other_end, _ in matches
+            ):
+                found = index
+        return None if found is None else self.amounts[found]
+
+    @staticmethod
+    def _is_whole_word(description: str, start: int, end: int) -> bool:
+        before = start > 0 and _is_word(description[start - 1])
+        after = end < len(description) and _is_word(description[end])
+        return before != _is_word(description[start]) and after != _is_word(description[end - 1])
@@ -3,9 +3,14 @@ from __future__ import annotations
 
 import re
 from collections.abc import Callable
-from copy import deepcopy
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
+from pandas import Series
+
+from src.autoscription.core.config import get_product_list_path
+from src.autoscription.dosage_extractor.product_catalogue import ProductCatalogue
 from src.autoscription.idika_client.model.mt.clinical_document.substance_administration import (
     SubstanceAdministration,
 )
@@ -13,6 +18,8 @@ from src.autoscription.idika_client.model.mt.clinical_document.substance_adminis
 NO_NEED_TO_IDENTIFY = 0
 KEY_ERROR = 9223372036854775806
 UNABLE_TO_IDENTIFY = 9223372036854775807
+# Bound of the memoised rule lookups, the same descriptions recur in the prescriptions of every day
+PRODUCTS_PER_CONTAINER_CACHE_SIZE = 4096
 
 product_list = {
     "SALMENT INH.SUS.P 25MCG/DOSE  BT X 1": 120,
@@ -346,6 +353,24 @@ product_list = {
     "MIXTARD 50 PENFILL-100IU/ML INJ.SUSP 100 IU/ML 5 ΓYAΛ,ΦYΣIΓ,X3ML": 1500,
 }
 
+PARENTHESISED = re.compile(r"\([^)]*\)")
+
+
+def _greek_to_latin_table() -> str:
+    # Indexed by code point, str.translate looks up a str faster than a dict, the characters past its end are kept
+    table = [chr(code_point) for code_point in range(0x400)]
+    for greek, latin in zip("ΧΑΕΙΥΟΗΌΊΆΈΉΎΤΒΜΡΝΚ", "XAEIYOHOIAEHYTBMPNK"):
+        table[ord(greek)] = latin
+    return "".join(table)
+
+
+GREEK_TO_LATIN = _greek_to_latin_table()
+
+# The products of product_list and of the product list file, see reload_product_catalogue
+product_catalogue = ProductCatalogue(product_list)
+# The modification time of the product list file in product_catalogue, None without the file
+_product_list_file_version: Optional[int] = None
+
 
 def find_product_in_description(description: str) -> float:
     """
@@ -364,17 +389,8 @@ def find_product_in_description(description: str) -> float:
         return UNABLE_TO_IDENTIFY
     description = description.strip()
 
-    for product, amount in product_list.items():
-        # Ensure product is a string and remove leading/trailing whitespace
-        if not isinstance(product, str):
-            continue
-        product = product.strip()
-
-        # Search for product as a whole word (not a substring of another word)
-        if re.search(r"\b" + re.escape(product) + r"\b", description, re.IGNORECASE):
-            return amount
-
-    return UNABLE_TO_IDENTIFY
+    amount = product_catalogue.find(description)
+    return UNABLE_TO_IDENTIFY if amount is None else amount
 
 
 def number_word_list(description: str, words: list[str]) -> float:
@@ -1028,6 +1044,37 @@ rules_dictionary: dict[str, list[Callable[[str], float]]] = {
 }
 
 
+# The rules of the product types of the pdfs and of the form codes of the IDIKA api, built once
+api_rules_dictionary: dict[str, list[Callable[[str], float]]] = {
+    **rules_dictionary,
+    "ΕΙΣΠΝΟΕΣ_ΔΙΑΛ_ΔΟΣΕΙΣ": rules_dictionary["ΕΙΣΠΝΟΕΣ"],
+    "ΕΙΣΠΝΟΕΣ_ΔΟΣΕΙΣ": rules_dictionary["ΕΙΣΠΝΟΕΣ"],
+    "ΕΝΕΣΗ_ΣΚΟΝΗ_ΦΙΑΛΗ": rules_dictionary["ΕΝΕΣΗ"],
+    "ΕΝΕΣΗ_ΔΙΑΛ_ΦΥΣΙΓΓΕΣ": rules_dictionary["ΕΝΕΣΗ"],
+    "ΕΝΕΣΗ_ΔΙΑΛ_ΦΙΑΛΗ": rules_dictionary["ΕΝΕΣΗ"],
+    "ΔΙΣΚΙΑ_ΜΑΣΩΜΕΝΑ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΕΝΤΕΡΟΔΙΑΛΥΤΑ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΕΠΙΚΑΛ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΕΠΙΚΑΛΥΜ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΔΙΑΣΠ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΒΡΑΔΕΙΑΣ_ΑΠΟΔΕΣ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΑΝΑΒΡ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΔΙΣΚΙΑ_ΕΛΕΓΧ_ΑΠΟΔ": rules_dictionary["ΔΙΣΚΙΑ"],
+    "ΕΚΧΥΣΗ_ΔΙΑΛ_ΦΥΣΙΓΓΕΣ": rules_dictionary["ΕΚΧΥΣΗ"],
+    "ΠΟΣ_ΔΙΑΛΥΜΑ_1ML": rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"],
+    "ΠΟΣ.ΔΙΑΛ_ΔΟΣΕΙΣ_15ML": rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"],
+    "ΠΟΣ.ΔΙΑΛ_ΔΟΣΕΙΣ_5ML": rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"],
+    "ΠΟΣ_ΔΙΑΛΥΜΑ_ML": rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"],
+    "ΠΟΣ.ΔΙΑΛΥΜΑ_ML": rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"],
+    "ΠΟΣ.ΔΙΑΛ_ΔΟΣΕΙΣ": rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"],
+    "ΠΟΣ.ΣΚΟΝΗ_ΔΟΣ_ΔΙΑΛΥΜΑ": rules_dictionary["ΠΟΣ.ΣΚΟΝΗ"],
+    "ΚΑΨΟΥΛΕΣ_ΕΝΤΕΡΟΔΙΑΛ": rules_dictionary["ΚΑΨΟΥΛΕΣ"],
+    "ΚΑΨΟΥΛΑ_ΕΛΕΓΧΟΜ_ΑΠΟΔΕΣΜ": rules_dictionary["ΚΑΨΟΥΛΕΣ"],
+}
+
+
+@lru_cache(maxsize=PRODUCTS_PER_CONTAINER_CACHE_SIZE)
 def number_of_products_per_container(
     product_type: str, description: str
 ) -> tuple[float, Optional[Callable[[str], float]]]:
@@ -1038,30 +1085,19 @@ def number_of_products_per_container(
 
 
 def clean_description(description: str) -> str:
-    return (
-        re.sub(r"\([^)]*\)", "", description)
-        .upper()
-        .replace("Χ", "X")
-        .replace("Α", "A")
-        .replace("Ε", "E")
-        .replace("Ι", "I")
-        .replace("Υ", "Y")
-        .replace("Ο", "O")
-        .replace("Η", "H")
-        .replace("Ό", "O")
-        .replace("Ί", "I")
-        .replace("Ά", "A")
-        .replace("Έ", "E")
-        .replace("Ή", "H")
-        .replace("Ύ", "Y")
-        .replace("Τ", "T")
-        .replace("Β", "B")
-        .replace("Μ", "M")
-        .replace("Ρ", "P")
-        .replace("Ν", "N")
-        .replace("Κ", "K")
-        .strip()
-    )
+    """The description in capitals without its parenthesised text, with the greek letters that look latin in latin."""
+    if "(" in description:
+        description = PARENTHESISED.sub("", description)
+    description = description.upper()
+    # Most descriptions are ascii once their parenthesised text is removed
+    if not description.isascii():
+        description = description.translate(GREEK_TO_LATIN)
+    return description.strip()
+
+
+def clean_descriptions(descriptions: Series) -> Series:
+    """clean_description of every description of a series, the missing descriptions are kept."""
+    return descriptions.map(clean_description, na_action="ignore")
 
 
 def number_of_products_per_container_api(
@@ -1071,34 +1107,44 @@ def number_of_products_per_container_api(
         # TODO: add to mandatory fields check
         #  substance_administration.consumable.name and substance_administration.consumable.form_code.translation
         clear_description = clean_description(substance_administration.consumable.name)
-        api_rules_dictionary = deepcopy(rules_dictionary)
-        api_rules_dictionary["ΕΙΣΠΝΟΕΣ_ΔΙΑΛ_ΔΟΣΕΙΣ"] = rules_dictionary["ΕΙΣΠΝΟΕΣ"]
-        api_rules_dictionary["ΕΙΣΠΝΟΕΣ_ΔΟΣΕΙΣ"] = rules_dictionary["ΕΙΣΠΝΟΕΣ"]
-        api_rules_dictionary["ΕΝΕΣΗ_ΣΚΟΝΗ_ΦΙΑΛΗ"] = rules_dictionary["ΕΝΕΣΗ"]
-        api_rules_dictionary["ΕΝΕΣΗ_ΔΙΑΛ_ΦΥΣΙΓΓΕΣ"] = rules_dictionary["ΕΝΕΣΗ"]
-        api_rules_dictionary["ΕΝΕΣΗ_ΔΙΑΛ_ΦΙΑΛΗ"] = rules_dictionary["ΕΝΕΣΗ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΜΑΣΩΜΕΝΑ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΕΝΤΕΡΟΔΙΑΛΥΤΑ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΕΠΙΚΑΛ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΕΠΙΚΑΛΥΜ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΔΙΑΣΠ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΒΡΑΔΕΙΑΣ_ΑΠΟΔΕΣ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΑΝΑΒΡ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΔΙΣΚΙΑ_ΕΛΕΓΧ_ΑΠΟΔ"] = rules_dictionary["ΔΙΣΚΙΑ"]
-        api_rules_dictionary["ΕΚΧΥΣΗ_ΔΙΑΛ_ΦΥΣΙΓΓΕΣ"] = rules_dictionary["ΕΚΧΥΣΗ"]
-        api_rules_dictionary["ΠΟΣ_ΔΙΑΛΥΜΑ_1ML"] = rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"]
-        api_rules_dictionary["ΠΟΣ.ΔΙΑΛ_ΔΟΣΕΙΣ_15ML"] = rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"]
-        api_rules_dictionary["ΠΟΣ.ΔΙΑΛ_ΔΟΣΕΙΣ_5ML"] = rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"]
-        api_rules_dictionary["ΠΟΣ_ΔΙΑΛΥΜΑ_ML"] = rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"]
-        api_rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ_ML"] = rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"]
-        api_rules_dictionary["ΠΟΣ.ΔΙΑΛ_ΔΟΣΕΙΣ"] = rules_dictionary["ΠΟΣ.ΔΙΑΛΥΜΑ"]
-        api_rules_dictionary["ΠΟΣ.ΣΚΟΝΗ_ΔΟΣ_ΔΙΑΛΥΜΑ"] = rules_dictionary["ΠΟΣ.ΣΚΟΝΗ"]
-        api_rules_dictionary["ΚΑΨΟΥΛΕΣ_ΕΝΤΕΡΟΔΙΑΛ"] = rules_dictionary["ΚΑΨΟΥΛΕΣ"]
-        api_rules_dictionary["ΚΑΨΟΥΛΑ_ΕΛΕΓΧΟΜ_ΑΠΟΔΕΣΜ"] = rules_dictionary["ΚΑΨΟΥΛΕΣ"]
-        return extract_from_rules(
-            description=clear_description,
-            rules=api_rules_dictionary[substance_administration.consumable.form_code.translation],
+        return _number_of_products_per_container_api(
+            substance_administration.consumable.form_code.translation, clear_description
         )
     except KeyError:
         return KEY_ERROR, None
+
+
+@lru_cache(maxsize=PRODUCTS_PER_CONTAINER_CACHE_SIZE)
+def _number_of_products_per_container_api(
+    form_code: str, description: str
+) -> tuple[float, Optional[Callable[[str], float]]]:
+    return extract_from_rules(description=description, rules=api_rules_dictionary[form_code])
+
+
+def product_catalogue_version() -> Optional[int]:
+    """The modification time of the product list file in the product catalogue, None without the file."""
+    return _product_list_file_version
+
+
+def reload_product_catalogue(path: Optional[Path] = None) -> bool:
+    """
+    Rebuild the product catalogue when the product list file changed since it was last read, or was removed.
+    The products of the file, a json object of names and amounts, extend product_list and override its amounts.
+    Return whether the catalogue was rebuilt, a file that can not be read raises and the catalogue is kept.
+    """
+    global product_catalogue, _product_list_file_version
+    path = path or get_product_list_path()
+    try:
+        version: Optional[int] = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        version = None
+    if version == _product_list_file_version:
+        return False
+    product_catalogue = (
+        ProductCatalogue(product_list) if version is None else ProductCatalogue.from_file(path, product_list)
+    )
+    _product_list_file_version = version
+    # The products per container found with the previous catalogue
+    number_of_products_per_container.cache_clear()
+    _number_of_products_per_container_api.cache_clear()
+    return True
@@ -46,6 +46,7 @@ from src.autoscription.core.errors import (
     WrongDayException,
 )
 from src.autoscription.core.logging import Monitoring
+from src.autoscription.core.ocr_reader import ocr_reader_service
 from src.autoscription.gui.CheckWindow import CheckWindow
 from src.autoscription.gui.InfoText import InfoText
 from src.autoscription.gui.ScrollableMenu import ScrollableMenu
@@ -55,6 +56,7 @@ from src.autoscription.gui.utils import (
     get_prescriptions_for_manual_check,
 )
 from src.autoscription.idika_client.api_client import IdikaAPIClient, IdikaHttpClient
+from src.autoscription.idika_client.clinical_document_cache import ClinicalDocumentCache
 from src.autoscription.selenium_components.utils import _get_daily_pres_list_df
 
 MAX_NUMBER_OF_DAYS_BEFORE_SCANNER_CLEANUP: int = 8
@@ -250,6 +252,19 @@ class Application(ttk.Frame):
         self.operation = {"failed": False, "message": "OperationFailed"}
         self.backend = Backend(configuration=application_configuration["backend"], monitoring=self.monitoring)
         self.core = core.Core(monitoring=self.monitoring)
+        # Shared by the runs, closed with the application
+        self.clinical_document_cache = ClinicalDocumentCache.from_config(
+            application_configuration["idika_integration"]["cache"]
+        )
+        if application_configuration["scan_preparation"]["prewarm_ocr_reader"]:
+            self.master.after_idle(ocr_reader_service.prewarm, self.monitoring)
+        if application_configuration["scan_preparation"]["watch_scanner_output"]["is_enabled"]:
+            self.core.watch_scanner_output(
+                application_configuration["last_scan_dir"],
+                self.frame_date.get_date(),
+                application_configuration["scan_preparation"],
+            )
+            self.frame_date.bind("<<DateEntrySelected>>", self.on_date_selected)
         self.output = Output(None, None, None, None, None)
         self.master.after(500, self.show_ui)  # Schedule UI to appear after a 500ms delay
 
@@ -276,6 +291,10 @@ class Application(ttk.Frame):
         y_coordinate = int((screen_height / 2) - (height / 2))
         self.master.geometry(f"{width}x{height}+{x_coordinate}+{y_coordinate}")
 
+    def on_date_selected(self, event: tk.Event) -> None:  # type: ignore[type-arg]   # noqa: [U100]
+        # The scans landing from now on are prepared for the selected date
+        self.core.scan_watcher_date = self.frame_date.get_date()
+
     def on_entry_change(self, event: tk.Event) -> None:  # type: ignore[type-arg]   # noqa: [U100]
         # Encrypt the password before caching it
         raw_password = self.password.get()
@@ -698,7 +717,11 @@ class Application(ttk.Frame):
                             api_key=self.application_configuration["api"]["api_key"],
                             username=username_low_case,
                             password=password,
+                            requests_per_second=self.application_configuration["idika_integration"]["retrieval"][
+                                "requests_per_second"
+                            ],
                         ),
+                        cache=self.clinical_document_cache,
                     )
                     # TODO: do not pass credentials through configuration
                     # Combine the username and password into a single string in the format "username:password"
@@ -1126,6 +1149,7 @@ class Application(ttk.Frame):
                 self.monitoring.logger_adapter.warning("Application hard-close.")
                 self.core.cleanup()
                 self.t.kill()
+                self.close_caches()
                 self.master.destroy()
 
         else:
@@ -1135,8 +1159,13 @@ class Application(ttk.Frame):
 
             if should_close_finished:
                 self.monitoring.logger_adapter.warning("Application soft-close.")
+                self.close_caches()
                 self.master.destroy()
 
+    def close_caches(self) -> None:
+        if self.clinical_document_cache is not None:
+            self.clinical_document_cache.close()
+
     def handle_user_notification(self) -> None:
         update_scanner_clean_cache(cached_data=self.cached_data)
         if should_user_be_notified(cached_data=self.cached_data):
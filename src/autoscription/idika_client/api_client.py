@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import base64
+import threading
 from datetime import datetime
-from typing import Optional
+from typing import Any, NamedTuple, Optional, Protocol, TypeVar, cast
 
 import requests
 import xmltodict
@@ -17,6 +18,7 @@ from src.autoscription.core.errors import (
     IdikaWrongStatusCodeException,
     XmlParsingException,
 )
+from src.autoscription.idika_client.clinical_document_cache import ClinicalDocumentCache
 from src.autoscription.idika_client.mapping.clinical_document_mt import (
     map_clinical_document,
 )
@@ -40,6 +42,19 @@ from src.autoscription.idika_client.model.mt.partial_clinical_document import (
     PartialClinicalDocument,
 )
 from src.autoscription.idika_client.model.mt.pharmacist_unit import PharmacistUnit
+from src.autoscription.idika_client.rate_limiter import HostRateLimiter
+
+# Connections to the host kept alive by the session, shared by the threads of the concurrent retrieval
+MAX_CONNECTIONS = 20
+
+# xsdata turns the converter warnings into errors with warnings.catch_warnings, which changes the warning filters of
+# the whole interpreter, so the responses are parsed one at a time whichever the thread that received them
+_xml_parsing_lock = threading.Lock()
+
+T = TypeVar("T")
+
+# The status of a line of a prescription whose quantity is all executed
+EXECUTED_STATUS = "completed"
 
 
 def _create_headers(api_token: str, password: str, username: str) -> dict[str, str]:
@@ -56,52 +71,175 @@ def _create_headers(api_token: str, password: str, username: str) -> dict[str, s
 class IdikaHttpClient:
     session: requests.Session
     headers: dict[str, str]
+    rate_limiter: HostRateLimiter
 
-    def __init__(self, base_url: str, api_key: str, username: str, password: str):
+    def __init__(
+        self, base_url: str, api_key: str, username: str, password: str, requests_per_second: float = 0.0
+    ) -> None:
         self.base_url = base_url
         self.headers = _create_headers(api_key, password, username)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
         self.session = requests.Session()
         retry = Retry(total=5, backoff_factor=1, backoff_jitter=1, status_forcelist=[429, 500, 502, 503, 504])
-        self.session.mount(self.base_url, HTTPAdapter(max_retries=retry, pool_connections=20))
+        self.session.mount(
+            self.base_url,
+            HTTPAdapter(max_retries=retry, pool_connections=MAX_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS),
+        )
+
+    def _get(self, url: str, **kwargs: Any) -> requests.Response:
+        # The session is shared by the threads of the concurrent retrieval, and so is the rate limit of the host
+        self.rate_limiter.wait(url)
+        return self.session.get(url, **kwargs)
 
     def get_clinical_document(self, pharmacy_id: int, barcode: str) -> requests.Response:
         url_end = f"pharmacistapi/api/v1/prescriptions/get/{barcode}"
         params = {"pharmacyId": pharmacy_id}
-        return self.session.get(f"{self.base_url}/{url_end}", headers=self.headers, params=params)
+        return self._get(f"{self.base_url}/{url_end}", headers=self.headers, params=params)
 
     def get_partial_clinical_document(self, pharmacy_id: int, barcode: str, execution: int) -> requests.Response:
         url_end = f"pharmacistapi/api/v1/prescriptions/get/{barcode}/dispensation/{execution}"
         params = {"pharmacyId": pharmacy_id}
-        return self.session.get(f"{self.base_url}/{url_end}", headers=self.headers, params=params)
+        return self._get(f"{self.base_url}/{url_end}", headers=self.headers, params=params)
 
     def get_pharmacist_units(self) -> requests.Response:
         url_end = "pharmacistapi/api/v1/user/me/units"
-        return self.session.get(f"{self.base_url}/{url_end}", headers=self.headers)
+        return self._get(f"{self.base_url}/{url_end}", headers=self.headers)
 
     def authenticate(self) -> requests.Response:
         url_end = "pharmacistapi/api/v1/user/me"
-        return self.session.get(f"{self.base_url}/{url_end}", headers=self.headers)
+        return self._get(f"{self.base_url}/{url_end}", headers=self.headers)
 
 
 TOKEN_EXPIRED_OR_PERMISSIONS_MISSING = 403
 
 
+class IdikaResponse(Protocol):
+    """What is read of a response of the sync or the async http client."""
+
+    @property
+    def status_code(self) -> int:
+        ...
+
+    @property
+    def text(self) -> str:
+        ...
+
+
+def create_xml_parser() -> XmlParser:
+    return XmlParser(
+        config=ParserConfig(
+            fail_on_converter_warnings=True,  # used to identify errors in conversion
+            fail_on_unknown_properties=False,  # used in case a new element is introduced
+        )
+    )
+
+
+def _parse_xml(xml_parser: XmlParser, xml: str, clazz: type[T]) -> T:
+    with _xml_parsing_lock:
+        return xml_parser.from_string(xml, clazz)
+
+
+def parse_clinical_document(xml_parser: XmlParser, response: IdikaResponse, barcode: str) -> ClinicalDocument:
+    if response.status_code != 200:
+        raise IdikaWrongStatusCodeException(
+            expected_status=200,
+            actual_status=response.status_code,
+            arguments={"barcode": barcode},
+            response=response.text,
+        )
+    try:
+        clinical_document = _parse_xml(xml_parser, response.text, IdikaClinicalDocument)
+    except ParserError as e:
+        raise XmlParsingException(e)
+    return map_clinical_document(clinical_document)
+
+
+def parse_partial_clinical_document(
+    xml_parser: XmlParser, response: IdikaResponse, barcode: str, execution: int
+) -> PartialClinicalDocument:
+    if response.status_code != 200:
+        raise IdikaWrongStatusCodeException(
+            expected_status=200,
+            actual_status=response.status_code,
+            arguments={"barcode": barcode, "execution": str(execution)},
+            response=response.text,
+        )
+    try:
+        idika_partial_clinical_document = _parse_xml(xml_parser, response.text, IdikaPartialClinicalDocument)
+    except ParserError as e:
+        raise XmlParsingException(e)
+    return map_partial_clinical_document(
+        idika_partial_clinical_document=idika_partial_clinical_document, execution=execution
+    )
+
+
+def parse_pharmacy_id(response: IdikaResponse) -> int:
+    if response.status_code == 200:
+        return int(xmltodict.parse(response.text)["User"]["pharmacy"]["id"])
+    else:
+        raise IdikaAuthenticationException
+
+
+def parse_pharmacist_units(xml_parser: XmlParser, response: IdikaResponse) -> list[PharmacistUnit]:
+    pharmacist_units_response: PharmacistUnitsResponse = _parse_xml(xml_parser, response.text, PharmacistUnitsResponse)
+    if response.status_code == 200:
+        return map_pharmacist_units(pharmacist_units_response=pharmacist_units_response)
+    else:
+        raise IdikaAuthenticationException
+
+
+def is_fully_executed(clinical_document: ClinicalDocument) -> bool:
+    """Whether every line of the prescription is executed, its clinical document does not change afterwards."""
+    substance_administrations = clinical_document.section.substance_administrations
+    return bool(substance_administrations) and all(
+        substance_administration.status_code == EXECUTED_STATUS
+        for substance_administration in substance_administrations
+    )
+
+
+def active_pharmacist_units(pharmacist_units: list[PharmacistUnit]) -> list[PharmacistUnit]:
+    now = datetime.now()
+    return [unit for unit in pharmacist_units if unit.expiry_date > now > unit.start_date]
+
+
+class CachedResponse(NamedTuple):
+    """A response read from the clinical document cache, only the successful ones are cached."""
+
+    text: str
+    status_code: int = 200
+
+
 class IdikaAPIClient:
     pharmacy_id: Optional[int] = None
+    cache: Optional[ClinicalDocumentCache]
     _xml_parser: XmlParser
 
-    def __init__(self, idika_http_client: IdikaHttpClient) -> None:
+    def __init__(self, idika_http_client: IdikaHttpClient, cache: Optional[ClinicalDocumentCache] = None) -> None:
         self.idika_http_client = idika_http_client
-        self._xml_parser = XmlParser(
-            config=ParserConfig(
-                fail_on_converter_warnings=True,  # used to identify errors in conversion
-                fail_on_unknown_properties=False,  # used in case a new element is introduced
-            )
-        )
+        self.cache = cache
+        self._xml_parser = create_xml_parser()
 
     def get_clinical_document(self, barcode: str) -> ClinicalDocument:
         if self.pharmacy_id is None:  # no authentication took place
             raise IdikaPharmacyNotSelectedException()
+        response: IdikaResponse
+        if self.cache is None:
+            response = self._request_clinical_document(barcode)
+        else:
+            cached_xml, cached_document = self.cache.lookup(self.pharmacy_id, barcode)
+            if cached_document is not None:
+                return cast(ClinicalDocument, cached_document)
+            if cached_xml is None:
+                response = self._request_clinical_document(barcode)
+            else:
+                response = CachedResponse(cached_xml)
+        clinical_document = parse_clinical_document(self._xml_parser, response, barcode)
+        # The document of a prescription that can still be executed would be stale on the next run
+        if self.cache is not None and is_fully_executed(clinical_document):
+            self.cache.add(self.pharmacy_id, barcode, response.text, clinical_document)
+        return clinical_document
+
+    def _request_clinical_document(self, barcode: str) -> requests.Response:
         response = self.idika_http_client.get_clinical_document(
             pharmacy_id=self.pharmacy_id,  # type: ignore[arg-type]   # authenticate sets _pharmacy_id
             barcode=barcode,
@@ -114,22 +252,35 @@ class IdikaAPIClient:
                 pharmacy_id=self.pharmacy_id,  # type: ignore[arg-type]  # authenticate sets pharmacy_id
                 barcode=barcode,
             )
-        if response.status_code != 200:
-            raise IdikaWrongStatusCodeException(
-                expected_status=200,
-                actual_status=response.status_code,
-                arguments={"barcode": barcode},
-                response=response.text,
-            )
-        try:
-            clinical_document = self._xml_parser.from_string(response.text, IdikaClinicalDocument)
-        except ParserError as e:
-            raise XmlParsingException(e)
-        return map_clinical_document(clinical_document)
+        return response
+
+    def has_clinical_document(self, pharmacy_id: int, barcode: str) -> bool:
+        """Whether the pharmacy can retrieve the clinical document, without a request if it is cached."""
+        if self.cache is not None and self.cache.lookup(pharmacy_id, barcode) != (None, None):
+            return True
+        return self.idika_http_client.get_clinical_document(pharmacy_id, barcode).status_code == 200
 
     def get_partial_clinical_document(self, barcode: str, execution: int) -> PartialClinicalDocument:
         if self.pharmacy_id is None:  # no authentication took place
             raise IdikaPharmacyNotSelectedException()
+        response: IdikaResponse
+        if self.cache is None:
+            response = self._request_partial_clinical_document(barcode, execution)
+        else:
+            cached_xml, cached_document = self.cache.lookup(self.pharmacy_id, barcode, execution)
+            if cached_document is not None:
+                return cast(PartialClinicalDocument, cached_document)
+            if cached_xml is None:
+                response = self._request_partial_clinical_document(barcode, execution)
+            else:
+                response = CachedResponse(cached_xml)
+        partial_clinical_document = parse_partial_clinical_document(self._xml_parser, response, barcode, execution)
+        # An execution that took place does not change
+        if self.cache is not None:
+            self.cache.add(self.pharmacy_id, barcode, response.text, partial_clinical_document, execution)
+        return partial_clinical_document
+
+    def _request_partial_clinical_document(self, barcode: str, execution: int) -> requests.Response:
         response = self.idika_http_client.get_partial_clinical_document(
             pharmacy_id=self.pharmacy_id,  # type: ignore[arg-type]   # authenticate sets _pharmacy_id
             barcode=barcode,
@@ -144,39 +295,13 @@ class IdikaAPIClient:
                 barcode=barcode,
                 execution=execution,
             )
-        if response.status_code != 200:
-            raise IdikaWrongStatusCodeException(
-                expected_status=200,
-                actual_status=response.status_code,
-                arguments={"barcode": barcode, "execution": str(execution)},
-                response=response.text,
-            )
-        try:
-            idika_partial_clinical_document = self._xml_parser.from_string(response.text, IdikaPartialClinicalDocument)
-        except ParserError as e:
-            raise XmlParsingException(e)
-        return map_partial_clinical_document(
-            idika_partial_clinical_document=idika_partial_clinical_document, execution=execution
-        )
+        return response
 
     def authenticate(self) -> int:
-        response = self.idika_http_client.authenticate()
-        if response.status_code == 200:
-            return int(xmltodict.parse(response.text)["User"]["pharmacy"]["id"])
-        else:
-            raise IdikaAuthenticationException
+        return parse_pharmacy_id(self.idika_http_client.authenticate())
 
     def get_pharmacist_units(self) -> list[PharmacistUnit]:
-        response = self.idika_http_client.get_pharmacist_units()
-        pharmacist_units_response: PharmacistUnitsResponse = self._xml_parser.from_string(
-            response.text, PharmacistUnitsResponse
-        )
-        if response.status_code == 200:
-            return map_pharmacist_units(pharmacist_units_response=pharmacist_units_response)
-        else:
-            raise IdikaAuthenticationException
+        return parse_pharmacist_units(self._xml_parser, self.idika_http_client.get_pharmacist_units())
 
     def get_active_pharmacist_units(self) -> list[PharmacistUnit]:
-        now = datetime.now()
-        pharmacist_units: list[PharmacistUnit] = self.get_pharmacist_units()
-        return [unit for unit in pharmacist_units if unit.expiry_date > now > unit.start_date]
+        return active_pharmacist_units(self.get_pharmacist_units())
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import date
+from types import TracebackType
+from typing import Any, Optional
+
+import httpx
+import xmltodict
+
+from src.autoscription.core.errors import (
+    IdikaPharmacyNotSelectedException,
+    IdikaWrongStatusCodeException,
+)
+from src.autoscription.idika_client.api_client import (
+    MAX_CONNECTIONS,
+    TOKEN_EXPIRED_OR_PERMISSIONS_MISSING,
+    _create_headers,
+    active_pharmacist_units,
+    create_xml_parser,
+    parse_clinical_document,
+    parse_partial_clinical_document,
+    parse_pharmacist_units,
+    parse_pharmacy_id,
+)
+from src.autoscription.idika_client.model.mt.clinical_document.clinical_document import (
+    ClinicalDocument,
+)
+from src.autoscription.idika_client.model.mt.partial_clinical_document import (
+    PartialClinicalDocument,
+)
+from src.autoscription.idika_client.model.mt.pharmacist_unit import PharmacistUnit
+
+# Seconds to open a connection, to wait for a free one of the pool, to send a request and between two reads of a
+# response, the print of a prescription pdf is the slowest of the endpoints
+TIMEOUT = httpx.Timeout(connect=10.0, read=60.0, write=10.0, pool=30.0)
+LIMITS = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS, keepalive_expiry=60)
+# The retries of IdikaHttpClient, connection errors are retried by the transport and these statuses with a backoff
+MAX_RETRIES = 5
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+BACKOFF_FACTOR = 1.0
+BACKOFF_JITTER = 1.0
+
+
+class IdikaAsyncHttpClient:
+    """
+    The endpoints of IdikaHttpClient and those of the prescription pdfs and of the execution search, on httpx.
+    One httpx.AsyncClient keeps its connections alive and speaks HTTP/2 with the hosts that offer it, so the requests
+    of a run can share one event loop. Close it with aclose, or use it as an async context manager.
+    """
+
+    client: httpx.AsyncClient
+    headers: dict[str, str]
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        username: str,
+        password: str,
+        timeout: httpx.Timeout = TIMEOUT,
+        limits: httpx.Limits = LIMITS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.base_url = base_url
+        self.headers = _create_headers(api_key, password, username)
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=self.headers,
+            timeout=timeout,
+            transport=transport or httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=MAX_RETRIES),
+        )
+
+    async def __aenter__(self) -> IdikaAsyncHttpClient:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[type[BaseException]],  # noqa: U100
+        exc_value: Optional[BaseException],  # noqa: U100
+        traceback: Optional[TracebackType],  # noqa: U100
+    ) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def _get(self, url_end: str, **kwargs: Any) -> httpx.Response:
+        for retry in range(MAX_RETRIES + 1):
+            if retry:
+                await asyncio.sleep(BACKOFF_FACTOR * 2 ** (retry - 1) + random.uniform(0, BACKOFF_JITTER))
+            response = await self.client.get(url_end, **kwargs)
+            if response.status_code not in RETRY_STATUSES:
+                break
+        return response
+
+    async def get_clinical_document(self, pharmacy_id: int, barcode: str) -> httpx.Response:
+        url_end = f"pharmacistapi/api/v1/prescriptions/get/{barcode}"
+        return await self._get(url_end, params={"pharmacyId": pharmacy_id})
+
+    async def get_partial_clinical_document(self, pharmacy_id: int, barcode: str, execution: int) -> httpx.Response:
+        url_end = f"pharmacistapi/api/v1/prescriptions/get/{barcode}/dispensation/{execution}"
+        return await self._get(url_end, params={"pharmacyId": pharmacy_id})
+
+    async def get_pharmacist_units(self) -> httpx.Response:
+        return await self._get("pharmacistapi/api/v1/user/me/units")
+
+    async def authenticate(self) -> httpx.Response:
+        return await self._get("pharmacistapi/api/v1/user/me")
+
+    async def print_prescription(self, barcode: str, execution: int) -> httpx.Response:
+        url_end = f"pharmacistapi/api/v1/prescriptions/print/{barcode}"
+        headers = {"Accept": "application/pdf, application/xml"}
+        return await self._get(url_end, headers=headers, params={"executionNo": execution})
+
+    async def search_prescription_executions(self, pharmacy_id: int, execution_date: date, page: int) -> httpx.Response:
+        url_end = "pharmacistapi/api/v1/prescription-execution/search"
+        params = {"executionDate": execution_date.strftime("%Y-%m-%d"), "pharmacyId": pharmacy_id, "page": page}
+        return await self._get(url_end, params=params)
+
+
+class IdikaAsyncAPIClient:
+    """IdikaAPIClient on an IdikaAsyncHttpClient, the responses are parsed and mapped the same way."""
+
+    pharmacy_id: Optional[int] = None
+
+    def __init__(self, idika_http_client: IdikaAsyncHttpClient) -> None:
+        self.idika_http_client = idika_http_client
+        self._xml_parser = create_xml_parser()
+
+    def _selected_pharmacy_id(self) -> int:
+        if self.pharmacy_id is None:  # no authentication took place
+            raise IdikaPharmacyNotSelectedException()
+        return self.pharmacy_id
+
+    async def get_clinical_document(self, barcode: str) -> ClinicalDocument:
+        pharmacy_id = self._selected_pharmacy_id()
+        response = await self.idika_http_client.get_clinical_document(pharmacy_id=pharmacy_id, barcode=barcode)
+        if response.status_code == TOKEN_EXPIRED_OR_PERMISSIONS_MISSING:
+            await self.authenticate()
+            response = await self.idika_http_client.get_clinical_document(pharmacy_id=pharmacy_id, barcode=barcode)
+        return parse_clinical_document(self._xml_parser, response, barcode)
+
+    async def get_partial_clinical_document(self, barcode: str, execution: int) -> PartialClinicalDocument:
+        pharmacy_id = self._selected_pharmacy_id()
+        response = await self.idika_http_client.get_partial_clinical_document(
+            pharmacy_id=pharmacy_id, barcode=barcode, execution=execution
+        )
+        if response.status_code == TOKEN_EXPIRED_OR_PERMISSIONS_MISSING:
+            await self.authenticate()
+            response = await self.idika_http_client.get_partial_clinical_document(
+                pharmacy_id=pharmacy_id, barcode=barcode, execution=execution
+            )
+        return parse_partial_clinical_document(self._xml_parser, response, barcode, execution)
+
+    async def authenticate(self) -> int:
+        return parse_pharmacy_id(await self.idika_http_client.authenticate())
+
+    async def get_pharmacist_units(self) -> list[PharmacistUnit]:
+        return parse_pharmacist_units(self._xml_parser, await self.idika_http_client.get_pharmacist_units())
+
+    async def get_active_pharmacist_units(self) -> list[PharmacistUnit]:
+        return active_pharmacist_units(await self.get_pharmacist_units())
+
+    async def print_prescription(self, barcode: str, execution: int) -> bytes:
+        """The pdf of an execution of a prescription."""
+        response = await self.idika_http_client.print_prescription(barcode=barcode, execution=execution)
+        if response.status_code != 200:
+            raise IdikaWrongStatusCodeException(
+                expected_status=200,
+                actual_status=response.status_code,
+                arguments={"barcode": barcode, "execution": str(execution)},
+                response=response.text,
+            )
+        return response.content
+
+    async def search_prescription_executions(self, execution_date: date, page: int) -> dict[str, Any]:
+        """A page of the executions of the pharmacy, the Page element with its totalPages and contents."""
+        response = await self.idika_http_client.search_prescription_executions(
+            pharmacy_id=self._selected_pharmacy_id(), execution_date=execution_date, page=page
+        )
+        if response.status_code != 200:
+            raise IdikaWrongStatusCodeException(
+                expected_status=200,
+                actual_status=response.status_code,
+                arguments={"execution_date": str(execution_date), "page": str(page)},
+                response=response.text,
+            )
+        return dict(xmltodict.parse(response.text)["Page"])
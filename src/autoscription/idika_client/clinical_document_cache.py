@@ -0,0 +1,98 @@
+"""
+Cache of the clinical documents retrieved from IDIKA.
+
+Usage: python -m src.autoscription.idika_client.clinical_document_cache {info,clear} [--directory DIR]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+from src.autoscription.core.config import get_clinical_document_cache_dir
+from src.autoscription.core.disk_cache import DiskCache, run_cache_command
+
+# Bump whenever the mapping of the IDIKA clinical documents changes, the documents mapped by older versions are not read
+CLINICAL_DOCUMENT_MAPPING_VERSION = 1
+
+
+class ClinicalDocumentCache(DiskCache):
+    """
+    The XML responses of IDIKA for the clinical documents that no longer change, and the documents mapped from them.
+    Only the documents of the prescriptions fully executed and the partial documents of past executions are added,
+    the documents of the prescriptions that can still be executed are always requested, see IdikaAPIClient.
+    A response is keyed by the pharmacy id, the barcode and the execution of its request and refers to its XML by
+    content hash, the mapped documents are keyed by the same content hash and the mapping version, so the reruns of
+    a day only request the barcodes they have not seen.
+    Every entry expires after the time to live, in case an execution is cancelled. The XML is compressed, the
+    documents are pickled.
+    """
+
+    ttl_seconds: Optional[float]
+
+    def __init__(
+        self, directory: Path, ttl_hours: Optional[float] = None, size_limit_mb: Optional[int] = None
+    ) -> None:
+        super().__init__(directory, size_limit_mb=size_limit_mb)
+        self.ttl_seconds = ttl_hours * 3600 if ttl_hours is not None else None
+
+    @classmethod
+    def from_config(cls, cache_config: dict[str, Any]) -> Optional[ClinicalDocumentCache]:
+        if not cache_config["is_enabled"]:
+            return None
+        return cls(
+            get_clinical_document_cache_dir(),
+            ttl_hours=cache_config["ttl_hours"],
+            size_limit_mb=cache_config["size_limit_mb"],
+        )
+
+    @staticmethod
+    def content_hash(xml: str) -> str:
+        return hashlib.sha256(xml.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self, pharmacy_id: int, barcode: str, execution: Optional[int] = None
+    ) -> tuple[Optional[str], Optional[Any]]:
+        """The XML of the response to a request and the document mapped from it, None for what is not cached."""
+        content_hash = self.cache.get(("response", pharmacy_id, barcode, execution))
+        if content_hash is None:
+            return None, None
+        document = self.cache.get(("document", CLINICAL_DOCUMENT_MAPPING_VERSION, content_hash, execution))
+        if document is not None:
+            return None, document
+        compressed_xml = self.cache.get(("xml", content_hash))
+        if compressed_xml is None:
+            return None, None
+        return zlib.decompress(compressed_xml).decode("utf-8"), None
+
+    def add(
+        self,
+        pharmacy_id: int,
+        barcode: str,
+        xml: str,
+        document: Optional[Any] = None,
+        execution: Optional[int] = None,
+    ) -> None:
+        """Add a successful response to a request whose document no longer changes, and the document mapped from it."""
+        content_hash = self.content_hash(xml)
+        self.cache.set(("xml", content_hash), zlib.compress(xml.encode("utf-8")), expire=self.ttl_seconds)
+        if document is not None:
+            self.cache.set(
+                ("document", CLINICAL_DOCUMENT_MAPPING_VERSION, content_hash, execution),
+                document,
+                expire=self.ttl_seconds,
+            )
+        self.cache.set(("response", pharmacy_id, barcode, execution), content_hash, expire=self.ttl_seconds)
+
+    def versions(self) -> dict[str, int]:
+        return {"mapping version": CLINICAL_DOCUMENT_MAPPING_VERSION}
+
+
+def main() -> None:
+    run_cache_command(__doc__, ClinicalDocumentCache, get_clinical_document_cache_dir())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """
+    Space the requests started against every host by at least 1 / requests_per_second seconds.
+    The requests are spaced whichever the threads that start them. A rate of 0 or less leaves them unlimited.
+    """
+
+    interval: float
+
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slots: dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        """Block until a request to the host of the url can start."""
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slots.get(host, now))
+            self._next_slots[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
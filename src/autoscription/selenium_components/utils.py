@@ -1,19 +1,14 @@
 from __future__ import annotations
 
 import datetime
-import itertools
-import logging
-import math
-import multiprocessing
 import os
 import pathlib
+import random
 import re
 import time
-from collections.abc import Generator
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from functools import partial
-from logging.handlers import QueueHandler
-from multiprocessing import Manager, Pool, Queue
 from threading import Lock
 from typing import Any
 
@@ -22,6 +17,7 @@ import pytz
 import requests
 import xmltodict
 from opentelemetry.trace import Tracer, get_tracer
+from requests.adapters import HTTPAdapter
 
 from src.autoscription.core.data_types import (
     daily_pres_dtype,
@@ -29,99 +25,150 @@ from src.autoscription.core.data_types import (
     injection_pages_dtype,
 )
 from src.autoscription.core.errors import SignInException
-from src.autoscription.core.logging import Monitoring, log_queue
+from src.autoscription.core.logging import Monitoring
 
+# Prescription pdfs downloaded at a time over the shared session
+DOWNLOAD_MAX_IN_FLIGHT = 8
+# Seconds to connect and between two reads of a prescription pdf
+DOWNLOAD_TIMEOUT = (10, 120)
+# A pdf is requested at most this many times, waiting a random part of an exponentially growing backoff in between
+DOWNLOAD_MAX_ATTEMPTS = 4
+DOWNLOAD_BACKOFF_BASE = 1.0
+DOWNLOAD_BACKOFF_CAP = 30.0
+DOWNLOAD_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
 
-def divide_chunks(
-    data: list[dict[str, Any]], size: int = 4
-) -> Generator[list[dict[str, Any]], Any, None]:
-    for i in range(0, len(data), size):
-        yield data[i : i + size]
+
+class DownloadProgress:
+    """
+    Called once for every prescription pdf the download is done with.
+    The number of calls is the value the progress bar of the application reads.
+    """
+
+    value: int
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = Lock()
+
+    def __call__(self) -> None:
+        with self._lock:
+            self.value += 1
+
+
+def create_download_session(max_in_flight: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_in_flight, pool_maxsize=max_in_flight)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def download_backoff(attempt: int) -> float:
+    """Seconds to wait before the attempt after the given one, full jitter over an exponential backoff."""
+    return random.uniform(
+        0, min(DOWNLOAD_BACKOFF_CAP, DOWNLOAD_BACKOFF_BASE * 2**attempt)
+    )
+
+
+def download_prescription(
+    session: requests.Session,
+    ps_id: dict[str, Any],
+    download_dir: pathlib.Path,
+    config: dict[str, Any],
+    monitoring: Monitoring,
+) -> bool:
+    """Download the pdf of an execution of a prescription, return whether it was written."""
+    barcode = ps_id["prescription"]
+    url_end = f"pharmacistapi/api/v1/prescriptions/print/{barcode}"
+    headers = {
+        "Authorization": f"Basic {config['credentials_base64']}",
+        "api-key": config["api_key"],
+        "Accept": "application/pdf, application/xml",
+        "Content-Type": "application/xml",
+    }
+    params = {"executionNo": ps_id["execution"]}
+
+    response = None
+    for attempt in range(DOWNLOAD_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(download_backoff(attempt - 1))
+        try:
+            response = session.get(
+                f"{config['base_url']}/{url_end}",
+                headers=headers,
+                params=params,
+                timeout=DOWNLOAD_TIMEOUT,
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            monitoring.logger_adapter.warning(
+                f"Connection error downloading {barcode}_{ps_id['execution']}, "
+                f"attempt {attempt + 1}/{DOWNLOAD_MAX_ATTEMPTS}"
+            )
+            continue
+        if response.status_code not in DOWNLOAD_RETRY_STATUSES:
+            break
+    else:
+        monitoring.logger_adapter.error("Max retries reached. Request failed.")
+
+    if response is None or response.status_code != 200:
+        return False
+    # Open the PDF file in binary write mode and write the content from the API response.
+    with open(
+        download_dir / f"{ps_id['prescription']}_{ps_id['execution']}.pdf", "wb"
+    ) as pdf_file:
+        pdf_file.write(response.content)
+    return True
 
 
 def download_prescriptions(
     ps_ids: list[dict[str, Any]],
     download_dir: pathlib.Path,
-    download_counter: int,
-    shared_counter: Any,
-    lock: Lock | None,
-    log_queue: Any,
     config: dict[str, Any],
     monitoring: Monitoring,
-) -> tuple[list[dict[str, str]], list[str]]:
-    # create a logger
-    logger = logging.getLogger("")
-    monitoring.config_azure_monitor(logger=logger)
+    max_in_flight: int = DOWNLOAD_MAX_IN_FLIGHT,
+    on_downloaded: Callable[[], None] | None = None,
+) -> tuple[list[dict[str, Any]], list[str]]:
+    """
+    Download the pdfs of the executions of the prescriptions in threads sharing one keep-alive session.
+    on_downloaded is called after every one of them, downloaded or not.
+    Return the executions after the first one that were downloaded and the prescriptions that failed to.
+    """
     tracer: Tracer = get_tracer(__name__)
     with tracer.start_as_current_span(
         "check_prescriptions", context=monitoring.get_parent_context()
-    ):  # add a handler that uses the shared queue
-        if log_queue:
-            logger.addHandler(QueueHandler(log_queue))
-        curr_proc = multiprocessing.current_process()
-        if curr_proc._identity:
-            download_dir = download_dir / str(curr_proc._identity[0])
-        else:
-            download_dir = download_dir / "0"
+    ):
+        download_dir = download_dir / "0"
         download_dir.mkdir(parents=True, exist_ok=True)
         delete_mismatched_files(download_dir, monitoring=monitoring)
-        execution_timestamps = []
-        failed_multi_prescriptions = []
-        for ps_id in ps_ids:
-            download_counter = download_counter + 1
-            monitoring.logger_adapter.info(
-                f"{download_counter}/{len(ps_ids)} : {ps_id}"
-            )
-            barcode = ps_id["prescription"]
-            url_end = f"pharmacistapi/api/v1/prescriptions/print/{barcode}"
-            headers = {
-                "Authorization": f"Basic {config['credentials_base64']}",
-                "api-key": config["api_key"],
-                "Accept": "application/pdf, application/xml",
-                "Content-Type": "application/xml",
-            }
-
-            # Define the request payload with your parameters
-            params = {"executionNo": ps_id["execution"]}
-
-            # Send a GET request with the headers
-            max_retries = 4
-            retry_interval = 10
-
-            for _ in range(max_retries):
-                try:
-                    response = requests.get(
-                        f"{config['base_url']}/{url_end}",
-                        headers=headers,
-                        params=params,
-                    )
-                    # Check for a successful response
-                    if response.status_code == 200:
-                        break  # Success, exit the loop
-                except requests.exceptions.ConnectionError:
-                    monitoring.logger_adapter.warning(
-                        f"ConnectionError occurred. Retrying in {retry_interval} seconds..."
-                    )
-                    time.sleep(retry_interval)
-            else:
-                monitoring.logger_adapter.error("Max retries reached. Request failed.")
-
-            # Check the response
-            if response.status_code == 200:
-                if str(ps_id["execution"]) != "1":
-                    execution_timestamps.append(ps_id)
-                # Open the PDF file in binary write mode and write the content from the API response.
-                with open(
-                    download_dir / f"{ps_id['prescription']}_{ps_id['execution']}.pdf",
-                    "wb",
-                ) as pdf_file:
-                    pdf_file.write(response.content)
-            else:
-                failed_multi_prescriptions.extend(ps_id["prescription"])
-            if lock:
-                with lock:
-                    shared_counter.value += 1
-            delete_mismatched_files(download_dir, monitoring=monitoring)
+        max_in_flight = max(1, min(max_in_flight, len(ps_ids)))
+
+        def download(indexed_ps_id: tuple[int, dict[str, Any]]) -> bool:
+            index, ps_id = indexed_ps_id
+            monitoring.logger_adapter.info(f"{index}/{len(ps_ids)} : {ps_id}")
+            try:
+                return download_prescription(
+                    session, ps_id, download_dir, config, monitoring
+                )
+            finally:
+                if on_downloaded:
+                    on_downloaded()
+
+        with create_download_session(max_in_flight) as session, ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="download-prescriptions"
+        ) as executor:
+            downloaded = list(executor.map(download, enumerate(ps_ids, start=1)))
+
+        execution_timestamps = [
+            ps_id
+            for ps_id, is_downloaded in zip(ps_ids, downloaded)
+            if is_downloaded and str(ps_id["execution"]) != "1"
+        ]
+        failed_multi_prescriptions = [
+            ps_id["prescription"]
+            for ps_id, is_downloaded in zip(ps_ids, downloaded)
+            if not is_downloaded
+        ]
+        delete_mismatched_files(download_dir, monitoring=monitoring)
         return execution_timestamps, failed_multi_prescriptions
 
 
@@ -149,58 +196,28 @@ def retrieve_prescription_ids(
     ps_ids: list[dict[str, Any]],
     download_dir: pathlib.Path,
     config: dict[str, Any],
-    multiprocessing_controls: list[tuple[Manager, Pool, Queue]],  # type: ignore[valid-type, type-arg]
     progress_bar: dict[str, Any],
     monitoring: Monitoring,
+    max_in_flight: int = DOWNLOAD_MAX_IN_FLIGHT,
 ) -> list[str]:
     monitoring.logger_adapter.info("Username & Password Set")
+    on_downloaded = None
     if progress_bar:
         progress_bar["total_prescriptions"] = len(ps_ids)
+        on_downloaded = DownloadProgress()
+        progress_bar["counter"] = on_downloaded
     monitoring.logger_adapter.info("Prescription IDs collected")
-    # TODO: extract to method in SearchPage
-    threads = multiprocessing.cpu_count()
-    if threads >= 3:
-        threads = 3
-    chunk_size: int = math.ceil(len(ps_ids) / threads)
     monitoring.logger_adapter.warning(
-        f"Chunk size (number of prescriptions / cpu count) : {chunk_size}"
+        f"Prescriptions downloaded at a time : {max_in_flight}"
     )
-    # will work even if the length of the dataframe is not evenly divisible
-    # by num_processes
-    chunks: list[list[dict[str, Any]]] = [
-        item for item in divide_chunks(ps_ids, chunk_size)
-    ]
-    # apply the parser function to each chunk in the list
-    lock: Lock | None
-    counter = None
-    manager = multiprocessing.Manager()
-    lock = None  # Why do we need this one?
-    if progress_bar:
-        lock = manager.Lock()
-        counter = manager.Value(int, 0)
-        progress_bar["counter"] = counter
-    logger_queue = manager.Queue()
-    pool = multiprocessing.Pool(threads)
-    # Apply the parser function to each chunk in the list using apply_async
-    return_items = pool.map(
-        partial(
-            download_prescriptions,
-            download_dir=download_dir,
-            download_counter=0,
-            lock=lock,
-            shared_counter=counter,
-            log_queue=logger_queue,
-            config=config,
-            monitoring=monitoring,
-        ),
-        chunks,
+    _, failed_multi_prescriptions = download_prescriptions(
+        ps_ids=ps_ids,
+        download_dir=download_dir,
+        config=config,
+        monitoring=monitoring,
+        max_in_flight=max_in_flight,
+        on_downloaded=on_downloaded,
     )
-    multiprocessing_controls.append((manager, pool, logger_queue))  # type: ignore[arg-type]
-    pool.close()
-    pool.join()
-    log_queue(logger_queue)
-    execution_timestamps_list, failed_multi_prescriptions_list = zip(*return_items)
-    failed_multi_prescriptions = list(itertools.chain(*failed_multi_prescriptions_list))
     return failed_multi_prescriptions
 
 
@@ -228,8 +245,48 @@ def delete_mismatched_files(download_dir: pathlib.Path, monitoring: Monitoring)
                     )
 
 
+def _daily_prescriptions(
+    page: dict[str, Any],
+    date: str,
+    athens_tz: Any,
+    prescriptions: list[dict[str, Any]],
+) -> bool:
+    """
+    Add the executions of the date of a page, from its last one, to the prescriptions.
+    Return whether an execution of an older date was reached, the pages before it hold none of the date.
+    """
+    items = page["contents"]["item"]
+    if not isinstance(items, list):
+        items = [items]
+    # Loop through the items
+    for item in reversed(items):
+        # Parse the timestamp as a naïve datetime using the format provided.
+        naive_dt = datetime.datetime.strptime(
+            item["executionDate"], "%Y-%m-%dT%H:%M:%S.%f+0000"
+        )
+        # Localize the parsed datetime to Athens timezone instead of assuming UTC.
+        execution_timestamp = athens_tz.localize(naive_dt)
+        execution_date = str(execution_timestamp.date())
+        if execution_date == date:
+            prescriptions.append(
+                {
+                    "pr_order_timestamp": execution_timestamp.strftime(
+                        "%Y-%m-%dT%H:%M:%S.%f%z"
+                    ),
+                    "prescription": item["prescription"]["barcode"],
+                    "execution": item["executionNo"],
+                }
+            )
+        elif execution_date < date:
+            return True
+    return False
+
+
 def _get_daily_pres_list(
-    download_dir: pathlib.Path, date: str, config: dict[str, Any]
+    download_dir: pathlib.Path,
+    date: str,
+    config: dict[str, Any],
+    max_in_flight: int = DOWNLOAD_MAX_IN_FLIGHT,
 ) -> list[dict[str, Any]]:
     url_end = "pharmacistapi/api/v1/prescription-execution/search"
     headers = {
@@ -238,50 +295,49 @@ def _get_daily_pres_list(
         "Accept": "application/x-hl7, application/xml",
         "Content-Type": "application/xml",
     }
-    params = {"executionDate": date, "pharmacyId": config["pharmacy_id"], "page": "0"}
-
-    # Make the first request to get the total number of pages
-    response = requests.get(
-        f"{config['base_url']}/{url_end}", headers=headers, params=params
-    )
-    data = xmltodict.parse(response.text)
-    total_pages = int(data["Page"]["totalPages"])
-    prescriptions = []
+    params = {"executionDate": date, "pharmacyId": config["pharmacy_id"]}
+    prescriptions: list[dict[str, Any]] = []
     # Assume the API returns local Athens time (even though it uses "+0000") – so localize accordingly.
     athens_tz = pytz.timezone("Europe/Athens")
 
-    # Loop through the pages in reverse order
-    for page in range(total_pages, 0, -1):
-        params["page"] = str(page - 1)
-        response = requests.get(
-            f"{config['base_url']}/{url_end}", headers=headers, params=params
-        )
-        data = xmltodict.parse(response.text)
-        items = data["Page"]["contents"]["item"]
-        if not isinstance(items, list):
-            items = [items]
-        # Loop through the items
-        for item in reversed(items):
-            # Parse the timestamp as a naïve datetime using the format provided.
-            naive_dt = datetime.datetime.strptime(item["executionDate"], "%Y-%m-%dT%H:%M:%S.%f+0000")
-            # Localize the parsed datetime to Athens timezone instead of assuming UTC.
-            execution_timestamp = athens_tz.localize(naive_dt)
-            execution_date = str(execution_timestamp.date())
-            if execution_date == date:
-                prescriptions.append(
-                    {
-                    "pr_order_timestamp": execution_timestamp.strftime(
-                        "%Y-%m-%dT%H:%M:%S.%f%z"
-                        ),
-                        "prescription": item["prescription"]["barcode"],
-                        "execution": item["executionNo"],
-                    }
-                )
-            elif execution_date < date:
-                pd.DataFrame(prescriptions).to_csv(
-                    str(download_dir / "daily_pres_list.csv"), index=False
-                )
-                return prescriptions
+    with create_download_session(max_in_flight) as session:
+
+        def get_page(page: int) -> dict[str, Any]:
+            # The body is parsed while it is read
+            with session.get(
+                f"{config['base_url']}/{url_end}",
+                headers=headers,
+                params={**params, "page": str(page)},
+                stream=True,
+            ) as response:
+                response.raw.decode_content = True
+                page_content: dict[str, Any] = xmltodict.parse(response.raw)["Page"]
+                return page_content
+
+        # The first page tells the total number of pages, it is the last one walked
+        first_page = get_page(0)
+        total_pages = int(first_page["totalPages"])
+        # Walk the pages in reverse order, requesting a batch of them at a time,
+        # until an execution older than the date
+        pages = list(range(total_pages - 1, 0, -1))
+        batch_size = max(1, max_in_flight)
+        is_older_date_reached = False
+        with ThreadPoolExecutor(
+            max_workers=batch_size, thread_name_prefix="daily-pres-list"
+        ) as executor:
+            for batch_start in range(0, len(pages), batch_size):
+                batch = pages[batch_start : batch_start + batch_size]
+                for page in executor.map(get_page, batch):
+                    is_older_date_reached = _daily_prescriptions(
+                        page, date, athens_tz, prescriptions
+                    )
+                    if is_older_date_reached:
+                        break
+                if is_older_date_reached:
+                    break
+        if total_pages and not is_older_date_reached:
+            _daily_prescriptions(first_page, date, athens_tz, prescriptions)
+
     pd.DataFrame(prescriptions).to_csv(
         str(download_dir / "daily_pres_list.csv"), index=False
     )
@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.autoscription.core.extract_metadata import (
+    create_dosages_df,
+    generate_dosage_checks,
+)
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def concatenated_one_table_at_a_time(
+    past_partial_exec_checks: dict[str, Any], current_day_checks: dict[str, Any]
+) -> Any:
+    # How Core used to assemble the dosages
+    dosages_df = pd.DataFrame([])
+    for i, checks in enumerate([past_partial_exec_checks, current_day_checks]):
+        for prescription_id, check in checks.items():
+            for three_digits, data in check.items():
+                dosages = data["dosages"].copy()
+                dosages["is_past_partial_exec"] = i == 0
+                dosages["prescription"] = prescription_id
+                dosages["scan_last_three_digits"] = three_digits
+                dosages_df = pd.concat([dosages_df, dosages], axis=0)
+    grouped_df = dosages_df.groupby(["prescription", "description"], as_index=False).agg({"boxes_provided": "sum"})
+    grouped_df = grouped_df.rename(columns={"boxes_provided": "boxes_provided_multiple_executions"})
+    dosages_df = dosages_df.merge(grouped_df, on=["prescription", "description"], how="inner")
+    dosages_df["dosage_check"] = generate_dosage_checks(
+        dosages_df["boxes_provided_multiple_executions"],
+        dosages_df["boxes_required"],
+        dosages_df["dosage"],
+        dosages_df["dosage_qnt"],
+    )
+    dosages_df["dosage"] = dosages_df["dosage"].astype(str)
+    return dosages_df
+
+
+def dosages(boxes_provided: float, boxes_required: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "boxes_required": [boxes_required],
+            "boxes_provided": [boxes_provided],
+            "description": ["B-MAG EFF.GRAN 243MG/SACHET BTX 10 SACHETS"],
+            "dosage": pd.array(["1.0"], dtype="string"),
+            "dosage_qnt": [1.0],
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def golden_checks() -> tuple[dict[str, Any], dict[str, Any]]:
+    # The dosages extract_table returned for the first page tables, split in past partial and current day checks
+    golden = pd.read_parquet(DATA_DIR / "extract_table_golden.parquet")
+    with open(DATA_DIR / "first_page_tables.json", encoding="utf-8") as file:
+        dtypes = json.load(file)["dtypes"]
+    past_partial_exec_checks: dict[str, Any] = {}
+    current_day_checks: dict[str, Any] = {}
+    for table, table_dosages in golden.groupby("table"):
+        checks = past_partial_exec_checks if table % 5 == 0 else current_day_checks
+        # A few prescriptions are executed more than once
+        prescription_id = f"23120{table // 2:08d}"
+        checks.setdefault(prescription_id, {})[f"{table % 2}01"] = {
+            "dosages": table_dosages.drop(columns="table").reset_index(drop=True).astype(dtypes[table])
+        }
+    return past_partial_exec_checks, current_day_checks
+
+
+class TestCreateDosagesDf:
+    def test_same_as_concatenating_one_table_at_a_time(self, golden_checks: tuple[dict[str, Any], ...]) -> None:
+        expected = concatenated_one_table_at_a_time(*golden_checks)
+
+        result = create_dosages_df(*golden_checks)
+
+        assert_frame_equal(result, expected)
+
+    def test_checks_the_boxes_of_all_the_executions(self) -> None:
+        past_partial_exec_checks = {
+            "2312041234567": {"101": {"dosages": dosages(boxes_provided=1.0, boxes_required=3)}}
+        }
+        current_day_checks = {"2312041234567": {"102": {"dosages": dosages(boxes_provided=2.0, boxes_required=3)}}}
+
+        result = create_dosages_df(past_partial_exec_checks, current_day_checks)
+
+        assert result["is_past_partial_exec"].tolist() == [True, False]
+        assert result["scan_last_three_digits"].tolist() == ["101", "102"]
+        assert result["boxes_provided_multiple_executions"].tolist() == [3.0, 3.0]
+        assert result["dosage_check"].tolist() == ["True", "True"]
+
+    def test_checks_are_left_as_they_are(self) -> None:
+        current_day_checks = {"2312041234567": {"101": {"dosages": dosages(boxes_provided=2.0, boxes_required=2)}}}
+
+        create_dosages_df({}, current_day_checks)
+
+        assert_frame_equal(current_day_checks["2312041234567"]["101"]["dosages"], dosages(2.0, 2))
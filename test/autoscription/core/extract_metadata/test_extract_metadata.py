@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.errors import ExtractMetadataFailedException
+from src.autoscription.core.extract_metadata import (
+    MIN_PDFS_FOR_PARALLEL_EXTRACTION,
+    extract_metadata,
+    extract_metadata_pool,
+)
+from src.autoscription.core.extraction_cache import ExtractionCache
+from src.autoscription.core.logging import TestMonitoring
+
+PARALLEL = {"is_enabled": True, "max_processes": 2}
+
+
+def extracted(file: str, counter: int, monitoring: Any) -> tuple[str, str, dict[str, Any]]:  # noqa: U100
+    prescription_id, execution = Path(file.replace("\\", "/")).stem.split("_")
+    return prescription_id, "101", {"execution": execution, "counter": counter}
+
+
+class InProcessPool:
+    def imap(self, function: Any, iterable: Any) -> Any:
+        return map(function, iterable)
+
+
+class TestExtractMetadata:
+    @pytest.fixture(autouse=True)
+    def extract_prescription_metadata(self, mocker: MockerFixture) -> Any:
+        mocker.patch("src.autoscription.core.extract_metadata._worker_monitoring", TestMonitoring())
+        return mocker.patch(
+            "src.autoscription.core.extract_metadata.extract_prescription_metadata", side_effect=extracted
+        )
+
+    @pytest.mark.parametrize("pool", [None, InProcessPool()])
+    def test_checks_are_merged_in_dir_list_order(self, pool: Any) -> None:
+        dir_list = [f"pdfs/23120{index}_1.pdf" for index in range(MIN_PDFS_FOR_PARALLEL_EXTRACTION)]
+        dir_list.append("pdfs/231200_2.pdf")
+
+        checks = extract_metadata(dir_list, specific_prescriptions=None, monitoring=TestMonitoring(), pool=pool)
+
+        assert list(checks) == [f"23120{index}" for index in range(MIN_PDFS_FOR_PARALLEL_EXTRACTION)]
+        assert checks["231200"]["101"] == {"execution": "2", "counter": len(dir_list)}
+        assert checks["231207"]["101"] == {"execution": "1", "counter": 8}
+
+    def test_only_specific_prescriptions_are_extracted(self, extract_prescription_metadata: Any) -> None:
+        dir_list = ["pdfs/231200_1.pdf", "pdfs\\231201_1.pdf", "pdfs/231202_1.pdf"]
+
+        checks = extract_metadata(dir_list, specific_prescriptions=["231201"], monitoring=TestMonitoring())
+
+        assert list(checks) == ["231201"]
+        extract_prescription_metadata.assert_called_once()
+
+    def test_cached_pdfs_are_not_extracted_again(self, tmp_path: Path, extract_prescription_metadata: Any) -> None:
+        extract_prescription_metadata.side_effect = lambda file, counter, monitoring: (
+            *extracted(file, counter, monitoring)[:2],
+            {**extracted(file, counter, monitoring)[2], "dosages": pd.DataFrame({"boxes_provided": [1.0]})},
+        )
+        dir_list = []
+        for index in range(3):
+            (tmp_path / f"23120{index}_1.pdf").write_bytes(f"pdf {index}".encode())
+            dir_list.append((tmp_path / f"23120{index}_1.pdf").as_posix())
+        cache = ExtractionCache(tmp_path / "cache", size_limit_mb=1)
+        extract_metadata(dir_list[:2], specific_prescriptions=None, monitoring=TestMonitoring(), cache=cache)
+
+        checks = extract_metadata(dir_list, specific_prescriptions=None, monitoring=TestMonitoring(), cache=cache)
+
+        assert extract_prescription_metadata.call_count == 3
+        assert extract_prescription_metadata.call_args.args[0] == dir_list[2]
+        assert list(checks) == ["231200", "231201", "231202"]
+        assert checks["231201"]["101"]["counter"] == 2
+
+
+class TestExtractMetadataPool:
+    def test_disabled_pool(self) -> None:
+        multiprocessing_controls: list = []
+
+        with extract_metadata_pool({"is_enabled": False}, multiprocessing_controls, TestMonitoring()) as pool:
+            assert pool is None
+        assert multiprocessing_controls == []
+
+    def test_failed_pdf_fails_the_extraction(self, tmp_path: Path) -> None:
+        # The pdfs do not exist, each worker fails to read its pdf
+        dir_list = [(tmp_path / f"23120{index}_1.pdf").as_posix() for index in range(MIN_PDFS_FOR_PARALLEL_EXTRACTION)]
+        multiprocessing_controls: list = []
+
+        with pytest.raises(ExtractMetadataFailedException):
+            with extract_metadata_pool(PARALLEL, multiprocessing_controls, TestMonitoring()) as pool:
+                extract_metadata(dir_list, specific_prescriptions=None, monitoring=TestMonitoring(), pool=pool)
+        assert len(multiprocessing_controls) == 1
@@ -0,0 +1,39 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.autoscription.core.extract_metadata import extract_table
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def load_first_page_tables() -> dict[str, Any]:
+    # The first page tables of the prescriptions of test/module/data, as pdfplumber returns them from the IDIKA pdfs,
+    # and an extra table of the dosage wordings the parser handles specially
+    with open(DATA_DIR / "first_page_tables.json", encoding="utf-8") as file:
+        return json.load(file)  # type: ignore[no-any-return]
+
+
+FIRST_PAGE_TABLES = load_first_page_tables()
+
+
+@pytest.fixture(scope="module")
+def golden() -> pd.DataFrame:
+    # What extract_table returned for the tables when it still processed them row by row
+    return pd.read_parquet(DATA_DIR / "extract_table_golden.parquet")
+
+
+class TestExtractTable:
+    @pytest.mark.parametrize("table", range(len(FIRST_PAGE_TABLES["tables"])))
+    def test_extract_table_matches_golden_output(self, golden: pd.DataFrame, table: int) -> None:
+        expected = golden[golden["table"] == table].drop(columns="table").reset_index(drop=True)
+        expected = expected.astype(FIRST_PAGE_TABLES["dtypes"][table])
+
+        result = extract_table(FIRST_PAGE_TABLES["tables"][table])
+
+        assert_frame_equal(result, expected)
+        assert result.dtypes.astype(str).to_dict() == FIRST_PAGE_TABLES["dtypes"][table]
@@ -1,6 +1,10 @@
+import pandas as pd
 import pytest
 
-from src.autoscription.core.extract_metadata import generate_dosage_check
+from src.autoscription.core.extract_metadata import (
+    generate_dosage_check,
+    generate_dosage_checks,
+)
 
 
 class TestGenerateDosageCheck:
@@ -25,3 +29,21 @@ class TestGenerateDosageCheck:
     )
     def test_generate_dosage_check(self, boxes_provided, boxes_required, dosage, dosage_qnt, expected_result):
         assert generate_dosage_check(boxes_provided, boxes_required, dosage, dosage_qnt) == expected_result
+
+    def test_generate_dosage_checks(self) -> None:
+        rows = [
+            (10.0, 10, 1, 1),
+            (8.0, 10, 1, 1),
+            (12.0, 10, 1, 1),
+            ("abc", 10, 1, 1),
+            (8.0, 10, 1, 999),
+            (8.0, 10, 999, 1),
+            (8.0, 10, 0, 1),
+            (1.0, 0, 1, 1),
+            (None, 10, 1, 1),
+        ]
+        boxes_provided, boxes_required, dosage, dosage_qnt = (pd.Series(column) for column in zip(*rows))
+
+        result = generate_dosage_checks(boxes_provided, boxes_required, pd.Series(dosage, dtype="string"), dosage_qnt)
+
+        assert result.tolist() == [generate_dosage_check(*row) for row in rows[:-1]] + ["CHECK"]
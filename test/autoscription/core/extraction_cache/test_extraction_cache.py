@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.extraction_cache import ExtractionCache
+
+
+def extraction() -> tuple[str, str, dict]:
+    dosages = pd.DataFrame(
+        {
+            "description": ["SALMENT INH.SUS.P 25MCG/DOSE BT X 1", "DEPON TAB 500MG BTx20"],
+            "dosage": pd.array(["1", None], dtype=pd.StringDtype()),
+            "boxes_provided": [1.0, 2.0],
+            "dosage_check": ["True", "CHECK"],
+        }
+    )
+    return "2312011234567", "101", {"category": 1, "patient_paid": 3.5, "dosages": dosages}
+
+
+def write_pdf(path: Path, content: bytes) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path.as_posix()
+
+
+class TestExtractionCache:
+    def test_set_and_get(self, tmp_path: Path) -> None:
+        cache = ExtractionCache(tmp_path / "cache", size_limit_mb=1)
+        key = cache.key(write_pdf(tmp_path / "2312011234567_1.pdf", b"pdf"))
+
+        assert cache.set(key, extraction())
+        prescription_id, idika_3_digits, check = cache.get(key)  # type: ignore[misc]
+
+        assert (prescription_id, idika_3_digits) == ("2312011234567", "101")
+        assert {name: check[name] for name in ["category", "patient_paid"]} == {"category": 1, "patient_paid": 3.5}
+        assert_frame_equal(check["dosages"], extraction()[2]["dosages"])
+
+    def test_key_depends_on_file_name_content_and_parser_version(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        first = write_pdf(tmp_path / "2312011234567_1.pdf", b"pdf")
+        key = ExtractionCache.key(first)
+
+        assert ExtractionCache.key(write_pdf(tmp_path / "copy" / "2312011234567_1.pdf", b"pdf")) == key
+        assert ExtractionCache.key(write_pdf(tmp_path / "2312011234567_2.pdf", b"pdf")) != key
+        assert ExtractionCache.key(write_pdf(tmp_path / "copy" / "2312011234567_1.pdf", b"other pdf")) != key
+        mocker.patch("src.autoscription.core.extraction_cache.EXTRACTION_PARSER_VERSION", 0)
+        assert ExtractionCache.key(first) != key
+
+    def test_key_depends_on_the_product_catalogue_version(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        pdf = write_pdf(tmp_path / "2312011234567_1.pdf", b"pdf")
+        key = ExtractionCache.key(pdf)
+
+        mocker.patch(
+            "src.autoscription.dosage_extractor.product_number_extractor._product_list_file_version", 1700000000
+        )
+
+        assert ExtractionCache.key(pdf) != key
+
+    def test_lookup_of_unreadable_pdf(self, tmp_path: Path) -> None:
+        cache = ExtractionCache(tmp_path / "cache", size_limit_mb=1)
+
+        assert cache.lookup((tmp_path / "missing.pdf").as_posix()) == ("", None)
+
+    def test_unstorable_dosages_are_not_cached(self, tmp_path: Path) -> None:
+        cache = ExtractionCache(tmp_path / "cache", size_limit_mb=1)
+        prescription_id, idika_3_digits, check = extraction()
+        check["dosages"]["boxes_required"] = [1, "a"]
+
+        assert not cache.set("key", (prescription_id, idika_3_digits, check))
+        assert cache.get("key") is None
+
+    def test_size_limit_is_kept_when_opened_without_one(self, tmp_path: Path) -> None:
+        ExtractionCache(tmp_path / "cache", size_limit_mb=3).close()
+
+        assert ExtractionCache(tmp_path / "cache").cache.size_limit == 3 * 2**20
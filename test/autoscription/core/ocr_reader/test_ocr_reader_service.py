@@ -0,0 +1,43 @@
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.ocr_reader import OcrReaderService
+
+
+class TestOcrReaderService:
+    def test_reader_is_loaded_on_first_request_only(self, mocker: MockerFixture) -> None:
+        create_ocr_reader = mocker.patch("src.autoscription.core.ocr_reader.create_ocr_reader", return_value="reader")
+        service = OcrReaderService()
+
+        assert not service.is_loaded
+        create_ocr_reader.assert_not_called()
+
+        assert service.get(TestMonitoring()) == "reader"
+        assert service.get(TestMonitoring()) == "reader"
+        assert service.is_loaded
+        create_ocr_reader.assert_called_once()
+
+    def test_prewarm_loads_reader_in_background(self, mocker: MockerFixture) -> None:
+        create_ocr_reader = mocker.patch("src.autoscription.core.ocr_reader.create_ocr_reader", return_value="reader")
+        service = OcrReaderService()
+
+        service.prewarm(TestMonitoring())
+        service._prewarm_thread.join(timeout=5)  # type: ignore[union-attr]
+
+        assert service.is_loaded
+        service.prewarm(TestMonitoring())
+        assert service.get(TestMonitoring()) == "reader"
+        create_ocr_reader.assert_called_once()
+
+    def test_failed_prewarm_leaves_reader_to_first_request(self, mocker: MockerFixture) -> None:
+        create_ocr_reader = mocker.patch(
+            "src.autoscription.core.ocr_reader.create_ocr_reader", side_effect=[RuntimeError("no memory"), "reader"]
+        )
+        service = OcrReaderService()
+
+        service.prewarm(TestMonitoring())
+        service._prewarm_thread.join(timeout=5)  # type: ignore[union-attr]
+
+        assert not service.is_loaded
+        assert service.get(TestMonitoring()) == "reader"
+        assert create_ocr_reader.call_count == 2
@@ -0,0 +1,219 @@
+from typing import Any, Callable, Optional
+
+import pytest
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.errors import SkippedException
+from src.autoscription.core.logging import Monitoring, TestMonitoring
+from src.autoscription.core.prescription_header import (
+    PrescriptionHeader,
+    parse_prescription_header,
+)
+
+# Laid out like the text PyPDF2 extracts from a prescription pdf, with made up names and amounts
+TEXT = """ΗΛΕΚΤΡΟΝΙΚΗ ΔΙΑΚΥΒΕΡΝΗΣΗ ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ
+Ε.Ο.Π.Υ.Υ. - ΑΜΕΣΗΣ ΑΣΦΑΛΙΣΗΣ
+Σ Υ Ν Τ Α Γ Η
+Άυλη συνταγογράφηση
+ΑΡΙΘΜΟΣ ΣΥΝΤΑΓΗΣ 2312041234567101ΘΕΡΑΠΕΙΑ : ΧΡΟΝΙΑ ΠΑΘΗΣΗ
+ΕΠΑΝΑΛΗΨΗ : 1 / 3
+ΗΜΕΡΟΜΗΝΙΑ ΕΚΔΟΣΗΣ : 04/12/2023 ΑΠΟ : 04/12/2023 ΕΩΣ : 03/01/2024 / Κ:5
+ΣΤΟΙΧΕΙΑ ΙΑΤΡΟΥ ΣΤΟΙΧΕΙΑ ΑΣΘΕΝΗ
+ΕΠΩΝΥΜΟ : ΠΑΠΑΔΟΠΟΥΛΟΣ ΕΠΩΝΥΜΟ : ΓΕΩΡΓΙΟΥ
+ΟΝΟΜΑ : ΝΙΚΟΛΑΟΣ ΟΝΟΜΑ : ΜΑΡΙΑ
+Α.Μ.Κ.Α. : 01018012345 Α.Μ.Κ.Α. : 02029054321
+ΜΟΝΑΔΑ : ΙΔΙΩΤΙΚΟ ΙΑΤΡΕΙΟ ΔΙΕΥΘΥΝΣΗ : ΟΔΟΣ 1 ΑΘΗΝΑ
+επιθυμώ να λάβω ακριβότερο φάρμακο
+B-MAG EFF.GRAN 243MG/SACHET BTX 10 SACHETS 25% 3 8,2 24,6 6,15 18,45
+ΔΟΣΟΛΟΓΙΑ : 1 ΦΑΚΕΛΑΚΙ x 1 φορά την ημέρα x 30 ημέρες
+ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΑΣΦ/ΝΟ € 6,15
+ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΤΑΜΕΙΟ € 1.018,45
+Σελίδα 1 από 1
+"""
+
+
+# The text helpers of extract_metadata that parse_prescription_header replaced, kept as they were
+
+
+def extract_3_digits(text: str) -> str:
+    end = text.find("ΘΕΡΑΠΕΙΑ :")
+    result = text[:end][-3:]
+    if result.isdigit():
+        return result
+    else:
+        end = text.find("ΕΠΑΝΑΛΗΨΗ :")
+        return text[:end][-3:]
+
+
+def is_immatereal(text: str) -> bool:
+    if "Άυλη συνταγογράφηση" in text:
+        return True
+    else:
+        return False
+
+
+# TODO: update to bool instead of int
+def is_prototype(text: str) -> int:
+    if "επιθυμώ να λάβω ακριβότερο φάρμακο" in text:
+        return 1
+    else:
+        return 0
+
+
+def get_category(text: str) -> int | None:
+    try:
+        for line in text.split("\n"):
+            if "ΕΩΣ :" in line:
+                return int(line.split("/")[-1].strip()[2])
+    except IndexError:
+        return 8
+    return None
+
+
+def get_category_name(text: str) -> str:
+    mk1 = text.find("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ")
+    if mk1 != -1:
+        mk1 += len("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ")
+    else:
+        mk1 = text.find("ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ")
+        if mk1 != -1:
+            mk1 += len("ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ")
+        else:
+            mk1 = 4
+    mk2 = text.find("Σ Υ Ν Τ Α Γ Η", mk1)
+    return text[mk1:mk2].strip().replace("\n", " ")
+
+
+def get_names(text: str) -> tuple[str, str]:
+    doc_surname_start = text.find("ΕΠΩΝΥΜΟ :") + 10
+    doc_surname_end = text.find(" ΕΠΩΝΥΜΟ :", doc_surname_start)
+    patient_surname_end = text.find("\nΟΝΟΜΑ :", doc_surname_end)
+    patient_surname = text[doc_surname_end + 11 : patient_surname_end]
+    doc_surname = text[doc_surname_start:doc_surname_end]
+    doc_name_start = text.find("ΟΝΟΜΑ :") + 8
+    doc_name_end = text.find(" ΟΝΟΜΑ :", doc_name_start)
+    doc_name = text[doc_name_start:doc_name_end]
+    patient_name_end = text.find("\nΑ.Μ.Κ.Α.", doc_name_end)
+    patient_name = text[doc_name_end + 9 : patient_name_end]
+    return f"{doc_surname} {doc_name}", f"{patient_surname} {patient_name}"
+
+
+def find_unit(page: str) -> str:
+    mk1 = page.find("ΜΟΝΑΔΑ : ") + 9
+    mk2 = page.find(" ΔΙΕΥΘΥΝΣΗ", mk1)
+    return page[mk1:mk2]
+
+
+def find_insurance_amount(text: str, file: str, monitoring: Monitoring) -> Optional[float]:
+    phrase = "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΤΑΜΕΙΟ €"
+    start_pos = text.find(phrase)
+    if start_pos == -1:
+        monitoring.logger_adapter.exception(
+            f"Phrase '{phrase}' not found in text", SkippedException(ValueError(f"Phrase '{phrase}' not found in text"))
+        )
+        return None
+    value_start_pos = start_pos + len(phrase)
+    value_str = text[value_start_pos:].split("\n")[0].strip().replace(".", "").replace(",", ".")
+    try:
+        return float(value_str)
+    except ValueError as ve:
+        monitoring.logger_adapter.exception(
+            f"Failed to convert '{value_str}' to float in file: {file}", SkippedException(ve)
+        )
+        return None
+
+
+def find_patient_amount(text: str, file: str, monitoring: Monitoring) -> Optional[float]:
+    phrase = "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΑΣΦ/ΝΟ €"
+    start_pos = text.find(phrase)
+    if start_pos == -1:
+        monitoring.logger_adapter.exception(
+            f"Phrase '{phrase}' not found in text", SkippedException(ValueError(f"Phrase '{phrase}' not found in text"))
+        )
+        return None
+    value_start_pos = start_pos + len(phrase)
+    value_str = text[value_start_pos:].split("\n")[0].strip().replace(".", "").replace(",", ".")
+    try:
+        return float(value_str)
+    except ValueError as ve:
+        monitoring.logger_adapter.exception(
+            f"Failed to convert '{value_str}' to float in file: {file}", SkippedException(ve)
+        )
+        return None
+
+
+def legacy_header(text: str, file: str, monitoring: Monitoring) -> PrescriptionHeader:
+    doc_name, patient_name = get_names(text)
+    return PrescriptionHeader(
+        idika_3_digits=str(extract_3_digits(text)),
+        is_digital=is_immatereal(text),
+        unit=find_unit(text),
+        category=get_category(text),
+        category_name=get_category_name(text),
+        is_prototype=is_prototype(text),
+        doc_name=doc_name,
+        patient_name=patient_name,
+        insurance_amount=find_insurance_amount(text, file, monitoring),
+        patient_amount=find_patient_amount(text, file, monitoring),
+    )
+
+
+def outcome(parse: Callable[[str, str, Monitoring], PrescriptionHeader], text: str) -> Any:
+    try:
+        return parse(text, "2312041234567_1.pdf", TestMonitoring())
+    except Exception as e:
+        return type(e)
+
+
+VARIANTS = {
+    "idika": TEXT,
+    "military": TEXT.replace("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ", "ΥΠΟΥΡΓΕΙΟ ΕΘΝΙΚΗΣ ΑΜΥΝΑΣ"),
+    "no category name label": TEXT.replace("ΚΟΙΝΩΝΙΚΗΣ ΑΣΦΑΛΙΣΗΣ", "ΑΣΦΑΛΙΣΗ"),
+    "material, not prototype": TEXT.replace("Άυλη συνταγογράφηση", "").replace("επιθυμώ", "δεν επιθυμώ"),
+    "three digits before the repetition": TEXT.replace("101ΘΕΡΑΠΕΙΑ :", "ΘΕΡΑΠΕΙΑ :").replace(
+        "ΕΠΑΝΑΛΗΨΗ :", "102ΕΠΑΝΑΛΗΨΗ :"
+    ),
+    "short category": TEXT.replace("/ Κ:5", "/ 5"),
+    "no category": TEXT.replace("ΕΩΣ :", "ΜΕΧΡΙ :"),
+    "no amounts": TEXT.replace("ΠΛΗΡΩΤΕΟ", "ΣΥΝΟΛΙΚΟ"),
+    "amount without a value": TEXT.replace("€ 6,15", "€ -"),
+    "amount at the end": TEXT[: TEXT.index("ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΤΑΜΕΙΟ")] + "ΠΛΗΡΩΤΕΟ ΠΟΣΟ ΑΠΟ ΤΑΜΕΙΟ € 18,45",
+    "no names": TEXT.replace("ΕΠΩΝΥΜΟ :", "").replace("ΟΝΟΜΑ :", ""),
+    "no unit": TEXT.replace("ΜΟΝΑΔΑ :", "ΦΟΡΕΑΣ :"),
+    "empty": "",
+}
+LINES = TEXT.split("\n")
+
+
+class TestParsePrescriptionHeader:
+    def test_idika_text(self) -> None:
+        assert parse_prescription_header(TEXT, "2312041234567_1.pdf", TestMonitoring()) == PrescriptionHeader(
+            idika_3_digits="101",
+            is_digital=True,
+            unit="ΙΔΙΩΤΙΚΟ ΙΑΤΡΕΙΟ",
+            category=5,
+            category_name="Ε.Ο.Π.Υ.Υ. - ΑΜΕΣΗΣ ΑΣΦΑΛΙΣΗΣ",
+            is_prototype=1,
+            doc_name="ΠΑΠΑΔΟΠΟΥΛΟΣ ΝΙΚΟΛΑΟΣ",
+            patient_name="ΓΕΩΡΓΙΟΥ ΜΑΡΙΑ",
+            insurance_amount=1018.45,
+            patient_amount=6.15,
+        )
+
+    @pytest.mark.parametrize("text", VARIANTS.values(), ids=VARIANTS.keys())
+    def test_same_as_the_text_helpers(self, text: str) -> None:
+        assert outcome(parse_prescription_header, text) == outcome(legacy_header, text)
+
+    @pytest.mark.parametrize("missing_line", range(len(LINES)))
+    def test_same_as_the_text_helpers_without_a_line(self, missing_line: int) -> None:
+        text = "\n".join(LINES[:missing_line] + LINES[missing_line + 1 :])
+        assert outcome(parse_prescription_header, text) == outcome(legacy_header, text)
+
+    def test_missing_amount_is_logged(self, mocker: MockerFixture) -> None:
+        monitoring = TestMonitoring()
+        exception = mocker.patch.object(monitoring.logger_adapter, "exception")
+
+        header = parse_prescription_header(VARIANTS["no amounts"], "2312041234567_1.pdf", monitoring)
+
+        assert header.insurance_amount is None and header.patient_amount is None
+        assert [type(call.args[1]) for call in exception.call_args_list] == [SkippedException, SkippedException]
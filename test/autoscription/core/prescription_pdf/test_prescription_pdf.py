@@ -0,0 +1,45 @@
+import builtins
+from pathlib import Path
+
+import pdfplumber
+import pytest
+from PyPDF2 import PdfReader
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.prescription_pdf import PrescriptionPdf
+
+PDF_WITH_TABLE = (Path(__file__).parents[4] / "resources" / "gui" / "Sync_errors.pdf").as_posix()
+MULTI_PAGE_PDF = (Path(__file__).parents[4] / "resources" / "gui" / "Process_Cleanup_Guide.pdf").as_posix()
+
+
+class TestPrescriptionPdf:
+    def test_text_and_page_count_match_pypdf2(self) -> None:
+        reader = PdfReader(MULTI_PAGE_PDF)
+        expected_text = "".join(page.extract_text() + "\n" for page in reader.pages)
+
+        with PrescriptionPdf(MULTI_PAGE_PDF) as pdf:
+            assert pdf.page_count == len(reader.pages) == 3
+            assert pdf.text == expected_text
+
+    def test_first_page_table_matches_pdfplumber(self) -> None:
+        with pdfplumber.open(PDF_WITH_TABLE) as plumber_pdf:
+            expected_table = plumber_pdf.pages[0].extract_table()
+
+        with PrescriptionPdf(PDF_WITH_TABLE) as pdf:
+            assert pdf.first_page_table == expected_table
+            assert len(pdf.first_page_table) == 8
+
+    def test_file_is_read_once(self, mocker: MockerFixture) -> None:
+        opened = mocker.spy(builtins, "open")
+
+        with PrescriptionPdf(PDF_WITH_TABLE) as pdf:
+            _ = pdf.text, pdf.page_count, pdf.first_page_table
+
+        assert [call.args[0] for call in opened.call_args_list if call.args[0] == PDF_WITH_TABLE] == [PDF_WITH_TABLE]
+
+    def test_closed_pdf_is_not_parsed(self) -> None:
+        with PrescriptionPdf(PDF_WITH_TABLE) as pdf:
+            pass
+
+        with pytest.raises(ValueError):
+            _ = pdf.text
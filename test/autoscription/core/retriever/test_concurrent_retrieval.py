@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from test.autoscription.stub_server import StubResponse, StubServer, serve
+
+import pytest
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.retriever import ClinicalDocumentRetriever
+from src.autoscription.idika_client.api_client import IdikaAPIClient, IdikaHttpClient
+
+SAMPLES_DIR = Path(__file__).parents[2] / "idika_client"
+CLINICAL_DOCUMENT = (SAMPLES_DIR / "clinical_document_sample.xml").read_text(encoding="utf-8")
+PARTIAL_CLINICAL_DOCUMENT = (SAMPLES_DIR / "partial_clinical_document_sample.xml").read_text(encoding="utf-8")
+PRESCRIPTIONS_PATH = "/pharmacistapi/api/v1/prescriptions/get/"
+
+
+class StubIdika(StubServer):
+    """Serve the sample clinical documents under the barcode of the request, slowly enough for them to overlap."""
+
+    def __init__(self, fail_once: set[str], always_fail: set[str], delay: float = 0.05) -> None:
+        super().__init__(delay=delay)
+        self.fail_once = set(fail_once)
+        self.always_fail = always_fail
+        self.started: list[tuple[float, str]] = []
+
+    def respond(self, path: str) -> StubResponse:
+        barcode, _, execution = path.split("?")[0][len(PRESCRIPTIONS_PATH) :].partition("/dispensation/")
+        self.started.append((time.monotonic(), barcode))
+        fails = barcode in self.always_fail or barcode in self.fail_once
+        self.fail_once.discard(barcode)
+        if fails:
+            return StubResponse(status=404)
+        if execution:
+            body = PARTIAL_CLINICAL_DOCUMENT.replace("1504079007910", barcode)
+        else:
+            body = CLINICAL_DOCUMENT.replace("1111111111111", barcode)
+        return StubResponse(content=body.encode("utf-8"), headers={"Content-Type": "application/xml"})
+
+
+@pytest.fixture
+def barcodes() -> list[str]:
+    return [f"2312{index:09d}" for index in range(12)]
+
+
+@pytest.fixture
+def stub(barcodes: list[str]) -> Iterator[StubIdika]:
+    with serve(StubIdika(fail_once={barcodes[3], barcodes[7]}, always_fail={barcodes[9]})) as stub:
+        yield stub
+
+
+def retriever(base_url: str, max_in_flight: int, requests_per_second: float = 0.0) -> ClinicalDocumentRetriever:
+    idika_api_client = IdikaAPIClient(
+        idika_http_client=IdikaHttpClient(
+            base_url=base_url,
+            api_key="api_key",
+            username="username",
+            password="password",
+            requests_per_second=requests_per_second,
+        )
+    )
+    idika_api_client.pharmacy_id = 1
+    return ClinicalDocumentRetriever(
+        idika_api_client=idika_api_client, monitoring=TestMonitoring(), max_in_flight=max_in_flight
+    )
+
+
+class TestConcurrentRetrieval:
+    def test_retrieve_clinical_documents(self, stub: StubIdika, barcodes: list[str]) -> None:
+        documents = retriever(stub.base_url, max_in_flight=4).retrieve_clinical_documents(barcodes)
+
+        retried = [barcodes[3], barcodes[7]]
+        expected = [barcode for barcode in barcodes if barcode not in retried + [barcodes[9]]] + retried
+        assert [document.barcode for document in documents] == expected
+        assert sorted(barcode for _, barcode in stub.started) == sorted(barcodes + retried + [barcodes[9]])
+        assert 1 < stub.max_in_flight <= 4
+
+    def test_retrieve_partial_clinical_documents(self, stub: StubIdika, barcodes: list[str]) -> None:
+        details = [{"prescription": barcode, "execution": index % 3 + 1} for index, barcode in enumerate(barcodes)]
+
+        documents = retriever(stub.base_url, max_in_flight=4).retrieve_partial_clinical_documents(details)
+
+        retried = [details[3], details[7]]
+        expected = [detail for detail in details if detail not in retried + [details[9]]] + retried
+        assert [(document.barcode, document.execution) for document in documents] == [
+            (detail["prescription"], detail["execution"]) for detail in expected
+        ]
+        assert 1 < stub.max_in_flight <= 4
+
+    def test_the_same_documents_as_the_serial_retrieval(self, barcodes: list[str]) -> None:
+        results = []
+        for max_in_flight in [1, 8]:
+            stub = StubIdika(fail_once={barcodes[0], barcodes[5]}, always_fail={barcodes[11]}, delay=0.01)
+            with serve(stub):
+                results.append(retriever(stub.base_url, max_in_flight).retrieve_clinical_documents(barcodes))
+
+        serial, concurrent = results
+        assert concurrent == serial
+        assert len(serial) == len(barcodes) - 1
+
+    def test_requests_to_the_host_are_rate_limited(self, barcodes: list[str]) -> None:
+        with serve(StubIdika(fail_once=set(), always_fail=set(), delay=0.0)) as stub:
+            retriever(stub.base_url, max_in_flight=8, requests_per_second=50).retrieve_clinical_documents(barcodes)
+
+        starts = sorted(start for start, _ in stub.started)
+        assert len(starts) == len(barcodes)
+        # 1 / 50 seconds between the starts, less the jitter of the threads of the stub
+        assert starts[-1] - starts[0] >= (len(barcodes) - 1) / 50 * 0.8
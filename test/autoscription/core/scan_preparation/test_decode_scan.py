@@ -0,0 +1,178 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+import pytest
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.scan_preparation import (
+    BLANK_PAGE_DENSITY_THRESHOLD,
+    BLANK_PAGE_STAGE,
+    OCR_STAGE,
+    PENDING_OCR_STAGE,
+    UNREADABLE_STAGE,
+    BarcodeStageStats,
+    ScanDecodeResult,
+    decode_scan,
+    read_pending_barcodes_ocr,
+    thumbnail_pixel_density,
+)
+
+STAGES = ["top_band_gray", "threshold_210", "threshold_220", "threshold_180"]
+SCAN_PREPARATION_CONFIG = {"barcode_stages": STAGES, "barcode_regions": [[10, 20, 60, 50], [60, 30, 190, 80]]}
+
+
+def found(barcode: str) -> list:
+    detected = MagicMock()
+    detected.data = barcode.encode("utf-8")
+    return [detected]
+
+
+def printed_page() -> np.ndarray:
+    page = np.full((400, 200, 3), 255, dtype=np.uint8)
+    page[20:60, 20:180] = 0
+    return page
+
+
+class TestDecodeScan:
+    @pytest.fixture(autouse=True)
+    def image(self, mocker: MockerFixture) -> MagicMock:
+        return mocker.patch("src.autoscription.core.scan_preparation.cv2.imread", return_value=printed_page())
+
+    def test_decode_scan_stops_at_first_stage_with_barcode(self, mocker: MockerFixture) -> None:
+        retrieve = mocker.patch(
+            "src.autoscription.core.scan_preparation.retrieve_prescription_barcodes",
+            side_effect=[[], found("1234567890123456")],
+        )
+        threshold_220 = mocker.patch.dict(
+            "src.autoscription.core.scan_preparation.barcode_decoding_stages", {"threshold_220": MagicMock()}
+        )["threshold_220"]
+
+        result = decode_scan(Path("scan.jpg"), SCAN_PREPARATION_CONFIG, TestMonitoring())
+
+        assert result.barcode == "1234567890123456"
+        assert result.stage == "threshold_210"
+        assert retrieve.call_count == 2
+        threshold_220.assert_not_called()
+
+    def test_decode_scan_top_band_is_grayscale_crop(self, mocker: MockerFixture) -> None:
+        retrieve = mocker.patch(
+            "src.autoscription.core.scan_preparation.retrieve_prescription_barcodes",
+            return_value=found("1234567890123456"),
+        )
+
+        result = decode_scan(Path("scan.jpg"), SCAN_PREPARATION_CONFIG, TestMonitoring())
+
+        assert result.stage == "top_band_gray"
+        assert retrieve.call_args.args[1].shape == (100, 200)
+
+    def test_decode_scan_leaves_miss_for_ocr(self, mocker: MockerFixture) -> None:
+        retrieve = mocker.patch(
+            "src.autoscription.core.scan_preparation.retrieve_prescription_barcodes", return_value=[]
+        )
+
+        result = decode_scan(Path("scan.jpg"), SCAN_PREPARATION_CONFIG, TestMonitoring())
+
+        assert result == ScanDecodeResult(barcode="", probable_barcodes="", stage=PENDING_OCR_STAGE)
+        assert retrieve.call_count == len(STAGES)
+
+    def test_decode_scan_searches_barcode_regions_before_full_page(self, mocker: MockerFixture) -> None:
+        retrieve = mocker.patch(
+            "src.autoscription.core.scan_preparation.retrieve_prescription_barcodes",
+            side_effect=[[], found("1234567890123456")],
+        )
+        config = {**SCAN_PREPARATION_CONFIG, "barcode_stages": ["barcode_regions", *STAGES]}
+
+        result = decode_scan(Path("scan.jpg"), config, TestMonitoring())
+
+        assert result.stage == "barcode_regions"
+        assert [call.args[1].shape for call in retrieve.call_args_list] == [(30, 50), (50, 130)]
+
+    def test_decode_scan_skips_the_barcode_regions_outside_a_small_page(
+        self, mocker: MockerFixture, image: MagicMock
+    ) -> None:
+        image.return_value = printed_page()[:25, :100]
+        retrieve = mocker.patch(
+            "src.autoscription.core.scan_preparation.retrieve_prescription_barcodes", return_value=[]
+        )
+        config = {**SCAN_PREPARATION_CONFIG, "barcode_stages": ["barcode_regions", *STAGES]}
+
+        result = decode_scan(Path("scan.jpg"), config, TestMonitoring())
+
+        assert result.stage == PENDING_OCR_STAGE
+        assert retrieve.call_args_list[0].args[1].shape == (5, 50)
+        assert retrieve.call_count == 1 + len(STAGES)
+
+    def test_decode_scan_skips_blank_page(self, mocker: MockerFixture, image: MagicMock) -> None:
+        image.return_value = np.full((400, 200, 3), 255, dtype=np.uint8)
+        retrieve = mocker.patch("src.autoscription.core.scan_preparation.retrieve_prescription_barcodes")
+
+        result = decode_scan(Path("scan.jpg"), SCAN_PREPARATION_CONFIG, TestMonitoring())
+
+        assert result.stage == BLANK_PAGE_STAGE
+        retrieve.assert_not_called()
+
+    def test_decode_scan_does_not_search_an_unreadable_scan(self, mocker: MockerFixture, image: MagicMock) -> None:
+        image.return_value = None
+        retrieve = mocker.patch("src.autoscription.core.scan_preparation.retrieve_prescription_barcodes")
+
+        result = decode_scan(Path("scan.jpg"), SCAN_PREPARATION_CONFIG, TestMonitoring())
+
+        assert result == ScanDecodeResult(barcode="", probable_barcodes="", stage=UNREADABLE_STAGE)
+        retrieve.assert_not_called()
+
+
+class TestReadPendingBarcodesOcr:
+    def test_read_pending_barcodes_ocr_batches_only_pending_scans(self, mocker: MockerFixture) -> None:
+        mocker.patch("src.autoscription.core.scan_preparation.ocr_reader_service.get", return_value="reader")
+        ocr = mocker.patch(
+            "src.autoscription.core.scan_preparation.get_barcodes_ocr_batched",
+            return_value=[("2312011234567890", ""), ("0000000000000000", "2312011234567891|2312011234567892")],
+        )
+        decoded = ScanDecodeResult(barcode="2312019999999999", probable_barcodes="", stage="barcode_regions")
+        pending = ScanDecodeResult(barcode="", probable_barcodes="", stage=PENDING_OCR_STAGE)
+        filepaths = [Path("a.jpg"), Path("b.jpg"), Path("c.jpg")]
+
+        results = read_pending_barcodes_ocr(
+            filepaths, [pending, decoded, pending], {"ocr_batch_size": 8}, TestMonitoring()
+        )
+
+        assert ocr.call_args.args[:2] == ("reader", [Path("a.jpg"), Path("c.jpg")])
+        assert results == [
+            ScanDecodeResult(barcode="2312011234567890", probable_barcodes="", stage=OCR_STAGE),
+            decoded,
+            ScanDecodeResult(
+                barcode="0000000000000000", probable_barcodes="2312011234567891|2312011234567892", stage=OCR_STAGE
+            ),
+        ]
+
+    def test_read_pending_barcodes_ocr_without_pending_scans(self, mocker: MockerFixture) -> None:
+        reader = mocker.patch("src.autoscription.core.scan_preparation.ocr_reader_service.get")
+        decoded = [ScanDecodeResult(barcode="2312019999999999", probable_barcodes="", stage="barcode_regions")]
+
+        assert read_pending_barcodes_ocr([Path("a.jpg")], decoded, {"ocr_batch_size": 8}, TestMonitoring()) == decoded
+        reader.assert_not_called()
+
+
+class TestThumbnailPixelDensity:
+    def test_thumbnail_pixel_density_matches_full_page(self) -> None:
+        page = np.full((3508, 2480, 3), 255, dtype=np.uint8)
+        page[3000:3101, 100:2000] = 0
+
+        full_page_density = np.average(
+            cv2.threshold(cv2.cvtColor(page, cv2.COLOR_BGR2GRAY), 180, 255, cv2.THRESH_BINARY)[1]
+        )
+
+        assert thumbnail_pixel_density(page) == pytest.approx(full_page_density, abs=0.5)
+        assert thumbnail_pixel_density(page) < BLANK_PAGE_DENSITY_THRESHOLD
+
+
+class TestBarcodeStageStats:
+    def test_hit_rates(self) -> None:
+        stats = BarcodeStageStats()
+        for stage in ["top_band_gray", "top_band_gray", "threshold_210", OCR_STAGE]:
+            stats.add(stage)
+
+        assert stats.hit_rates() == {"top_band_gray": 0.5, "threshold_210": 0.25, OCR_STAGE: 0.25}
@@ -0,0 +1,103 @@
+import multiprocessing
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.scan_preparation import ScanDecodeResult, decode_scans
+
+STAGES = ["top_band_gray", "threshold_210"]
+
+
+def decode_scan_by_name(
+    filepath: Path, scan_preparation_config: dict, monitoring: object  # noqa: U100
+) -> ScanDecodeResult:
+    return ScanDecodeResult(
+        barcode=filepath.stem, probable_barcodes="", stage=scan_preparation_config["barcode_stages"][0]
+    )
+
+
+class TestDecodeScans:
+    @pytest.fixture
+    def images(self) -> list:
+        return [Path(f"scan_{i:03d}.jpg") for i in range(20)]
+
+    def test_decode_scans_sequentially_keeps_stack_order(self, mocker: MockerFixture, images: list) -> None:
+        mocker.patch("src.autoscription.core.scan_preparation.decode_scan", side_effect=decode_scan_by_name)
+
+        results = list(
+            decode_scans(
+                images=images,
+                scan_preparation_config={
+                    "parallel": {"is_enabled": False, "max_processes": 4},
+                    "barcode_stages": STAGES,
+                },
+                multiprocessing_controls=[],
+                monitoring=TestMonitoring(),
+            )
+        )
+
+        assert [r.barcode for r in results] == [i.stem for i in images]
+
+    @pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="patches are inherited only by fork")
+    def test_decode_scans_in_parallel_keeps_stack_order(self, mocker: MockerFixture, images: list) -> None:
+        mocker.patch("src.autoscription.core.scan_preparation.decode_scan", new=decode_scan_by_name)
+        multiprocessing_controls: list = []
+
+        results = list(
+            decode_scans(
+                images=images,
+                scan_preparation_config={
+                    "parallel": {"is_enabled": True, "max_processes": 3},
+                    "barcode_stages": STAGES,
+                },
+                multiprocessing_controls=multiprocessing_controls,
+                monitoring=TestMonitoring(),
+            )
+        )
+
+        assert [r.barcode for r in results] == [i.stem for i in images]
+        assert len(multiprocessing_controls) == 1
+
+    def test_decode_scans_few_images_does_not_start_a_pool(self, mocker: MockerFixture) -> None:
+        mocker.patch("src.autoscription.core.scan_preparation.decode_scan", side_effect=decode_scan_by_name)
+        pool = mocker.patch("src.autoscription.core.scan_preparation.multiprocessing.Pool")
+        multiprocessing_controls: list = []
+
+        results = list(
+            decode_scans(
+                images=[Path("a.jpg"), Path("b.jpg")],
+                scan_preparation_config={
+                    "parallel": {"is_enabled": True, "max_processes": 3},
+                    "barcode_stages": STAGES,
+                },
+                multiprocessing_controls=multiprocessing_controls,
+                monitoring=TestMonitoring(),
+            )
+        )
+
+        assert [r.barcode for r in results] == ["a", "b"]
+        pool.assert_not_called()
+        assert multiprocessing_controls == []
+
+    def test_decode_scans_stopped_early_terminates_the_pool(self, mocker: MockerFixture, images: list) -> None:
+        mocker.patch("src.autoscription.core.scan_preparation.multiprocessing.Manager")
+        mocker.patch("src.autoscription.core.scan_preparation.log_queue")
+        pool = mocker.patch("src.autoscription.core.scan_preparation.multiprocessing.Pool").return_value
+        pool.imap.return_value = iter(
+            [decode_scan_by_name(image, {"barcode_stages": STAGES}, None) for image in images]
+        )
+
+        decoded_scans = decode_scans(
+            images=images,
+            scan_preparation_config={"parallel": {"is_enabled": True, "max_processes": 3}, "barcode_stages": STAGES},
+            multiprocessing_controls=[],
+            monitoring=TestMonitoring(),
+        )
+        assert next(decoded_scans).barcode == images[0].stem
+        decoded_scans.close()
+
+        pool.terminate.assert_called_once()
+        pool.close.assert_not_called()
+        pool.join.assert_called_once()
@@ -0,0 +1,24 @@
+from src.autoscription.core.scan_preparation import SCAN_INDEX_COLUMNS, ScanIndexBuilder
+
+
+class TestScanIndexBuilder:
+    def test_to_dataframe_keeps_rows_and_counts_barcodes(self) -> None:
+        builder = ScanIndexBuilder()
+        builder.add("2312011234567890", 0, "20231201_2312011234567890_001.jpg", "", "a.jpg")
+        builder.add("2312011234567890", 1, "20231201_2312011234567890_002.jpg", "", "b.jpg")
+        builder.add("0000000000000000", 2, "20231201_0000000000000000_001.jpg", "1|2", "c.jpg")
+
+        index_df = builder.to_dataframe()
+
+        assert list(index_df.columns) == SCAN_INDEX_COLUMNS
+        assert index_df["stack_number"].tolist() == [0, 1, 2]
+        assert index_df["old_filname"].tolist() == ["a.jpg", "b.jpg", "c.jpg"]
+        assert len(builder) == 3
+        assert builder.count("2312011234567890") == 2
+        assert builder.count("0000000000000000") == 1
+        assert builder.count("2312019999999999") == 0
+        assert builder.prescription_scanned_pages() == {
+            "20231201_2312011234567890_001.jpg",
+            "20231201_2312011234567890_002.jpg",
+            "20231201_0000000000000000_001.jpg",
+        }
@@ -0,0 +1,109 @@
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.scan_preparation import (
+    SCAN_MANIFEST_FILE,
+    ScanDecodeResult,
+    ScanManifest,
+    ScanManifestEntry,
+    decode_into_manifest,
+    file_content_hash,
+)
+
+ENTRY = ScanManifestEntry(
+    barcode="2312011234567890",
+    probable_barcodes="",
+    stage="barcode_regions",
+    prescription_scanned_pages="20231201_2312011234567890_001.jpg",
+)
+
+
+class TestScanManifest:
+    def test_load_without_manifest(self, tmp_path: Path) -> None:
+        manifest = ScanManifest.load(tmp_path / SCAN_MANIFEST_FILE, save_every=10, monitoring=TestMonitoring())
+
+        assert len(manifest) == 0
+        assert manifest.get("hash") is None
+
+    def test_save_and_load(self, tmp_path: Path) -> None:
+        manifest = ScanManifest(tmp_path / SCAN_MANIFEST_FILE, save_every=10)
+        manifest.add("hash", ENTRY)
+        manifest.save()
+
+        loaded = ScanManifest.load(tmp_path / SCAN_MANIFEST_FILE, save_every=10, monitoring=TestMonitoring())
+
+        assert loaded.get("hash") == ENTRY
+        assert loaded.get("hash").to_decode_result() == ScanDecodeResult(  # type: ignore[union-attr]
+            barcode="2312011234567890", probable_barcodes="", stage="barcode_regions"
+        )
+
+    def test_add_saves_every_few_entries(self, tmp_path: Path) -> None:
+        manifest = ScanManifest(tmp_path / SCAN_MANIFEST_FILE, save_every=2)
+
+        manifest.add("hash_1", ENTRY)
+        assert not (tmp_path / SCAN_MANIFEST_FILE).exists()
+
+        manifest.add("hash_2", ENTRY)
+        loaded = ScanManifest.load(tmp_path / SCAN_MANIFEST_FILE, save_every=2, monitoring=TestMonitoring())
+        assert len(loaded) == 2
+
+    def test_keep_only(self, tmp_path: Path) -> None:
+        manifest = ScanManifest(tmp_path / SCAN_MANIFEST_FILE, save_every=10)
+        manifest.add("hash_1", ENTRY)
+        manifest.add("hash_2", ENTRY)
+
+        manifest.keep_only({"hash_2", "hash_3"})
+
+        assert list(manifest.entries) == ["hash_2"]
+
+    def test_load_unreadable_manifest(self, tmp_path: Path) -> None:
+        (tmp_path / SCAN_MANIFEST_FILE).write_text("{not json")
+
+        manifest = ScanManifest.load(tmp_path / SCAN_MANIFEST_FILE, save_every=10, monitoring=TestMonitoring())
+
+        assert len(manifest) == 0
+
+
+def test_file_content_hash(tmp_path: Path) -> None:
+    (tmp_path / "a.jpg").write_bytes(b"scan")
+    (tmp_path / "b.jpg").write_bytes(b"scan")
+    (tmp_path / "c.jpg").write_bytes(b"other scan")
+
+    assert file_content_hash(tmp_path / "a.jpg") == file_content_hash(tmp_path / "b.jpg")
+    assert file_content_hash(tmp_path / "a.jpg") != file_content_hash(tmp_path / "c.jpg")
+
+
+class TestDecodeIntoManifest:
+    def test_decodes_only_unknown_scans_and_removes_blank_pages(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        known, new, blank = tmp_path / "known.jpg", tmp_path / "new.jpg", tmp_path / "blank.jpg"
+        known.write_bytes(b"known")
+        new.write_bytes(b"new")
+        blank.write_bytes(b"blank")
+        manifest = ScanManifest(tmp_path / SCAN_MANIFEST_FILE, save_every=10)
+        manifest.add(file_content_hash(known), ENTRY)
+        manifest.save()
+        decode_scan = mocker.patch(
+            "src.autoscription.core.scan_preparation.decode_scan",
+            side_effect=[
+                ScanDecodeResult(barcode="2312019876543210", probable_barcodes="", stage="top_band_gray"),
+                ScanDecodeResult(barcode="", probable_barcodes="", stage="blank_page"),
+            ],
+        )
+
+        decode_into_manifest(
+            [known, new, blank],
+            tmp_path,
+            scan_preparation_config={"manifest_save_every": 10},
+            monitoring=TestMonitoring(),
+        )
+
+        assert [call.args[0] for call in decode_scan.call_args_list] == [new, blank]
+        assert not blank.exists()
+        loaded = ScanManifest.load(tmp_path / SCAN_MANIFEST_FILE, save_every=10, monitoring=TestMonitoring())
+        assert len(loaded) == 2
+        assert loaded.get(file_content_hash(known)) == ENTRY
+        assert loaded.get(file_content_hash(new)) == ScanManifestEntry(
+            barcode="2312019876543210", probable_barcodes="", stage="top_band_gray", prescription_scanned_pages=""
+        )
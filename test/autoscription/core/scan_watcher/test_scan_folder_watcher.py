@@ -0,0 +1,103 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.scan_watcher import ScanFolderWatcher
+
+
+class TestScanFolderWatcher:
+    @pytest.fixture
+    def on_scans_landed(self) -> MagicMock:
+        return MagicMock()
+
+    @pytest.fixture
+    def on_folder_settled(self) -> MagicMock:
+        return MagicMock()
+
+    @pytest.fixture
+    def watcher(self, tmp_path: Path, on_scans_landed: MagicMock, on_folder_settled: MagicMock) -> ScanFolderWatcher:
+        return ScanFolderWatcher(
+            tmp_path,
+            on_scans_landed=on_scans_landed,
+            on_folder_settled=on_folder_settled,
+            poll_interval=0.01,
+            monitoring=TestMonitoring(),
+        )
+
+    def test_scans_land_once_stable_and_folder_settles_after(
+        self, tmp_path: Path, watcher: ScanFolderWatcher, on_scans_landed: MagicMock, on_folder_settled: MagicMock
+    ) -> None:
+        (tmp_path / "scan_2.jpg").write_bytes(b"second")
+        (tmp_path / "scan_1.jpg").write_bytes(b"first")
+        (tmp_path / "notes.txt").write_bytes(b"ignored")
+
+        watcher.poll_once()
+        on_scans_landed.assert_not_called()
+
+        watcher.poll_once()
+        on_scans_landed.assert_called_once_with([tmp_path / "scan_1.jpg", tmp_path / "scan_2.jpg"])
+        on_folder_settled.assert_not_called()
+
+        watcher.poll_once()
+        on_folder_settled.assert_called_once()
+
+        watcher.poll_once()
+        assert on_scans_landed.call_count == 1
+        assert on_folder_settled.call_count == 1
+
+    def test_growing_scan_is_not_handed_over(
+        self, tmp_path: Path, watcher: ScanFolderWatcher, on_scans_landed: MagicMock, on_folder_settled: MagicMock
+    ) -> None:
+        scan = tmp_path / "scan_1.jpg"
+        scan.write_bytes(b"first")
+        watcher.poll_once()
+        scan.write_bytes(b"first and more")
+
+        watcher.poll_once()
+
+        on_scans_landed.assert_not_called()
+        on_folder_settled.assert_not_called()
+
+    def test_rewritten_scan_lands_again(
+        self, tmp_path: Path, watcher: ScanFolderWatcher, on_scans_landed: MagicMock
+    ) -> None:
+        scan = tmp_path / "scan_1.jpg"
+        scan.write_bytes(b"first")
+        watcher.poll_once()
+        watcher.poll_once()
+        scan.write_bytes(b"rescanned page")
+        watcher.poll_once()
+
+        watcher.poll_once()
+
+        assert on_scans_landed.call_count == 2
+        on_scans_landed.assert_called_with([scan])
+
+    def test_paused_watcher_forgets_the_scans_it_has_seen(
+        self, tmp_path: Path, watcher: ScanFolderWatcher, on_scans_landed: MagicMock
+    ) -> None:
+        (tmp_path / "scan_1.jpg").write_bytes(b"first")
+        watcher.poll_once()
+        watcher.poll_once()
+
+        with watcher.paused():
+            pass
+        watcher.poll_once()
+        watcher.poll_once()
+
+        assert on_scans_landed.call_count == 2
+
+    def test_missing_scanner_output_dir(self, tmp_path: Path, on_scans_landed: MagicMock) -> None:
+        watcher = ScanFolderWatcher(
+            tmp_path / "missing",
+            on_scans_landed=on_scans_landed,
+            on_folder_settled=MagicMock(),
+            poll_interval=0.01,
+            monitoring=TestMonitoring(),
+        )
+
+        watcher.poll_once()
+
+        on_scans_landed.assert_not_called()
@@ -0,0 +1,66 @@
+from pathlib import Path
+from typing import Any
+
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.core import TIMES_TO_RETRY, Core
+from src.autoscription.core.logging import TestMonitoring
+
+
+def write_pdfs(ps_ids: list[dict[str, Any]], download_dir: Path, **kwargs: Any) -> tuple[list[Any], list[Any]]:
+    (download_dir / "0").mkdir(parents=True, exist_ok=True)
+    for ps_id in ps_ids:
+        (download_dir / "0" / f"{ps_id['prescription']}_{ps_id['execution']}.pdf").write_bytes(b"%PDF")
+    return [], []
+
+
+class TestDownloadAndExtractPastPartialExecutions:
+    def test_downloads_the_missing_executions_then_extracts_all(self, mocker: MockerFixture, tmp_path: Path) -> None:
+        (tmp_path / "0").mkdir()
+        (tmp_path / "0" / "2312011111111_1.pdf").write_bytes(b"%PDF")
+        download_prescriptions = mocker.patch(
+            "src.autoscription.core.core.download_prescriptions", side_effect=write_pdfs
+        )
+        extract_metadata = mocker.patch("src.autoscription.core.core.extract_metadata", return_value={"checks": {}})
+        pool, cache = mocker.Mock(), mocker.Mock()
+
+        checks = Core(monitoring=TestMonitoring()).download_and_extract_past_partial_executions(
+            past_partial_executions=[
+                {"prescription": "2312011111111", "execution": 1},
+                {"prescription": "2312011111111", "execution": 2},
+            ],
+            past_partial_exec_dir=tmp_path,
+            specific_prescriptions=None,
+            api_config={},
+            pool=pool,
+            cache=cache,
+        )
+
+        assert checks == {"checks": {}}
+        download_prescriptions.assert_called_once()
+        assert download_prescriptions.call_args.kwargs["ps_ids"] == [{"prescription": "2312011111111", "execution": 2}]
+        extract_metadata.assert_called_once()
+        assert sorted(Path(file).name for file in extract_metadata.call_args.kwargs["dir_list"]) == [
+            "2312011111111_1.pdf",
+            "2312011111111_2.pdf",
+        ]
+        assert extract_metadata.call_args.kwargs["pool"] is pool
+        assert extract_metadata.call_args.kwargs["cache"] is cache
+
+    def test_retries_the_executions_that_failed_to_download(self, mocker: MockerFixture, tmp_path: Path) -> None:
+        download_prescriptions = mocker.patch(
+            "src.autoscription.core.core.download_prescriptions", return_value=([], [])
+        )
+        mocker.patch("src.autoscription.core.core.extract_metadata", return_value={})
+
+        checks = Core(monitoring=TestMonitoring()).download_and_extract_past_partial_executions(
+            past_partial_executions=[{"prescription": "2312011111111", "execution": 1}],
+            past_partial_exec_dir=tmp_path,
+            specific_prescriptions=None,
+            api_config={},
+            pool=None,
+            cache=None,
+        )
+
+        assert checks == {}
+        assert download_prescriptions.call_count == TIMES_TO_RETRY
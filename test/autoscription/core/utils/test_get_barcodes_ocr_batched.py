@@ -0,0 +1,53 @@
+import datetime
+from pathlib import Path
+from unittest.mock import Mock
+
+import time_machine
+from PIL import Image
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.core.utils import get_barcodes_ocr_batched
+
+
+class TestGetBarcodesOCRBatched:
+    @time_machine.travel(datetime.date(2023, 6, 1))
+    def test_barcodes_are_read_in_batches_of_same_size_crops(self, tmp_path: Path) -> None:
+        files = []
+        for i, size in enumerate([(2480, 3508), (2500, 3500), (1200, 600)]):
+            file = tmp_path / f"scan_{i}.jpg"
+            Image.new("RGB", size, "white").save(file)
+            files.append(file)
+        mock_reader = Mock()
+        mock_reader.readtext_batched.side_effect = [
+            [["2305121111111111"], ["230512111111", "1"], []],
+            [["2305121111111111"], ["2305122222222222"], []],
+            [["2305123333333333"]],
+            [["2305123333333333"]],
+        ]
+
+        results = get_barcodes_ocr_batched(
+            reader=mock_reader, files=files + [files[0]], batch_size=3, monitoring=TestMonitoring()
+        )
+
+        assert results == [
+            ("2305121111111111", ""),
+            ("0000000000000000", ""),
+            ("0000000000000000", ""),
+            ("2305123333333333", ""),
+        ]
+        assert mock_reader.readtext_batched.call_count == 4
+        first_region_crops = mock_reader.readtext_batched.call_args_list[0].args[0]
+        second_region_crops = mock_reader.readtext_batched.call_args_list[1].args[0]
+        assert {crop.shape for crop in first_region_crops} == {(450, 650, 3)}
+        assert {crop.shape for crop in second_region_crops} == {(500, 1080, 3)}
+
+    @time_machine.travel(datetime.date(2023, 6, 1))
+    def test_mismatching_barcodes_are_probable_barcodes(self, tmp_path: Path) -> None:
+        file = tmp_path / "scan.jpg"
+        Image.new("RGB", (2480, 3508), "white").save(file)
+        mock_reader = Mock()
+        mock_reader.readtext_batched.side_effect = [[["2305121111111111"]], [["2305122222222222"]]]
+
+        results = get_barcodes_ocr_batched(reader=mock_reader, files=[file], batch_size=8, monitoring=TestMonitoring())
+
+        assert results == [("0000000000000000", "2305121111111111|2305122222222222")]
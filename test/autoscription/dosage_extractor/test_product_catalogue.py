@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from src.autoscription.dosage_extractor import product_number_extractor
+from src.autoscription.dosage_extractor.product_catalogue import ProductCatalogue
+from src.autoscription.dosage_extractor.product_number_extractor import (
+    UNABLE_TO_IDENTIFY,
+    clean_description,
+    find_product_in_description,
+    number_of_products_per_container,
+    product_list,
+    reload_product_catalogue,
+)
+
+FIRST_PAGE_TABLES = Path(__file__).parents[1] / "core/extract_metadata/data/first_page_tables.json"
+
+
+def find_product_by_regex(products: dict[str, float], description: str) -> float:
+    """find_product_in_description as it was before the product catalogue."""
+    description = description.strip()
+    for product, amount in products.items():
+        if re.search(r"\b" + re.escape(product.strip()) + r"\b", description, re.IGNORECASE):
+            return amount
+    return UNABLE_TO_IDENTIFY
+
+
+def descriptions() -> list[str]:
+    with open(FIRST_PAGE_TABLES, encoding="utf-8") as file:
+        tables = json.load(file)["tables"]
+    table_descriptions = [row[0].split("ΔΟΣΟΛΟΓΙΑ :")[0] for table in tables for row in table[3:] if row[0]]
+    product_descriptions = [
+        variant
+        for product in product_list
+        for variant in [
+            product,
+            product.lower(),
+            f"  {product} (ΓΕΝΌΣΗΜΟ) ",
+            f"PRODUCT {product}/TAB",
+            f"X{product}",
+            f"{product}1",
+            product[:-1],
+        ]
+    ]
+    cleaned_descriptions = [clean_description(description) for description in table_descriptions]
+    return table_descriptions + cleaned_descriptions + product_descriptions
+
+
+@pytest.fixture
+def product_list_file(tmp_path: Path) -> Iterator[Path]:
+    yield tmp_path / "product_list.json"
+    # Back to the products of product_list
+    reload_product_catalogue(tmp_path / "missing.json")
+
+
+class TestProductCatalogue:
+    def test_find_is_the_regex_search_over_the_products(self) -> None:
+        catalogue = ProductCatalogue(product_list)
+
+        for description in descriptions():
+            amount = catalogue.find(description.strip())
+            expected = find_product_by_regex(product_list, description)
+            assert (UNABLE_TO_IDENTIFY if amount is None else amount) == expected, description
+            assert find_product_in_description(description) == expected, description
+
+    @pytest.mark.parametrize(
+        "description, expected",
+        [
+            ("AB C D", 1),
+            ("XAB C D", 3),
+            ("AB C DE", 1),
+            ("ABC D", 4),
+            ("B C D", 2),
+            ("B C DA", None),
+            ("-PLUS- AB", 1),
+            ("X-PLUS-X", 5),
+            ("X-PLUS-", None),
+            ("", None),
+        ],
+    )
+    def test_find_the_first_product_as_a_whole_word(self, description: str, expected: float) -> None:
+        products = {"AB": 1, "B C D": 2, "C D": 3, "ABC": 4, "-PLUS-": 5}
+        catalogue = ProductCatalogue(products)
+
+        assert catalogue.find(description) == expected
+        assert find_product_by_regex(products, description) == (UNABLE_TO_IDENTIFY if expected is None else expected)
+
+    @pytest.mark.parametrize(
+        "description, expected", [("AB C", 3), ("AB C D", 3), ("AB X C D", 1), ("X AB", 1), ("C D AB", 1)]
+    )
+    def test_find_the_longer_of_overlapping_products(self, description: str, expected: float) -> None:
+        catalogue = ProductCatalogue({"AB": 1, "C D": 2, "AB C": 3})
+
+        assert catalogue.find(description) == expected
+
+    def test_a_product_of_the_file_extending_a_product_of_product_list_is_found(self, product_list_file: Path) -> None:
+        product_list_file.write_text(json.dumps({"DIOVAN F.C.TAB 40MG BTX28": 28}))
+
+        catalogue = ProductCatalogue.from_file(product_list_file, product_list)
+
+        assert catalogue.find("DIOVAN F.C.TAB 40MG BTX28") == 28
+        assert catalogue.find("DIOVAN F.C.TAB 40MG BTX14") == 14
+
+    def test_reload_product_catalogue(self, product_list_file: Path) -> None:
+        description = "NEW PRODUCT TAB 10MG/TAB BTX28"
+        product_list_file.write_text(json.dumps({"NEW PRODUCT TAB 10MG": 28, "DIOVAN F.C.TAB 40MG": 28}))
+
+        assert number_of_products_per_container("ΔΙΣΚΙΑ", description)[0] == 28
+        assert reload_product_catalogue(product_list_file)
+        assert not reload_product_catalogue(product_list_file)
+        assert number_of_products_per_container.cache_info().currsize == 0
+        assert find_product_in_description(description) == 28
+        assert find_product_in_description("DIOVAN F.C.TAB 40MG/TAB") == 28
+        assert len(product_number_extractor.product_catalogue) == len(product_list) + 1
+
+        product_list_file.write_text(json.dumps({"NEW PRODUCT TAB 10MG": 30}))
+        os.utime(product_list_file, ns=(0, product_list_file.stat().st_mtime_ns + 1))
+        assert reload_product_catalogue(product_list_file)
+        assert find_product_in_description(description) == 30
+        assert find_product_in_description("DIOVAN F.C.TAB 40MG/TAB") == 14
+
+        product_list_file.unlink()
+        assert reload_product_catalogue(product_list_file)
+        assert find_product_in_description(description) == UNABLE_TO_IDENTIFY
+
+    @pytest.mark.parametrize("content", ["{", "[]"])
+    def test_the_catalogue_is_kept_when_the_file_can_not_be_read(self, product_list_file: Path, content: str) -> None:
+        product_list_file.write_text(json.dumps({"NEW PRODUCT TAB 10MG": 28}))
+        reload_product_catalogue(product_list_file)
+        product_list_file.write_text(content)
+        os.utime(product_list_file, ns=(0, product_list_file.stat().st_mtime_ns + 1))
+
+        with pytest.raises(ValueError):
+            reload_product_catalogue(product_list_file)
+        assert find_product_in_description("NEW PRODUCT TAB 10MG/TAB BTX28") == 28
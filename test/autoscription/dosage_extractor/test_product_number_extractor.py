@@ -1,16 +1,28 @@
 from __future__ import annotations
 
+import pandas as pd
 import pytest
+from pandas.testing import assert_series_equal
+from pytest_mock import MockerFixture
 
 from src.autoscription.dosage_extractor.product_number_extractor import (
+    KEY_ERROR,
+    UNABLE_TO_IDENTIFY,
     bottle_x_number,
     bt_x_number,
     bt_x_number_blist_x_number,
     bt_x_number_vial_x_number,
     cap_bt_x_number,
+    clean_description,
+    clean_descriptions,
+    extract_from_rules,
+    find_product_in_description,
     fl_x_number,
     number_disks,
     number_doses,
+    number_of_products_per_container,
+    number_of_products_per_container_api,
+    rules_dictionary,
 )
 
 
@@ -99,3 +111,84 @@ class TestProductNumberExtractor:
     def test_cap_bt_x_number(self, given_input: str, expected: int) -> None:
         res = cap_bt_x_number(given_input)
         assert res == expected
+
+    @pytest.mark.parametrize(
+        "given_input, expected",
+        [
+            ("PANTOPRAZOLE LIPITOR  F.C.TAB 20MG DIOVAN F.C.TAB 40MG", 14),
+            ("diovan f.c.tab 40mg/tab btx28", 14),
+            ("DIOVAN F.C.TAB 40MGX", UNABLE_TO_IDENTIFY),
+            (None, UNABLE_TO_IDENTIFY),
+        ],
+    )
+    def test_find_product_in_description(self, given_input: str, expected: float) -> None:
+        res = find_product_in_description(given_input)
+        assert res == expected
+
+    @pytest.mark.parametrize(
+        "product_type, description",
+        [
+            ("ΔΙΣΚΙΑ", "SERTRAL CAPS 100MG/CAP BTX2 BLIST X7 ΓΕΝΌΣΗΜΟ"),
+            ("ΔΙΣΚΙΑ", "DIOVAN F.C.TAB 40MG/TAB BTX28"),
+            ("ΚΑΨΟΥΛΕΣ", "EDUFIL INHPD.CAP 12 MCG/CAP BTX60"),
+            ("ΔΕΡΜ", "FUCIDIN CREAM 2% TUB X 15G"),
+            ("UNKNOWN", "DIOVAN F.C.TAB 40MG/TAB BTX28"),
+        ],
+    )
+    def test_number_of_products_per_container_is_memoised(self, product_type: str, description: str) -> None:
+        expected = (
+            extract_from_rules(description, rules_dictionary[product_type])
+            if product_type in rules_dictionary
+            else (UNABLE_TO_IDENTIFY, None)
+        )
+        number_of_products_per_container.cache_clear()
+
+        first = number_of_products_per_container(product_type, description)
+        second = number_of_products_per_container(product_type, description)
+
+        assert first == expected
+        assert second == expected
+        cache_info = number_of_products_per_container.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (1, 1)
+
+    @pytest.mark.parametrize(
+        "form_code, expected",
+        [
+            ("ΔΙΣΚΙΑ_ΕΠΙΚΑΛ", (14, bt_x_number_blist_x_number)),
+            ("ΔΙΣΚΙΑ", (14, bt_x_number_blist_x_number)),
+            ("UNKNOWN", (KEY_ERROR, None)),
+        ],
+    )
+    def test_number_of_products_per_container_api(
+        self, mocker: MockerFixture, form_code: str, expected: tuple[float, object]
+    ) -> None:
+        substance_administration = mocker.Mock(
+            **{
+                "consumable.name": "SERTRAL CAPS 100MG/CAP BTX2 BLIST X7 (ΓΕΝΌΣΗΜΟ)",
+                "consumable.form_code.translation": form_code,
+            }
+        )
+
+        assert number_of_products_per_container_api(substance_administration) == expected
+        assert number_of_products_per_container_api(substance_administration) == expected
+
+    @pytest.mark.parametrize(
+        "given_input, expected",
+        [
+            ("B-MAG EFF.GRAN 243MG/SACHET BTX 10 SACHETS (Γενόσημο) ", "B-MAG EFF.GRAN 243MG/SACHET BTX 10 SACHETS"),
+            ("SERTRAL caps 50 MG/CAP BTx2 BLIST X7", "SERTRAL CAPS 50 MG/CAP BTX2 BLIST X7"),
+            ("ΣΥΣΚΕΥΑΣΙΑ30 ΔΙΣΚΊΩΝ (Πρωτότυπο) ΧΩΡΊΣ (ΓΕΝΌΣΗΜΟ", "ΣYΣKEYAΣIA30 ΔIΣKIΩN  XΩPIΣ (ΓENOΣHMO"),
+            ("φιάλη χ 10 ml ΑΝΑΒΡ.", "ΦIAΛH X 10 ML ANABP."),
+            ("", ""),
+        ],
+    )
+    def test_clean_description(self, given_input: str, expected: str) -> None:
+        res = clean_description(given_input)
+        assert res == expected
+
+    def test_clean_descriptions(self) -> None:
+        descriptions = pd.Series(["LIPITOR f.c.tab 20MG (Πρωτότυπο)", None, "ΦΙΑΛΗ"], index=[3, 5, 8])
+
+        res = clean_descriptions(descriptions)
+
+        assert_series_equal(res, pd.Series(["LIPITOR F.C.TAB 20MG", None, "ΦIAΛH"], index=[3, 5, 8]))
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date
+from pathlib import Path
+from test.autoscription.idika_client.api_client.fixtures import *
+
+import httpx
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.errors import (
+    IdikaPharmacyNotSelectedException,
+    IdikaWrongStatusCodeException,
+)
+from src.autoscription.idika_client.async_api_client import (
+    IdikaAsyncAPIClient,
+    IdikaAsyncHttpClient,
+)
+
+CLINICAL_DOCUMENT = (Path(__file__).parents[1] / "clinical_document_sample.xml").read_text(encoding="utf-8")
+PARTIAL_CLINICAL_DOCUMENT = (Path(__file__).parents[1] / "partial_clinical_document_sample.xml").read_text(
+    encoding="utf-8"
+)
+SEARCH_PAGE = """
+<Page>
+    <totalPages>2</totalPages>
+    <contents>
+        <item>
+            <executionDate>2024-01-15T10:30:00.000+0000</executionDate>
+            <executionNo>1</executionNo>
+            <prescription><barcode>2401151111111</barcode></prescription>
+        </item>
+    </contents>
+</Page>
+"""
+
+
+def api_client(responses, requests):
+    """An IdikaAsyncAPIClient whose requests are recorded and answered by the next of the responses."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses.pop(0)
+
+    http_client = IdikaAsyncHttpClient(
+        base_url="https://idika.test",
+        api_key="api_key",
+        username="Username",
+        password="password",
+        transport=httpx.MockTransport(handler),
+    )
+    return IdikaAsyncAPIClient(idika_http_client=http_client)
+
+
+async def call(client, method, *args):
+    async with client.idika_http_client:
+        return await getattr(client, method)(*args)
+
+
+class TestIdikaAsyncAPIClient:
+    def test_get_clinical_document(self):
+        requests = []
+        client = api_client([httpx.Response(200, text=CLINICAL_DOCUMENT)], requests)
+        client.pharmacy_id = 1234
+
+        clinical_document = asyncio.run(call(client, "get_clinical_document", "1111111111111"))
+
+        assert clinical_document.barcode == "1111111111111"
+        assert (
+            requests[0].url == "https://idika.test/pharmacistapi/api/v1/prescriptions/get/1111111111111?pharmacyId=1234"
+        )
+        assert requests[0].headers["api-key"] == "api_key"
+        assert requests[0].headers["Authorization"].startswith("Basic ")
+
+    def test_get_partial_clinical_document(self):
+        requests = []
+        client = api_client([httpx.Response(200, text=PARTIAL_CLINICAL_DOCUMENT)], requests)
+        client.pharmacy_id = 1234
+
+        partial_clinical_document = asyncio.run(call(client, "get_partial_clinical_document", "1504079007910", 2))
+
+        assert partial_clinical_document.barcode == "1504079007910"
+        assert partial_clinical_document.execution == 2
+        assert requests[0].url.path == "/pharmacistapi/api/v1/prescriptions/get/1504079007910/dispensation/2"
+
+    def test_get_clinical_document_pharmacy_id_is_none(self):
+        client = api_client([], [])
+
+        with pytest.raises(IdikaPharmacyNotSelectedException):
+            asyncio.run(call(client, "get_clinical_document", "1111111111111"))
+
+    def test_get_clinical_document_token_expired_reauthenticates(self, authenticated_response):
+        requests = []
+        client = api_client(
+            [
+                httpx.Response(403),
+                httpx.Response(200, text=authenticated_response),
+                httpx.Response(200, text=CLINICAL_DOCUMENT),
+            ],
+            requests,
+        )
+        client.pharmacy_id = 1234
+
+        clinical_document = asyncio.run(call(client, "get_clinical_document", "1111111111111"))
+
+        assert clinical_document.barcode == "1111111111111"
+        assert [request.url.path for request in requests] == [
+            "/pharmacistapi/api/v1/prescriptions/get/1111111111111",
+            "/pharmacistapi/api/v1/user/me",
+            "/pharmacistapi/api/v1/prescriptions/get/1111111111111",
+        ]
+
+    def test_get_clinical_document_retries_the_unavailable_responses(self, mocker: MockerFixture):
+        mocker.patch("src.autoscription.idika_client.async_api_client.BACKOFF_FACTOR", 0)
+        mocker.patch("src.autoscription.idika_client.async_api_client.BACKOFF_JITTER", 0)
+        requests = []
+        client = api_client(
+            [httpx.Response(503), httpx.Response(429), httpx.Response(200, text=CLINICAL_DOCUMENT)], requests
+        )
+        client.pharmacy_id = 1234
+
+        clinical_document = asyncio.run(call(client, "get_clinical_document", "1111111111111"))
+
+        assert clinical_document.barcode == "1111111111111"
+        assert len(requests) == 3
+
+    def test_get_clinical_document_wrong_status_code(self):
+        client = api_client([httpx.Response(404, text="not found")], [])
+        client.pharmacy_id = 1234
+
+        with pytest.raises(IdikaWrongStatusCodeException):
+            asyncio.run(call(client, "get_clinical_document", "1111111111111"))
+
+    def test_authenticate(self, authenticated_response):
+        client = api_client([httpx.Response(200, text=authenticated_response)], [])
+
+        assert asyncio.run(call(client, "authenticate")) == 12345
+
+    def test_get_pharmacist_units(self, pharmacist_units_response):
+        client = api_client([httpx.Response(200, text=pharmacist_units_response)], [])
+
+        pharmacist_units = asyncio.run(call(client, "get_pharmacist_units"))
+
+        assert len(pharmacist_units) > 0
+
+    def test_print_prescription(self):
+        requests = []
+        client = api_client([httpx.Response(200, content=b"%PDF-1.4")], requests)
+
+        assert asyncio.run(call(client, "print_prescription", "2401151111111", 2)) == b"%PDF-1.4"
+        assert (
+            requests[0].url == "https://idika.test/pharmacistapi/api/v1/prescriptions/print/2401151111111?executionNo=2"
+        )
+        assert requests[0].headers["Accept"] == "application/pdf, application/xml"
+
+    def test_print_prescription_wrong_status_code(self):
+        client = api_client([httpx.Response(404)], [])
+
+        with pytest.raises(IdikaWrongStatusCodeException):
+            asyncio.run(call(client, "print_prescription", "2401151111111", 2))
+
+    def test_search_prescription_executions(self):
+        requests = []
+        client = api_client([httpx.Response(200, text=SEARCH_PAGE)], requests)
+        client.pharmacy_id = 1234
+
+        page = asyncio.run(call(client, "search_prescription_executions", date(2024, 1, 15), 1))
+
+        assert page["totalPages"] == "2"
+        assert page["contents"]["item"]["prescription"]["barcode"] == "2401151111111"
+        assert dict(requests[0].url.params) == {"executionDate": "2024-01-15", "pharmacyId": "1234", "page": "1"}
@@ -0,0 +1,120 @@
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.errors import IdikaWrongStatusCodeException
+from src.autoscription.idika_client.api_client import IdikaAPIClient
+from src.autoscription.idika_client.clinical_document_cache import ClinicalDocumentCache
+
+SAMPLES_DIR = Path(__file__).parents[1]
+CLINICAL_DOCUMENT = (SAMPLES_DIR / "clinical_document_sample.xml").read_text(encoding="utf-8")
+# The sample prescription is partially executed, every line of this one is executed
+EXECUTED_CLINICAL_DOCUMENT = CLINICAL_DOCUMENT.replace(
+    '<statusCode code="active" />', '<statusCode code="completed" />'
+)
+PARTIAL_CLINICAL_DOCUMENT = (SAMPLES_DIR / "partial_clinical_document_sample.xml").read_text(encoding="utf-8")
+
+
+def cached_api_client(cache: ClinicalDocumentCache, text: str, status_code: int = 200) -> IdikaAPIClient:
+    idika_http_client = MagicMock()
+    response = MagicMock(status_code=status_code, text=text)
+    idika_http_client.get_clinical_document.return_value = response
+    idika_http_client.get_partial_clinical_document.return_value = response
+    client = IdikaAPIClient(idika_http_client=idika_http_client, cache=cache)
+    client.pharmacy_id = 1234
+    return client
+
+
+class TestClinicalDocumentCache:
+    def test_add_and_lookup(self, tmp_path: Path) -> None:
+        cache = ClinicalDocumentCache(tmp_path, ttl_hours=1, size_limit_mb=1)
+
+        assert cache.lookup(1234, "1111111111111") == (None, None)
+        cache.add(1234, "1111111111111", "<ClinicalDocument/>")
+        assert cache.lookup(1234, "1111111111111") == ("<ClinicalDocument/>", None)
+        cache.add(1234, "1111111111111", "<ClinicalDocument/>", {"barcode": "1111111111111"})
+        assert cache.lookup(1234, "1111111111111") == (None, {"barcode": "1111111111111"})
+
+        assert cache.lookup(4321, "1111111111111") == (None, None)
+        assert cache.lookup(1234, "1111111111111", execution=1) == (None, None)
+
+    def test_the_documents_are_keyed_by_the_content_and_the_execution(self, tmp_path: Path) -> None:
+        cache = ClinicalDocumentCache(tmp_path)
+        cache.add(1234, "1111111111111", "<PartialClinicalDocument/>", {"execution": 1}, execution=1)
+        cache.add(4321, "1111111111111", "<PartialClinicalDocument/>", execution=1)
+        cache.add(1234, "1111111111111", "<PartialClinicalDocument/>", execution=2)
+
+        assert cache.lookup(4321, "1111111111111", execution=1) == (None, {"execution": 1})
+        assert cache.lookup(1234, "1111111111111", execution=2) == ("<PartialClinicalDocument/>", None)
+
+    def test_the_documents_of_older_mapping_versions_are_not_read(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        cache = ClinicalDocumentCache(tmp_path)
+        cache.add(1234, "1111111111111", "<ClinicalDocument/>", {"barcode": "1111111111111"})
+
+        mocker.patch("src.autoscription.idika_client.clinical_document_cache.CLINICAL_DOCUMENT_MAPPING_VERSION", 2)
+
+        assert cache.lookup(1234, "1111111111111") == ("<ClinicalDocument/>", None)
+
+    def test_the_entries_expire(self, tmp_path: Path) -> None:
+        cache = ClinicalDocumentCache(tmp_path, ttl_hours=0.1 / 3600)
+        cache.add(1234, "1111111111111", "<ClinicalDocument/>", {"barcode": "1111111111111"})
+
+        time.sleep(0.2)
+
+        assert cache.lookup(1234, "1111111111111") == (None, None)
+
+
+class TestIdikaAPIClientCache:
+    def test_get_clinical_document_requests_an_executed_barcode_once(self, tmp_path: Path) -> None:
+        client = cached_api_client(ClinicalDocumentCache(tmp_path), EXECUTED_CLINICAL_DOCUMENT)
+
+        clinical_document = client.get_clinical_document("1111111111111")
+
+        assert client.get_clinical_document("1111111111111") == clinical_document
+        assert cached_api_client(ClinicalDocumentCache(tmp_path), "").get_clinical_document("1111111111111") == (
+            clinical_document
+        )
+        client.idika_http_client.get_clinical_document.assert_called_once()
+
+    def test_get_clinical_document_requests_a_barcode_that_can_still_be_executed_every_time(
+        self, tmp_path: Path
+    ) -> None:
+        client = cached_api_client(ClinicalDocumentCache(tmp_path), CLINICAL_DOCUMENT)
+
+        clinical_document = client.get_clinical_document("1111111111111")
+
+        assert client.get_clinical_document("1111111111111") == clinical_document
+        assert client.idika_http_client.get_clinical_document.call_count == 2
+        assert len(client.cache) == 0  # type: ignore[arg-type]
+
+    def test_get_partial_clinical_document_requests_an_execution_once(self, tmp_path: Path) -> None:
+        client = cached_api_client(ClinicalDocumentCache(tmp_path), PARTIAL_CLINICAL_DOCUMENT)
+
+        partial_clinical_document = client.get_partial_clinical_document("1504079007910", 2)
+
+        assert client.get_partial_clinical_document("1504079007910", 2) == partial_clinical_document
+        assert client.get_partial_clinical_document("1504079007910", 3).execution == 3
+        assert client.idika_http_client.get_partial_clinical_document.call_count == 2
+
+    def test_the_failed_responses_are_not_cached(self, tmp_path: Path) -> None:
+        client = cached_api_client(ClinicalDocumentCache(tmp_path), "not found", status_code=404)
+
+        for _ in range(2):
+            with pytest.raises(IdikaWrongStatusCodeException):
+                client.get_clinical_document("1111111111111")
+            assert not client.has_clinical_document(1234, "1111111111111")
+
+        assert client.idika_http_client.get_clinical_document.call_count == 4
+        assert len(client.cache) == 0  # type: ignore[arg-type]
+
+    def test_the_cached_documents_are_probed_without_a_request(self, tmp_path: Path) -> None:
+        client = cached_api_client(ClinicalDocumentCache(tmp_path), EXECUTED_CLINICAL_DOCUMENT)
+
+        assert client.has_clinical_document(1234, "1111111111111")
+        assert client.get_clinical_document("1111111111111").barcode == "1111111111111"
+        assert client.has_clinical_document(1234, "1111111111111")
+
+        assert client.idika_http_client.get_clinical_document.call_count == 2
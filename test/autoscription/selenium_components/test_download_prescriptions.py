@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+from test.autoscription.stub_server import StubResponse, StubServer, serve
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from src.autoscription.core.logging import TestMonitoring
+from src.autoscription.selenium_components.utils import (
+    DOWNLOAD_MAX_ATTEMPTS,
+    DownloadProgress,
+    download_prescriptions,
+    retrieve_prescription_ids,
+)
+
+PRINT_PATH = "/pharmacistapi/api/v1/prescriptions/print/"
+
+
+class StubPrint(StubServer):
+    """Serve a pdf for every prescription execution, failing with the given statuses first."""
+
+    def __init__(self, statuses: dict[str, list[int]]) -> None:
+        super().__init__(delay=0.02)
+        self.statuses = statuses
+        self.requests: list[str] = []
+
+    @property
+    def config(self) -> dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "api_key": "api_key",
+            "credentials_base64": "Y3JlZGVudGlhbHM=",
+        }
+
+    def respond(self, path: str) -> StubResponse:
+        path, _, query = path.partition("?")
+        name = f"{path[len(PRINT_PATH) :]}_{query.split('=')[1]}"
+        self.requests.append(name)
+        statuses = self.statuses.get(name, [])
+        status = statuses.pop(0) if statuses else 200
+        return StubResponse(status=status, content=f"%PDF {name}".encode() if status == 200 else b"")
+
+
+@pytest.fixture
+def no_backoff(mocker: MockerFixture) -> None:
+    mocker.patch("src.autoscription.selenium_components.utils.DOWNLOAD_BACKOFF_BASE", 0)
+
+
+@pytest.fixture
+def ps_ids() -> list[dict[str, Any]]:
+    return [{"prescription": f"2312{index:09d}", "execution": index % 2 + 1} for index in range(10)]
+
+
+@pytest.fixture
+def stub() -> Iterator[StubPrint]:
+    statuses = {
+        "2312000000001_2": [503, 500],
+        "2312000000004_1": [404],
+        "2312000000006_1": [503] * DOWNLOAD_MAX_ATTEMPTS,
+    }
+    with serve(StubPrint(statuses=statuses)) as stub:
+        yield stub
+
+
+class TestDownloadPrescriptions:
+    def test_download_prescriptions(
+        self, no_backoff: None, stub: StubPrint, ps_ids: list[dict[str, Any]], tmp_path: Path
+    ) -> None:
+        progress = DownloadProgress()
+
+        execution_timestamps, failed_multi_prescriptions = download_prescriptions(
+            ps_ids=ps_ids,
+            download_dir=tmp_path,
+            config=stub.config,
+            monitoring=TestMonitoring(),
+            max_in_flight=4,
+            on_downloaded=progress,
+        )
+
+        failed = ["2312000000004", "2312000000006"]
+        assert failed_multi_prescriptions == failed
+        assert execution_timestamps == [
+            ps_id for ps_id in ps_ids if ps_id["execution"] == 2 and ps_id["prescription"] not in failed
+        ]
+        assert sorted(file.name for file in (tmp_path / "0").iterdir()) == [
+            f"{ps_id['prescription']}_{ps_id['execution']}.pdf"
+            for ps_id in ps_ids
+            if ps_id["prescription"] not in failed
+        ]
+        assert (tmp_path / "0" / "2312000000001_2.pdf").read_bytes() == b"%PDF 2312000000001_2"
+        assert progress.value == len(ps_ids)
+        # 3 attempts for the one served at the third, 1 for the not found one, all of them for the unavailable one
+        assert len(stub.requests) == len(ps_ids) + 2 + DOWNLOAD_MAX_ATTEMPTS - 1
+        assert 1 < stub.max_in_flight <= 4
+
+    def test_retrieve_prescription_ids_reports_the_progress(
+        self, no_backoff: None, stub: StubPrint, ps_ids: list[dict[str, Any]], tmp_path: Path
+    ) -> None:
+        progress_bar: dict[str, Any] = {"counter": None}
+
+        failed_multi_prescriptions = retrieve_prescription_ids(
+            ps_ids=ps_ids,
+            download_dir=tmp_path,
+            config=stub.config,
+            progress_bar=progress_bar,
+            monitoring=TestMonitoring(),
+        )
+
+        assert failed_multi_prescriptions == ["2312000000004", "2312000000006"]
+        assert progress_bar["total_prescriptions"] == len(ps_ids)
+        assert progress_bar["counter"].value == len(ps_ids)
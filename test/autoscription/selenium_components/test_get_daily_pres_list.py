@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import gzip
+from collections.abc import Iterator
+from pathlib import Path
+from test.autoscription.stub_server import StubResponse, StubServer, serve
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+from src.autoscription.selenium_components.utils import _get_daily_pres_list
+
+DATE = "2024-01-15"
+
+
+def execution(day: int, hour: int, barcode: str, execution_no: int = 1) -> str:
+    return (
+        f"<item><executionDate>2024-01-{day:02d}T{hour:02d}:00:00.000+0000</executionDate>"
+        f"<executionNo>{execution_no}</executionNo><prescription><barcode>{barcode}</barcode></prescription></item>"
+    )
+
+
+def search_page(total_pages: int, items: list[str]) -> str:
+    return f"<Page><totalPages>{total_pages}</totalPages><contents>{''.join(items)}</contents></Page>"
+
+
+class StubSearch(StubServer):
+    """Serve the pages of the execution search gzip encoded, recording the pages requested."""
+
+    def __init__(self, pages: list[list[str]]) -> None:
+        super().__init__()
+        self.pages = pages
+        self.requested: list[int] = []
+
+    @property
+    def config(self) -> dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "api_key": "api_key",
+            "credentials_base64": "Y3JlZGVudGlhbHM=",
+            "pharmacy_id": 1234,
+        }
+
+    def respond(self, path: str) -> StubResponse:
+        query = parse_qs(urlsplit(path).query)
+        assert query["executionDate"] == [DATE]
+        assert query["pharmacyId"] == ["1234"]
+        page = int(query["page"][0])
+        self.requested.append(page)
+        return StubResponse(
+            content=gzip.compress(search_page(len(self.pages), self.pages[page]).encode("utf-8")),
+            headers={"Content-Type": "application/xml", "Content-Encoding": "gzip"},
+        )
+
+
+@pytest.fixture
+def stub(request: pytest.FixtureRequest) -> Iterator[StubSearch]:
+    with serve(StubSearch(pages=request.param)) as stub:
+        yield stub
+
+
+# Executions from the oldest to the newest, the day before is in the first two pages and the day after in the last one
+PAGES = [
+    [execution(14, 8, "2401140000001"), execution(14, 9, "2401140000002")],
+    [execution(14, 18, "2401140000003"), execution(15, 8, "2401150000001")],
+    [execution(15, 9, "2401150000002", 2), execution(15, 10, "2401150000003")],
+    [execution(15, 11, "2401150000004"), execution(15, 12, "2401150000005", 3)],
+    [execution(15, 13, "2401150000006"), execution(16, 8, "2401160000001")],
+]
+EXPECTED_BARCODES = [
+    "2401150000006",
+    "2401150000005",
+    "2401150000004",
+    "2401150000003",
+    "2401150000002",
+    "2401150000001",
+]
+
+
+class TestGetDailyPresList:
+    @pytest.mark.parametrize("stub", [PAGES], indirect=True)
+    @pytest.mark.parametrize("max_in_flight", [1, 2, 8])
+    def test_the_executions_of_the_date_from_the_newest(
+        self, stub: StubSearch, tmp_path: Path, max_in_flight: int
+    ) -> None:
+        prescriptions = _get_daily_pres_list(tmp_path, date=DATE, config=stub.config, max_in_flight=max_in_flight)
+
+        assert [prescription["prescription"] for prescription in prescriptions] == EXPECTED_BARCODES
+        assert prescriptions[1] == {
+            "pr_order_timestamp": "2024-01-15T12:00:00.000000+0200",
+            "prescription": "2401150000005",
+            "execution": "3",
+        }
+        # The first page is requested once, before the others
+        assert stub.requested[0] == 0
+        assert sorted(stub.requested[1:], reverse=True) == [4, 3, 2, 1]
+        assert stub.max_in_flight <= max_in_flight
+        daily_pres_list = pd.read_csv(tmp_path / "daily_pres_list.csv", dtype=str)
+        assert daily_pres_list["prescription"].tolist() == EXPECTED_BARCODES
+
+    @pytest.mark.parametrize("stub", [[PAGES[0]] * 3 + PAGES[1:]], indirect=True)
+    def test_the_batch_pages_are_requested_together(self, stub: StubSearch, tmp_path: Path) -> None:
+        _get_daily_pres_list(tmp_path, date=DATE, config=stub.config, max_in_flight=4)
+
+        # The older execution is in page 3, the last one of the first batch, the pages before it are not requested
+        assert sorted(stub.requested[1:], reverse=True) == [6, 5, 4, 3]
+        assert stub.max_in_flight > 1
+
+    @pytest.mark.parametrize("stub", [[[execution(15, 8, "2401150000001")]]], indirect=True)
+    def test_a_single_page(self, stub: StubSearch, tmp_path: Path) -> None:
+        prescriptions = _get_daily_pres_list(tmp_path, date=DATE, config=stub.config)
+
+        assert [prescription["prescription"] for prescription in prescriptions] == ["2401150000001"]
+        assert stub.requested == [0]
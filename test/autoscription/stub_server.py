@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, TypeVar
+
+
+@dataclass
+class StubResponse:
+    status: int = 200
+    content: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Serve the GET requests on localhost with what respond returns after the delay, recording how many overlapped.
+    respond is called under the lock, the subclasses record the requests and keep their state in it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.05) -> None:
+        super().__init__(("127.0.0.1", 0), StubServerHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def respond(self, path: str) -> StubResponse:
+        raise NotImplementedError
+
+
+class StubServerHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            response = self.server.respond(self.path)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        self.send_response(response.status)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(response.content)))
+        self.end_headers()
+        self.wfile.write(response.content)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: U100
+        pass
+
+
+S = TypeVar("S", bound=StubServer)
+
+
+@contextmanager
+def serve(stub: S) -> Iterator[S]:
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    try:
+        yield stub
+    finally:
+        stub.shutdown()
+        stub.server_close()